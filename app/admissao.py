@@ -0,0 +1,162 @@
+"""Controle de admissão na frente do banco.
+
+Duas barreiras: um balde de fichas por cliente, que recusa com 429 quem passa
+da taxa combinada, e uma fila limitada para o trabalho no banco, com prazo,
+que recusa com 503 quando está cheia ou quando a espera passa do prazo. Nas
+duas a resposta sai na hora, com Retry-After, em vez de o pedido esperar uma
+conexão até o timeout do pool. Na fila as leituras por id passam na frente
+das varreduras, que só podem ocupar metade dos lugares.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+# Prioridades na fila do banco (menor passa na frente)
+PRIORIDADE_ALTA = 0  # leituras por id
+PRIORIDADE_NORMAL = 1
+PRIORIDADE_BAIXA = 2  # varreduras (listagem completa, streaming)
+
+
+class Sobrecarga(Exception):
+    """Pedido recusado pelo controle de admissão (429 ou 503), com o Retry-After sugerido em segundos."""
+
+    def __init__(self, mensagem, status, retry_after):
+        super().__init__(mensagem)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class LimitadorPorCliente:
+    """Balde de fichas por cliente: `taxa` pedidos por segundo, com rajadas de até `rajada`.
+
+    Só os `max_clientes` vistos mais recentemente ficam na memória; um cliente
+    esquecido volta com o balde cheio, o que só acontece com quem ficou parado.
+    """
+
+    def __init__(self, taxa, rajada, max_clientes=100000):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.max_clientes = max_clientes
+        self._baldes = OrderedDict()  # cliente -> (fichas, instante da última conta)
+        self._lock = threading.Lock()
+
+        self._permitidos = 0
+        self._recusados = 0
+
+    def consumir(self, cliente):
+        """Gasta uma ficha de `cliente`; levanta Sobrecarga (429) se o balde estiver vazio."""
+        agora = time.monotonic()
+        with self._lock:
+            fichas, visto = self._baldes.pop(cliente, (self.rajada, agora))
+            fichas = min(self.rajada, fichas + (agora - visto) * self.taxa)
+            permitido = fichas >= 1
+            if permitido:
+                fichas -= 1
+                self._permitidos += 1
+            else:
+                self._recusados += 1
+            self._baldes[cliente] = (fichas, agora)
+            if len(self._baldes) > self.max_clientes:
+                self._baldes.popitem(last=False)
+        if not permitido:
+            espera = (1 - fichas) / self.taxa
+            raise Sobrecarga("limite de requisições do cliente excedido", 429, max(math.ceil(espera), 1))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "taxa": self.taxa,
+                "rajada": self.rajada,
+                "clientes": len(self._baldes),
+                "permitidos": self._permitidos,
+                "recusados": self._recusados,
+            }
+
+
+class FilaBanco:
+    """No máximo `vagas` requisições trabalhando no banco ao mesmo tempo; as demais esperam em fila.
+
+    A fila tem `fila_maxima` lugares (as de prioridade baixa só entram na
+    primeira metade) e ninguém espera mais que `prazo` segundos. Quando uma
+    vaga abre, entra a de menor prioridade e, entre iguais, a mais antiga.
+    """
+
+    def __init__(self, vagas, fila_maxima, prazo):
+        self.vagas = vagas
+        self.fila_maxima = fila_maxima
+        self.prazo = prazo
+        self._cond = threading.Condition()
+        self._ocupadas = 0
+        self._espera = []  # heap de (prioridade, ordem de chegada)
+        self._chegada = itertools.count()
+
+        self._admitidas = 0
+        self._recusadas_cheia = 0
+        self._recusadas_prazo = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    def entrar(self, prioridade=PRIORIDADE_NORMAL):
+        """Ocupa uma vaga, esperando na fila se preciso; levanta Sobrecarga (503) se não conseguir."""
+        inicio = time.monotonic()
+        with self._cond:
+            if self._ocupadas < self.vagas and not self._espera:
+                self._ocupar(0.0)
+                return
+
+            lugares = self.fila_maxima if prioridade < PRIORIDADE_BAIXA else self.fila_maxima // 2
+            if len(self._espera) >= lugares:
+                self._recusadas_cheia += 1
+                raise Sobrecarga("fila do banco cheia", 503, self._retry_after())
+
+            item = (prioridade, next(self._chegada))
+            heapq.heappush(self._espera, item)
+            limite = inicio + self.prazo
+            while self._espera[0] != item or self._ocupadas >= self.vagas:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._espera.remove(item)
+                    heapq.heapify(self._espera)
+                    self._recusadas_prazo += 1
+                    # A primeira da fila pode ter mudado
+                    self._cond.notify_all()
+                    raise Sobrecarga("tempo de espera pelo banco esgotado", 503, self._retry_after())
+                self._cond.wait(restante)
+            heapq.heappop(self._espera)
+            self._ocupar(time.monotonic() - inicio)
+            if self._espera and self._ocupadas < self.vagas:
+                self._cond.notify_all()
+
+    def sair(self):
+        """Libera a vaga ocupada por `entrar`."""
+        with self._cond:
+            self._ocupadas -= 1
+            self._cond.notify_all()
+
+    def _ocupar(self, espera):
+        self._ocupadas += 1
+        self._admitidas += 1
+        self._espera_total += espera
+        self._espera_max = max(self._espera_max, espera)
+
+    def _retry_after(self):
+        return max(math.ceil(self.prazo), 1)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "vagas": self.vagas,
+                "ocupadas": self._ocupadas,
+                "fila_maxima": self.fila_maxima,
+                "aguardando": len(self._espera),
+                "prazo": self.prazo,
+                "admitidas": self._admitidas,
+                "recusadas_fila_cheia": self._recusadas_cheia,
+                "recusadas_prazo": self._recusadas_prazo,
+                "espera_media_ms": (self._espera_total / self._admitidas * 1000) if self._admitidas else 0.0,
+                "espera_max_ms": self._espera_max * 1000,
+            }
@@ -0,0 +1,233 @@
+"""Banco SQLite local que imita a interface do mysql.connector usada pelas rotas.
+
+Serve para o benchmark (bench.py) rodar sem um MySQL: os comandos das rotas
+são traduzidos na hora (`%s` -> `?`, sem `FOR UPDATE`/`LOCK TABLES`, EXPLAIN QUERY PLAN) e os
+tipos voltam como o MySQL devolveria (valor em Decimal, datas em date).
+O MATCH ... AGAINST da busca textual vira uma função Python que percorre a
+tabela: serve para exercitar a rota, não para medir o índice FULLTEXT.
+Dos triggers das migrações só tem os da versão da tabela (0008), numa fatia
+só, e os da contagem por prefixo de CEP (0011): o resumo de estatísticas é
+calculado na carga e não acompanha as escritas.
+"""
+import re
+import sqlite3
+import unicodedata
+from datetime import date
+from decimal import Decimal
+
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter("DECIMAL", lambda bruto: Decimal(bruto.decode()).quantize(Decimal("0.01")))
+sqlite3.register_converter("DATE", lambda bruto: date.fromisoformat(bruto.decode()))
+
+# Equivalente das migrações 0001 a 0004, 0009 e dos índices da 0007 e da 0010: tabelas...
+SQL_TABELAS = [
+    """CREATE TABLE IF NOT EXISTS imoveis (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        logradouro VARCHAR(255) NOT NULL,
+        tipo_logradouro VARCHAR(50) NOT NULL,
+        bairro VARCHAR(100) NOT NULL,
+        cidade VARCHAR(100) NOT NULL,
+        cep VARCHAR(8) NOT NULL,
+        tipo VARCHAR(50) NOT NULL,
+        valor DECIMAL(12, 2) NOT NULL,
+        data_aquisicao DATE NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS imoveis_resumo (
+        dimensao VARCHAR(10) NOT NULL,
+        cidade VARCHAR(100) NOT NULL,
+        grupo VARCHAR(100) NOT NULL,
+        quantidade INTEGER NOT NULL,
+        soma_valor DECIMAL(16, 2) NOT NULL,
+        valor_min DECIMAL(12, 2),
+        valor_max DECIMAL(12, 2),
+        PRIMARY KEY (dimensao, cidade, grupo)
+    )""",
+    # Progresso das importações da transferencia.py
+    """CREATE TABLE IF NOT EXISTS importacoes (
+        arquivo VARCHAR(512) NOT NULL PRIMARY KEY,
+        tamanho INTEGER NOT NULL,
+        posicao INTEGER NOT NULL,
+        linha INTEGER NOT NULL,
+        inseridas INTEGER NOT NULL,
+        rejeitadas INTEGER NOT NULL,
+        concluida BOOLEAN NOT NULL DEFAULT 0,
+        cabecalho TEXT
+    )""",
+]
+
+# ...e índices (criados depois da carga, que fica bem mais rápida sem eles)
+SQL_INDICES = [
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_tipo ON imoveis (tipo)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_cidade ON imoveis (cidade)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_cidade_tipo ON imoveis (cidade, tipo)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_cep ON imoveis (cep)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_data_aquisicao ON imoveis (data_aquisicao)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_bairro ON imoveis (bairro)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_valor ON imoveis (valor)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_cidade_valor ON imoveis (cidade, valor)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_cidade_data_aquisicao ON imoveis (cidade, data_aquisicao)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_tipo_valor ON imoveis (tipo, valor)",
+    "CREATE INDEX IF NOT EXISTS idx_imoveis_cidade_bairro_valor ON imoveis (cidade, bairro, valor)",
+]
+
+# Versão da tabela compartilhada entre processos (migração 0008). Como os índices,
+# os triggers entram depois da carga, e uma carga antiga os ganha ao ser reaproveitada
+SQL_VERSAO = [
+    "CREATE TABLE IF NOT EXISTS imoveis_versao (fatia INTEGER PRIMARY KEY, versao INTEGER NOT NULL DEFAULT 0)",
+    "INSERT OR IGNORE INTO imoveis_versao (fatia) VALUES (0)",
+    *(f"""CREATE TRIGGER IF NOT EXISTS imoveis_versao_{evento.lower()} AFTER {evento} ON imoveis
+        BEGIN UPDATE imoveis_versao SET versao = versao + 1 WHERE fatia = 0; END"""
+      for evento in ("INSERT", "UPDATE", "DELETE")),
+]
+
+# Contagem por prefixo de CEP (migração 0011), também mantida por triggers. A carga
+# inicial só roda com a tabela vazia: depois disso os triggers já a acompanham
+_SOMAR_CEP = """INSERT INTO imoveis_cep (prefixo, quantidade) VALUES (substr(NEW.cep, 1, 5), 1)
+            ON CONFLICT (prefixo) DO UPDATE SET quantidade = quantidade + 1;"""
+_SUBTRAIR_CEP = """UPDATE imoveis_cep SET quantidade = quantidade - 1 WHERE prefixo = substr(OLD.cep, 1, 5);
+            DELETE FROM imoveis_cep WHERE prefixo = substr(OLD.cep, 1, 5) AND quantidade <= 0;"""
+SQL_CONTAGEM_CEP = [
+    "CREATE TABLE IF NOT EXISTS imoveis_cep (prefixo CHAR(5) PRIMARY KEY, quantidade INTEGER NOT NULL)",
+    """INSERT INTO imoveis_cep (prefixo, quantidade)
+        SELECT substr(cep, 1, 5), COUNT(*) FROM imoveis WHERE NOT EXISTS (SELECT 1 FROM imoveis_cep) GROUP BY substr(cep, 1, 5)""",
+    f"CREATE TRIGGER IF NOT EXISTS imoveis_cep_insert AFTER INSERT ON imoveis BEGIN {_SOMAR_CEP} END",
+    f"""CREATE TRIGGER IF NOT EXISTS imoveis_cep_update AFTER UPDATE OF cep ON imoveis
+        WHEN substr(OLD.cep, 1, 5) <> substr(NEW.cep, 1, 5) BEGIN {_SUBTRAIR_CEP} {_SOMAR_CEP} END""",
+    f"CREATE TRIGGER IF NOT EXISTS imoveis_cep_delete AFTER DELETE ON imoveis BEGIN {_SUBTRAIR_CEP} END",
+]
+
+# Comandos do MySQL que não têm equivalente (nem necessidade) no SQLite
+_IGNORADOS = re.compile(r"^\s*(LOCK|UNLOCK)\s+TABLES", re.IGNORECASE)
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\s*$", re.IGNORECASE)
+_MATCH = re.compile(r"MATCH\((\w+), (\w+)\) AGAINST \(%s IN BOOLEAN MODE\)")
+_PALAVRA = re.compile(r"\w+")
+_LEFT = re.compile(r"LEFT\((\w+), %s\)")
+
+
+def _dobrar(texto):
+    """Minúsculas e sem acentos, como a collation utf8mb4_0900_ai_ci compara."""
+    return "".join(c for c in unicodedata.normalize("NFD", texto.lower()) if not unicodedata.combining(c))
+
+
+def relevancia_texto(logradouro, bairro, consulta):
+    """Imitação do MATCH ... AGAINST em modo booleano só com termos `+palavra*`: 0 se algum falta."""
+    palavras = _PALAVRA.findall(_dobrar(f"{logradouro} {bairro}"))
+    relevancia = 0.0
+    for termo in consulta.split():
+        prefixo = _dobrar(termo.strip("+*"))
+        encontradas = sum(palavra.startswith(prefixo) for palavra in palavras)
+        if not encontradas:
+            return 0.0
+        relevancia += encontradas / len(palavras)
+    return relevancia
+
+
+def traduzir(sql):
+    """Converte um comando das rotas para o dialeto do SQLite (None se deve ser ignorado)."""
+    if _IGNORADOS.match(sql):
+        return None
+    if sql.startswith("EXPLAIN "):
+        # O EXPLAIN do SQLite lista bytecode; o plano equivalente ao do MySQL é o QUERY PLAN
+        sql = "EXPLAIN QUERY PLAN " + sql[len("EXPLAIN "):]
+    sql = _MATCH.sub(r"relevancia_texto(\1, \2, %s)", sql)
+    sql = _LEFT.sub(r"substr(\1, 1, %s)", sql)
+    # A versão compartilhada tem uma fatia só (SQL_VERSAO)
+    sql = sql.replace("CONNECTION_ID() % 16", "0")
+    return _FOR_UPDATE.sub("", sql).replace("%s", "?")
+
+
+class CursorSQLite:
+    """Cursor com a interface do mysql.connector (execute com %s, fetchmany, rowcount, lastrowid)."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._lastrowid = None
+
+    def execute(self, sql, params=()):
+        sql = traduzir(sql)
+        self._lastrowid = None
+        if sql is not None:
+            self._cursor.execute(sql, tuple(params or ()))
+
+    def executemany(self, sql, linhas):
+        self._cursor.executemany(traduzir(sql), [tuple(linha) for linha in linhas])
+        # O mysql.connector junta o lote num INSERT só, cujo lastrowid é o id da primeira linha
+        quantidade = self._cursor.rowcount
+        self._lastrowid = None
+        if sql.lstrip().upper().startswith("INSERT") and quantidade > 0:
+            ultimo = self._cursor.connection.execute("SELECT last_insert_rowid()").fetchone()[0]
+            self._lastrowid = ultimo - quantidade + 1
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, tamanho=1):
+        return self._cursor.fetchmany(tamanho)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._lastrowid if self._lastrowid is not None else self._cursor.lastrowid
+
+
+class ConexaoSQLite:
+    """Conexão SQLite com os métodos que o pool e as rotas chamam numa conexão MySQL."""
+
+    def __init__(self, caminho):
+        # O pool empresta a mesma conexão para threads diferentes (uma de cada vez)
+        self._conn = sqlite3.connect(caminho, timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.create_function("relevancia_texto", 3, relevancia_texto, deterministic=True)
+
+    def cursor(self, buffered=None, **_):
+        return CursorSQLite(self._conn.cursor())
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        self._conn.close()
+
+
+def conectar(caminho):
+    return ConexaoSQLite(caminho)
+
+
+def criar_tabelas(conn):
+    cursor = conn.cursor()
+    for sql in SQL_TABELAS:
+        cursor.execute(sql)
+    conn.commit()
+
+
+def criar_indices(conn):
+    cursor = conn.cursor()
+    for sql in (*SQL_INDICES, *SQL_VERSAO, *SQL_CONTAGEM_CEP):
+        cursor.execute(sql)
+    conn.commit()
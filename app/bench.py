@@ -0,0 +1,831 @@
+"""Benchmark de carga das rotas de servidor.py.
+
+Semeia um banco local com imóveis sintéticos (SQLite por padrão; com
+`--banco mysql`, o MySQL configurado no .env, que precisa estar vazio) e
+dispara cada rota com a concorrência pedida, dentro do próprio processo.
+Mede vazão, latência (p50/p95/p99), as fases de cada requisição registradas
+pelo servidor (conexão, banco, montagem, serialização JSON) e o pico de RSS,
+e grava tudo em JSON para comparar commits.
+
+Uso:
+    python bench.py rodar [--linhas 10000,100000,1000000] [--concorrencia 1,8,32]
+                          [--requisicoes 500] [--cenarios por_id,busca] [--sem-escritas]
+                          [--sem-cache] [--fundo listar_ndjson:16] [--banco sqlite|mysql] [--saida arquivo.json]
+    python bench.py comparar base.json novo.json [--tolerancia 10]
+    python bench.py serializacao [--linhas 100000] [--repeticoes 3]
+    python bench.py servir [--processos 1,2,4] [--threads] [--linhas 10000] [--cenario por_id]
+                           [--concorrencia 16] [--duracao 10] [--saida arquivo.json]
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from urllib.parse import quote
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import banco_local
+from config import pool_config
+from estatisticas import reconstruir
+from lote import SQL_INSERT, COLUNAS_ESCRITA
+from metricas import RegistroMetricas, medir_conexoes
+from pool import ConnectionPool, PoolEsgotado
+from serializacao import FORMATO_COLUNAS, ProvedorJSON, corpo_imoveis
+
+
+PASTA_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_dados")
+
+CIDADES = (
+    "São Paulo", "Rio de Janeiro", "Belo Horizonte", "Curitiba", "Porto Alegre", "Salvador", "Recife",
+    "Fortaleza", "Brasília", "Goiânia", "Manaus", "Belém", "Florianópolis", "Vitória", "Campinas",
+    "Santos", "Natal", "João Pessoa", "Maceió", "Teresina",
+)
+BAIRROS = (
+    "Centro", "Jardim América", "Vila Nova", "Boa Vista", "Santa Cecília", "Bela Vista", "Liberdade",
+    "Copacabana", "Savassi", "Batel", "Moinhos de Vento", "Barra", "Boa Viagem", "Meireles", "Asa Sul",
+)
+TIPOS = ("casa", "apartamento", "terreno", "sala", "galpao")
+TIPOS_LOGRADOURO = ("Rua", "Avenida", "Travessa", "Alameda", "Praça")
+NOMES = ("das Flores", "Brasil", "Sete de Setembro", "Tiradentes", "XV de Novembro", "da Paz", "Santos Dumont")
+
+# Uma rota exercitada pelo benchmark. `gerar(contexto, rng)` devolve (url, corpo JSON ou None);
+# `ids` é quantos imóveis descartáveis cada requisição consome (rotas que alteram ou removem);
+# `cabecalhos` vão em todas as requisições do cenário (ex.: Accept-Encoding).
+Cenario = namedtuple("Cenario", "nome metodo regra gerar escrita ids cabecalhos")
+
+
+def _cenario(nome, metodo, regra, gerar, escrita=False, ids=0, cabecalhos=None):
+    return Cenario(nome, metodo, regra, gerar, escrita, ids, cabecalhos)
+
+
+# Dados sintéticos
+
+def gerar_imovel(rng, i):
+    """Tupla na ordem de COLUNAS_ESCRITA."""
+    return (
+        f"{rng.choice(NOMES)} {i}",
+        rng.choice(TIPOS_LOGRADOURO),
+        rng.choice(BAIRROS),
+        rng.choice(CIDADES),
+        f"{rng.randrange(10 ** 8):08d}",
+        rng.choice(TIPOS),
+        Decimal(rng.randrange(5_000_000, 300_000_000)) / 100,
+        date(1990, 1, 1) + timedelta(days=rng.randrange(12000)),
+    )
+
+
+def imovel_json(linha):
+    imovel = dict(zip(COLUNAS_ESCRITA, linha))
+    imovel["valor"] = float(imovel["valor"])
+    imovel["data_aquisicao"] = imovel["data_aquisicao"].isoformat()
+    return imovel
+
+
+def inserir_sinteticos(conn, quantidade, semente, lote=10000, saida=print):
+    """Insere `quantidade` imóveis sintéticos (determinísticos para a semente) com executemany."""
+    rng = random.Random(semente)
+    cursor = conn.cursor()
+    for inicio in range(0, quantidade, lote):
+        linhas = [gerar_imovel(rng, i) for i in range(inicio, min(inicio + lote, quantidade))]
+        cursor.executemany(SQL_INSERT, linhas)
+        conn.commit()
+        if saida and quantidade > lote:
+            saida(f"  {inicio + len(linhas)}/{quantidade} imóveis")
+
+
+def contar(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) from imoveis")
+    return cursor.fetchone()
+
+
+def preparar_sqlite(linhas, pasta=PASTA_DADOS, saida=print):
+    """Caminho de um SQLite com `linhas` imóveis; a carga é feita uma vez e reaproveitada."""
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"imoveis_{linhas}.db")
+    if os.path.exists(caminho):
+        # Uma carga antiga ganha as tabelas e os índices adicionados depois dela
+        conn = banco_local.conectar(caminho)
+        try:
+            banco_local.criar_tabelas(conn)
+            banco_local.criar_indices(conn)
+        finally:
+            conn.close()
+        return caminho
+
+    saida(f"Semeando {linhas} imóveis em {caminho}")
+    temporario = caminho + ".carregando"
+    for sobra in (temporario, temporario + "-wal", temporario + "-shm"):
+        if os.path.exists(sobra):
+            os.remove(sobra)
+    conn = banco_local.conectar(temporario)
+    try:
+        banco_local.criar_tabelas(conn)
+        inserir_sinteticos(conn, linhas, semente=linhas, saida=saida)
+        banco_local.criar_indices(conn)
+        reconstruir(conn)
+    finally:
+        conn.close()
+    # Só aparece com o nome final depois de completa: uma carga interrompida não é reaproveitada
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def preparar_mysql(linhas, saida=print):
+    """Usa o MySQL do .env; semeia se a tabela estiver vazia e recusa se tiver outra quantidade."""
+    import mysql.connector
+    from config import config
+
+    conectar = lambda: mysql.connector.connect(**config)
+    conn = conectar()
+    try:
+        total, _ = contar(conn)
+        if total == 0:
+            saida(f"Semeando {linhas} imóveis no banco {config['database']}")
+            inserir_sinteticos(conn, linhas, semente=linhas, saida=saida)
+            reconstruir(conn)
+        elif total != linhas:
+            raise SystemExit(f"O banco {config['database']} tem {total} imóveis (esperado 0 ou {linhas}); use um banco só para o benchmark")
+    finally:
+        conn.close()
+    return conectar
+
+
+# Medição: as fases vêm da instrumentação do próprio servidor (metricas.py)
+
+_ultima = threading.local()
+
+
+class RegistroDoBench(RegistroMetricas):
+    """Registro de métricas que também guarda a medição da última requisição da thread."""
+
+    def registrar(self, rota, metodo, medicao):
+        super().registrar(rota, metodo, medicao)
+        _ultima.medicao = medicao
+
+
+@contextmanager
+def instrumentar(servidor, pool):
+    """Troca o connect_db do servidor pelo pool do benchmark e liga a medição por requisição."""
+    def connect_db(leitura=False):
+        try:
+            return pool.adquirir()
+        except PoolEsgotado as err:
+            print(f"Erro: {err}")
+            return None
+
+    originais = (servidor.connect_db, servidor.pool_stats, servidor.metricas, servidor.metricas_config['ativas'])
+    servidor.connect_db, servidor.pool_stats = medir_conexoes(connect_db), pool.stats
+    servidor.metricas = RegistroDoBench()
+    servidor.metricas_config['ativas'] = True
+    try:
+        yield
+    finally:
+        servidor.connect_db, servidor.pool_stats, servidor.metricas, servidor.metricas_config['ativas'] = originais
+
+
+# Cenários: todas as rotas de servidor.py (tests/test_bench.py confere que nenhuma ficou de fora)
+
+class Contexto:
+    """O que os cenários precisam saber do banco: tamanho e imóveis descartáveis para escritas."""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.descartaveis = deque()
+
+    def pegar_ids(self, quantidade):
+        return [self.descartaveis.popleft() for _ in range(quantidade)]
+
+
+def _url(caminho, **args):
+    return caminho + ("?" + "&".join(f"{nome}={quote(str(valor))}" for nome, valor in args.items()) if args else "")
+
+
+CENARIOS = [
+    _cenario("raiz", "GET", "/", lambda ctx, rng: ("/", None)),
+    _cenario("listar", "GET", "/imoveis", lambda ctx, rng: (_url("/imoveis", after=rng.randrange(ctx.linhas)), None)),
+    _cenario("listar_campos", "GET", "/imoveis",
+             lambda ctx, rng: (_url("/imoveis", fields="id,cep,valor", after=rng.randrange(ctx.linhas)), None)),
+    _cenario("listar_ndjson", "GET", "/imoveis",
+             lambda ctx, rng: (_url("/imoveis", formato="ndjson", after=max(ctx.linhas - 1000, 0)), None)),
+    _cenario("listar_ndjson_gzip", "GET", "/imoveis",
+             lambda ctx, rng: (_url("/imoveis", formato="ndjson", after=max(ctx.linhas - 1000, 0)), None),
+             cabecalhos={"Accept-Encoding": "gzip"}),
+    _cenario("por_id", "GET", "/imoveis/<int:id>", lambda ctx, rng: (f"/imoveis/{rng.randint(1, ctx.linhas)}", None)),
+    _cenario("por_tipo", "GET", "/imoveis/tipo/<string:tipo>",
+             lambda ctx, rng: (_url(f"/imoveis/tipo/{quote(rng.choice(TIPOS))}", after=rng.randrange(ctx.linhas)), None)),
+    _cenario("por_cidade", "GET", "/imoveis/cidade/<string:cidade>",
+             lambda ctx, rng: (_url(f"/imoveis/cidade/{quote(rng.choice(CIDADES))}", after=rng.randrange(ctx.linhas)), None)),
+    _cenario("por_cidade_gzip", "GET", "/imoveis/cidade/<string:cidade>",
+             lambda ctx, rng: (_url(f"/imoveis/cidade/{quote(rng.choice(CIDADES))}", limit=1000), None),
+             cabecalhos={"Accept-Encoding": "gzip"}),
+    # Todas as requisições na mesma página: com --sem-cache mostra a coalescência das consultas iguais
+    _cenario("mesma_cidade", "GET", "/imoveis/cidade/<string:cidade>",
+             lambda ctx, rng: (_url(f"/imoveis/cidade/{quote(CIDADES[0])}", limit=1000), None)),
+    _cenario("busca", "GET", "/imoveis/search",
+             lambda ctx, rng: (_url("/imoveis/search", cidade=rng.choice(CIDADES), valor_max=rng.randrange(100_000, 3_000_000), sort="-valor"), None)),
+    _cenario("busca_texto", "GET", "/imoveis/busca",
+             lambda ctx, rng: (_url("/imoveis/busca", q=f"{rng.choice(NOMES).split()[-1]} {rng.choice(BAIRROS).split()[0]}", limit=20), None)),
+    _cenario("faixa_data", "GET", "/imoveis/faixa/<string:coluna>",
+             lambda ctx, rng: (_url("/imoveis/faixa/data_aquisicao", cidade=rng.choice(CIDADES), de=f"{rng.randrange(1990, 2022)}-07-01",
+                                    limit=100), None)),
+    _cenario("top_valor", "GET", "/imoveis/top/<string:coluna>",
+             lambda ctx, rng: (_url("/imoveis/top/valor", cidade=rng.choice(CIDADES), n=100), None)),
+    _cenario("cep_prefixo", "GET", "/imoveis/cep",
+             lambda ctx, rng: (_url("/imoveis/cep", prefixo=f"{rng.randrange(1000):03d}"), None)),
+    _cenario("cep_contagem", "GET", "/imoveis/cep/contagem",
+             lambda ctx, rng: (_url("/imoveis/cep/contagem", nivel=rng.randint(1, 3), prefixo=rng.randrange(10)), None)),
+    _cenario("estatisticas", "GET", "/imoveis/stats/<string:dimensao>",
+             lambda ctx, rng: (rng.choice(["/imoveis/stats/cidade", "/imoveis/stats/tipo", _url("/imoveis/stats/bairro", cidade=rng.choice(CIDADES))]), None)),
+    _cenario("saude_vivo", "GET", "/saude/vivo", lambda ctx, rng: ("/saude/vivo", None)),
+    _cenario("saude_pronto", "GET", "/saude/pronto", lambda ctx, rng: ("/saude/pronto", None)),
+    _cenario("metricas", "GET", "/metrics", lambda ctx, rng: ("/metrics", None)),
+    _cenario("interno_consultas", "GET", "/interno/consultas", lambda ctx, rng: ("/interno/consultas", None)),
+    _cenario("interno_pool", "GET", "/interno/pool", lambda ctx, rng: ("/interno/pool", None)),
+    _cenario("interno_replica", "GET", "/interno/replica", lambda ctx, rng: ("/interno/replica", None)),
+    _cenario("interno_cache", "GET", "/interno/cache", lambda ctx, rng: ("/interno/cache", None)),
+    _cenario("interno_coalescencia", "GET", "/interno/coalescencia", lambda ctx, rng: ("/interno/coalescencia", None)),
+    _cenario("interno_admissao", "GET", "/interno/admissao", lambda ctx, rng: ("/interno/admissao", None)),
+    _cenario("inserir", "POST", "/imoveis", lambda ctx, rng: ("/imoveis", imovel_json(gerar_imovel(rng, 0))), escrita=True),
+    _cenario("inserir_lote", "POST", "/imoveis/batch",
+             lambda ctx, rng: ("/imoveis/batch", [imovel_json(gerar_imovel(rng, i)) for i in range(100)]), escrita=True),
+    _cenario("atualizar", "PUT", "/imoveis/<int:id>",
+             lambda ctx, rng: (f"/imoveis/{ctx.pegar_ids(1)[0]}", imovel_json(gerar_imovel(rng, 0))), escrita=True, ids=1),
+    _cenario("remover", "DELETE", "/imoveis/<int:id>", lambda ctx, rng: (f"/imoveis/{ctx.pegar_ids(1)[0]}", None), escrita=True, ids=1),
+    _cenario("atualizar_lote", "PUT", "/imoveis/batch",
+             lambda ctx, rng: ("/imoveis/batch", {"ids": ctx.pegar_ids(50), "fator_valor": 1.01}), escrita=True, ids=50),
+    _cenario("remover_lote", "DELETE", "/imoveis/batch", lambda ctx, rng: ("/imoveis/batch", {"ids": ctx.pegar_ids(50)}), escrita=True, ids=50),
+]
+
+
+# Execução
+
+def percentil(ordenados, p):
+    """Percentil por posição (nearest-rank) de uma lista já ordenada."""
+    if not ordenados:
+        return None
+    return ordenados[max(math.ceil(p / 100 * len(ordenados)) - 1, 0)]
+
+
+def _resumo_ms(valores):
+    ordenados = sorted(valores)
+    return {
+        "media": round(sum(ordenados) / len(ordenados) * 1000, 3),
+        "p50": round(percentil(ordenados, 50) * 1000, 3),
+        "p95": round(percentil(ordenados, 95) * 1000, 3),
+        "p99": round(percentil(ordenados, 99) * 1000, 3),
+        "max": round(ordenados[-1] * 1000, 3),
+    }
+
+
+def rss_pico_mb():
+    """Pico de memória residente do processo (cumulativo: não diminui entre cenários)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# Fases somadas em cada coluna do resultado
+COLUNAS_FASES = {
+    "conexao_ms": ("conexao",),
+    "banco_ms": ("execute", "fetch", "commit"),
+    "montagem_ms": ("montagem",),
+    "serializacao_ms": ("serializacao",),
+    "compressao_ms": ("compressao",),
+}
+
+
+def _requisitar(cliente, cenario, contexto, rng):
+    url, corpo = cenario.gerar(contexto, rng)
+    _ultima.medicao = None
+    inicio = time.perf_counter()
+    resposta = cliente.open(url, method=cenario.metodo, json=corpo, headers=cenario.cabecalhos)
+    tamanho = len(resposta.get_data())
+    # O teardown (que registra a medição, inclusive do streaming) roda ao fechar a resposta
+    resposta.close()
+    latencia = time.perf_counter() - inicio
+    fases = _ultima.medicao.fases if _ultima.medicao is not None else {}
+    tempos = {coluna: sum(fases.get(fase, 0.0) for fase in nomes) for coluna, nomes in COLUNAS_FASES.items()}
+    return latencia, tempos, resposta.status_code, tamanho
+
+
+def executar_cenario(app, cenario, contexto, concorrencia, requisicoes, aquecimento=20, semente=0):
+    """Dispara `requisicoes` requisições do cenário em `concorrencia` threads e resume as medidas."""
+    rng = random.Random(semente)
+    cliente = app.test_client()
+    for _ in range(aquecimento):
+        _requisitar(cliente, cenario, contexto, rng)
+
+    amostras, falhas = [], []
+    contador = itertools.count()
+
+    def trabalhador(indice):
+        rng = random.Random(semente * 1000 + indice)
+        cliente = app.test_client()
+        while next(contador) < requisicoes:
+            try:
+                amostras.append(_requisitar(cliente, cenario, contexto, rng))
+            except Exception as err:
+                falhas.append(repr(err))
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concorrencia) as executor:
+        list(executor.map(trabalhador, range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+
+    status = Counter(str(amostra[2]) for amostra in amostras)
+    resultado = {
+        "cenario": cenario.nome,
+        "rota": f"{cenario.metodo} {cenario.regra}",
+        "linhas": contexto.linhas,
+        "concorrencia": concorrencia,
+        "requisicoes": len(amostras),
+        "duracao_s": round(duracao, 3),
+        "vazao_rps": round(len(amostras) / duracao, 1) if duracao else None,
+        "status": dict(sorted(status.items())),
+        "erros": len(falhas) + sum(quantidade for codigo, quantidade in status.items() if int(codigo) >= 500),
+        "bytes_medios": round(sum(amostra[3] for amostra in amostras) / len(amostras)) if amostras else 0,
+        "rss_pico_mb": rss_pico_mb(),
+    }
+    if amostras:
+        resultado["latencia_ms"] = _resumo_ms([amostra[0] for amostra in amostras])
+        for coluna in COLUNAS_FASES:
+            resultado[coluna] = _resumo_ms([amostra[1][coluna] for amostra in amostras])
+    if falhas:
+        resultado["excecoes"] = sorted(set(falhas))[:5]
+    return resultado
+
+
+@contextmanager
+def carga_de_fundo(app, cenario, contexto, concorrencia):
+    """Mantém `concorrencia` threads repetindo `cenario` enquanto o bloco roda; produz a contagem de status.
+
+    Serve para medir uma rota sob a pressão de outra (ex.: por_id durante varreduras).
+    """
+    parar = threading.Event()
+    status = Counter()
+
+    def trabalhador(indice):
+        rng = random.Random(10000 + indice)
+        cliente = app.test_client()
+        while not parar.is_set():
+            try:
+                status[str(_requisitar(cliente, cenario, contexto, rng)[2])] += 1
+            except Exception:
+                status["excecao"] += 1
+
+    threads = [threading.Thread(target=trabalhador, args=(indice,), daemon=True) for indice in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    try:
+        yield status
+    finally:
+        parar.set()
+        for thread in threads:
+            thread.join()
+
+
+def _criar_descartaveis(conectar, contexto, quantidade, semente):
+    """Insere direto no banco os imóveis que os cenários de alteração/remoção vão consumir."""
+    conn = conectar()
+    try:
+        _, maior = contar(conn)
+        inserir_sinteticos(conn, quantidade, semente, saida=None)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id from imoveis WHERE id > %s ORDER BY id", (maior,))
+        contexto.descartaveis.extend(linha[0] for linha in cursor.fetchall())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _remover_acima(conectar, maior_id):
+    """Desfaz as escritas do benchmark: o banco volta a ter só os imóveis da carga."""
+    conn = conectar()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM imoveis WHERE id > %s", (maior_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def rodar(servidor, conectar, linhas, cenarios, concorrencias, requisicoes, aquecimento=20, sem_cache=False, saida=print, fundo=None):
+    """Roda os cenários contra o banco de `conectar` e retorna a lista de resultados.
+
+    Com `fundo` = (cenário, concorrência), esse cenário roda sem parar enquanto cada um é medido.
+    """
+    conn = conectar()
+    try:
+        _, maior_id = contar(conn)
+    finally:
+        conn.close()
+
+    pool = ConnectionPool(conectar, **pool_config)
+    contexto = Contexto(linhas)
+    resultados = []
+    capacidade_cache = servidor.cache.max_itens
+    if sem_cache:
+        servidor.cache.max_itens = 0
+    try:
+        with instrumentar(servidor, pool):
+            for cenario in cenarios:
+                for concorrencia in concorrencias:
+                    if cenario.ids:
+                        _criar_descartaveis(conectar, contexto, (requisicoes + aquecimento) * cenario.ids, semente=len(resultados))
+                    # Cada cenário começa com o cache frio, independente da ordem
+                    servidor.cache.limpar()
+                    economizadas = servidor.coalescencia.stats()["economizadas"]
+                    if fundo is None:
+                        resultado = executar_cenario(servidor.app, cenario, contexto, concorrencia, requisicoes, aquecimento, semente=len(resultados))
+                    else:
+                        with carga_de_fundo(servidor.app, fundo[0], contexto, fundo[1]) as status_fundo:
+                            resultado = executar_cenario(servidor.app, cenario, contexto, concorrencia, requisicoes, aquecimento, semente=len(resultados))
+                        resultado["fundo"] = {"cenario": fundo[0].nome, "concorrencia": fundo[1], "status": dict(sorted(status_fundo.items()))}
+                    # Requisições (inclusive do aquecimento) atendidas pela consulta de outra
+                    resultado["coalescidas"] = servidor.coalescencia.stats()["economizadas"] - economizadas
+                    resultados.append(resultado)
+                    saida(_linha_resultado(resultado))
+    finally:
+        servidor.cache.max_itens = capacidade_cache
+        pool.fechar_todas()
+        if any(cenario.escrita for cenario in cenarios):
+            _remover_acima(conectar, maior_id)
+    return resultados
+
+
+def _linha_resultado(resultado):
+    latencia = resultado.get("latencia_ms", {})
+    return (
+        f"{resultado['cenario']:<16} n={resultado['linhas']:<8} c={resultado['concorrencia']:<3} "
+        f"{resultado['vazao_rps'] or 0:>9.1f} req/s  p50={latencia.get('p50', 0):>8.2f}ms "
+        f"p95={latencia.get('p95', 0):>8.2f}ms p99={latencia.get('p99', 0):>8.2f}ms "
+        f"banco={resultado.get('banco_ms', {}).get('media', 0):>7.2f}ms "
+        f"json={resultado.get('serializacao_ms', {}).get('media', 0):>7.2f}ms "
+        f"coalescidas={resultado.get('coalescidas', 0)} erros={resultado['erros']} rss={resultado['rss_pico_mb']}MB"
+    )
+
+
+def _commit_atual():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-sujo" if sujo else "")
+
+
+# Comparação entre execuções
+
+# Métrica -> True se maior é melhor
+METRICAS_COMPARADAS = {
+    ("vazao_rps",): True,
+    ("latencia_ms", "p95"): False,
+    ("latencia_ms", "p99"): False,
+}
+
+
+def _ler_metrica(resultado, caminho):
+    valor = resultado
+    for parte in caminho:
+        valor = valor.get(parte) if isinstance(valor, dict) else None
+    return valor
+
+
+def comparar(base, novo, tolerancia=10.0):
+    """Compara dois arquivos de resultado; retorna [(cenário, métrica, antes, depois, variação %, regrediu)]."""
+    chave = lambda resultado: (resultado["cenario"], resultado["linhas"], resultado["concorrencia"])
+    anteriores = {chave(resultado): resultado for resultado in base["resultados"]}
+    linhas = []
+    for resultado in novo["resultados"]:
+        anterior = anteriores.get(chave(resultado))
+        if anterior is None:
+            continue
+        for caminho, maior_melhor in METRICAS_COMPARADAS.items():
+            antes, depois = _ler_metrica(anterior, caminho), _ler_metrica(resultado, caminho)
+            if not antes or depois is None:
+                continue
+            variacao = (depois - antes) / antes * 100
+            piora = -variacao if maior_melhor else variacao
+            linhas.append((chave(resultado), ".".join(caminho), antes, depois, round(variacao, 1), piora > tolerancia))
+    return linhas
+
+
+# Serialização (sem banco nem HTTP): linhas por segundo de cada caminho
+
+def _dict_por_linha(imovel):
+    # Montagem anterior ao serializacao.py: um dicionário literal por linha, Decimal e date para o provedor do Flask
+    return {
+        "id": imovel[0],
+        "logradouro": imovel[1],
+        "tipo_logradouro": imovel[2],
+        "bairro": imovel[3],
+        "cidade": imovel[4],
+        "cep": imovel[5],
+        "tipo": imovel[6],
+        "valor": imovel[7],
+        "data_aquisicao": imovel[8]
+    }
+
+
+def medir_serializacao(linhas=100000, repeticoes=3, semente=0):
+    """Linhas/s (melhor de `repeticoes`) de linha do cursor até o texto JSON de uma resposta com `linhas` imóveis."""
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+
+    app = Flask("bench")
+    rng = random.Random(semente)
+    resultado = [(i + 1, *gerar_imovel(rng, i)) for i in range(linhas)]
+    anterior, atual = DefaultJSONProvider(app), ProvedorJSON(app)
+    caminhos = {
+        "dict_por_linha": lambda: anterior.dumps({"imoveis": [_dict_por_linha(linha) for linha in resultado]}),
+        "objetos": lambda: atual.dumps(corpo_imoveis(resultado)),
+        "colunas": lambda: atual.dumps(corpo_imoveis(resultado, formato=FORMATO_COLUNAS)),
+    }
+    medidas = {}
+    for nome, serializar in caminhos.items():
+        melhor = math.inf
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            texto = serializar()
+            melhor = min(melhor, time.perf_counter() - inicio)
+        medidas[nome] = {"linhas_por_s": round(linhas / melhor), "ms": round(melhor * 1000, 1), "bytes": len(texto.encode())}
+    return medidas
+
+
+# Servidor de produção (servir.py): tempo até ficar pronto e vazão por núcleo, com HTTP de verdade
+
+def _pedir(porta, url, cabecalhos=None):
+    conn = http.client.HTTPConnection("127.0.0.1", porta, timeout=30)
+    try:
+        conn.request("GET", url, headers=cabecalhos or {})
+        resposta = conn.getresponse()
+        resposta.read()
+        return resposta.status
+    finally:
+        conn.close()
+
+
+def medir_servir(caminho, linhas, processos, threads=False, cenario=None, concorrencia=16, duracao=10.0, prazo=60.0):
+    """Sobe servir.py com `processos` workers sobre o SQLite `caminho` e mede a subida, a vazão e o encerramento.
+
+    `pronto_ms` é o tempo do início do processo até o primeiro 200 de /saude/pronto;
+    `todos_prontos_ms`, até o último worker avisar que terminou o aquecimento. A carga
+    usa uma conexão por requisição, de `concorrencia` threads deste processo, que
+    divide a máquina com o servidor.
+    """
+    cenario = cenario or next(cenario for cenario in CENARIOS if cenario.nome == "por_id")
+    comando = [sys.executable, "servir.py", "--host", "127.0.0.1", "--porta", "0", "--processos", str(processos), "--sqlite", caminho]
+    if threads:
+        comando.append("--threads")
+
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(comando, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    porta_lida, estado, prontos = threading.Event(), {}, []
+
+    def ler_saida():
+        for linha in processo.stdout:
+            if linha.startswith("Ouvindo em "):
+                estado["porta"] = int(linha.split()[2].rsplit(":", 1)[1])
+                porta_lida.set()
+            elif linha.startswith("Worker ") and " pronto em " in linha:
+                prontos.append(time.perf_counter() - inicio)
+
+    threading.Thread(target=ler_saida, daemon=True).start()
+    amostras = []
+    try:
+        if not porta_lida.wait(prazo):
+            raise RuntimeError("servir.py não abriu a porta")
+        porta = estado["porta"]
+        while True:
+            try:
+                if _pedir(porta, "/saude/pronto") == 200:
+                    break
+            except OSError:
+                pass
+            if time.perf_counter() - inicio > prazo:
+                raise RuntimeError("servir.py não ficou pronto")
+            time.sleep(0.005)
+        pronto = time.perf_counter() - inicio
+        while len(prontos) < processos and time.perf_counter() - inicio < prazo:
+            time.sleep(0.005)
+
+        contexto = Contexto(linhas)
+        fim = time.perf_counter() + duracao
+
+        def trabalhador(indice):
+            rng = random.Random(indice)
+            while time.perf_counter() < fim:
+                url, _ = cenario.gerar(contexto, rng)
+                antes = time.perf_counter()
+                try:
+                    codigo = _pedir(porta, url, cenario.cabecalhos)
+                except OSError:
+                    codigo = "excecao"
+                amostras.append((time.perf_counter() - antes, codigo))
+
+        inicio_carga = time.perf_counter()
+        with ThreadPoolExecutor(concorrencia) as executor:
+            list(executor.map(trabalhador, range(concorrencia)))
+        duracao_carga = time.perf_counter() - inicio_carga
+    finally:
+        inicio_encerramento = time.perf_counter()
+        processo.send_signal(signal.SIGTERM)
+        try:
+            processo.wait(30)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+            processo.wait()
+        encerramento = time.perf_counter() - inicio_encerramento
+
+    # Com mais workers que núcleos a vazão por núcleo é a que interessa
+    nucleos = min(processos, os.cpu_count() or 1)
+    vazao = len(amostras) / duracao_carga
+    status = Counter(str(codigo) for _, codigo in amostras)
+    return {
+        "cenario": cenario.nome,
+        "linhas": linhas,
+        "processos": processos,
+        "threads": threads,
+        "nucleos": nucleos,
+        "concorrencia": concorrencia,
+        "pronto_ms": round(pronto * 1000, 1),
+        "todos_prontos_ms": round(max(prontos) * 1000, 1) if len(prontos) == processos else None,
+        "requisicoes": len(amostras),
+        "vazao_rps": round(vazao, 1),
+        "vazao_por_nucleo_rps": round(vazao / nucleos, 1),
+        "latencia_ms": _resumo_ms([latencia for latencia, _ in amostras]) if amostras else None,
+        "status": dict(sorted(status.items())),
+        "erros": sum(quantidade for codigo, quantidade in status.items() if codigo == "excecao" or int(codigo) >= 500),
+        "encerramento_ms": round(encerramento * 1000, 1),
+    }
+
+
+# Linha de comando
+
+def _lista_de_inteiros(texto):
+    return [int(parte) for parte in texto.split(",") if parte.strip()]
+
+
+def _argumentos(argv):
+    parser = argparse.ArgumentParser(prog="bench.py", description="Benchmark de carga das rotas de servidor.py")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    rodar_ = comandos.add_parser("rodar", help="roda os cenários e grava os resultados em JSON")
+    rodar_.add_argument("--linhas", type=_lista_de_inteiros, default=[10000], help="tamanhos da tabela, ex.: 10000,100000,1000000")
+    rodar_.add_argument("--concorrencia", type=_lista_de_inteiros, default=[1, 8], help="threads simultâneas, ex.: 1,8,32")
+    rodar_.add_argument("--requisicoes", type=int, default=500, help="requisições medidas por cenário e concorrência")
+    rodar_.add_argument("--aquecimento", type=int, default=20, help="requisições descartadas antes de medir")
+    rodar_.add_argument("--cenarios", help="só estes cenários (separados por vírgula)")
+    rodar_.add_argument("--sem-escritas", action="store_true", help="pula POST/PUT/DELETE")
+    rodar_.add_argument("--sem-cache", action="store_true", help="desliga o cache de leitura durante a medição")
+    rodar_.add_argument("--fundo", help="cenário:concorrência rodando sem parar durante as medições, ex.: listar_ndjson:16")
+    rodar_.add_argument("--banco", choices=("sqlite", "mysql"), default="sqlite")
+    rodar_.add_argument("--pasta-dados", default=PASTA_DADOS, help="onde ficam os SQLite semeados")
+    rodar_.add_argument("--saida", help="arquivo JSON de resultados (padrão: bench_resultados/<commit>-<data>.json)")
+
+    comparar_ = comandos.add_parser("comparar", help="compara dois arquivos de resultado")
+    comparar_.add_argument("base")
+    comparar_.add_argument("novo")
+    comparar_.add_argument("--tolerancia", type=float, default=10.0, help="piora aceita, em %%")
+
+    serializacao_ = comandos.add_parser("serializacao", help="mede linhas/s da conversão linha -> JSON")
+    serializacao_.add_argument("--linhas", type=int, default=100000, help="imóveis na resposta")
+    serializacao_.add_argument("--repeticoes", type=int, default=3, help="vale a melhor repetição")
+
+    servir_ = comandos.add_parser("servir", help="sobe servir.py e mede o tempo até ficar pronto e a vazão por núcleo")
+    servir_.add_argument("--processos", type=_lista_de_inteiros, default=[1, os.cpu_count() or 1], help="workers, ex.: 1,2,4")
+    servir_.add_argument("--threads", action="store_true", help="workers com uma thread por conexão")
+    servir_.add_argument("--linhas", type=int, default=10000, help="tamanho da tabela (SQLite semeado)")
+    servir_.add_argument("--cenario", default="por_id", help="cenário de leitura disparado na carga")
+    servir_.add_argument("--concorrencia", type=int, default=16, help="threads de carga")
+    servir_.add_argument("--duracao", type=float, default=10.0, help="segundos de carga por medição")
+    servir_.add_argument("--pasta-dados", default=PASTA_DADOS, help="onde ficam os SQLite semeados")
+    servir_.add_argument("--saida", help="arquivo JSON de resultados")
+    return parser.parse_args(argv)
+
+
+def _selecionar_cenarios(args):
+    cenarios = [cenario for cenario in CENARIOS if not (args.sem_escritas and cenario.escrita)]
+    if args.cenarios:
+        nomes = set(args.cenarios.split(","))
+        desconhecidos = nomes - {cenario.nome for cenario in CENARIOS}
+        if desconhecidos:
+            raise SystemExit(f"cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+        cenarios = [cenario for cenario in cenarios if cenario.nome in nomes]
+    return cenarios
+
+
+def _cenario_de_fundo(texto):
+    nome, _, concorrencia = texto.partition(":")
+    cenario = next((cenario for cenario in CENARIOS if cenario.nome == nome), None)
+    if cenario is None or cenario.escrita:
+        raise SystemExit(f"--fundo deve ser um cenário de leitura: {nome}")
+    return cenario, int(concorrencia or 8)
+
+
+def main(argv):
+    args = _argumentos(argv[1:])
+
+    if args.comando == "comparar":
+        with open(args.base, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)
+        with open(args.novo, encoding="utf-8") as arquivo:
+            novo = json.load(arquivo)
+        regressoes = 0
+        for (cenario, linhas, concorrencia), metrica, antes, depois, variacao, regrediu in comparar(base, novo, args.tolerancia):
+            regressoes += regrediu
+            marca = "REGRESSÃO" if regrediu else ""
+            print(f"{cenario:<16} n={linhas:<8} c={concorrencia:<3} {metrica:<16} {antes:>10} -> {depois:>10} ({variacao:+.1f}%) {marca}")
+        print(f"{regressoes} regressão(ões) acima de {args.tolerancia}%")
+        return 1 if regressoes else 0
+
+    if args.comando == "serializacao":
+        for caminho, medida in medir_serializacao(args.linhas, args.repeticoes).items():
+            print(f"{caminho:<16} {medida['linhas_por_s']:>9} linhas/s  {medida['ms']:>8.1f}ms  {medida['bytes']:>10} bytes")
+        return 0
+
+    if args.comando == "servir":
+        cenario = next((cenario for cenario in CENARIOS if cenario.nome == args.cenario), None)
+        if cenario is None or cenario.escrita:
+            raise SystemExit(f"--cenario deve ser um cenário de leitura: {args.cenario}")
+        caminho = preparar_sqlite(args.linhas, args.pasta_dados)
+        resultados = []
+        for processos in args.processos:
+            resultado = medir_servir(caminho, args.linhas, processos, args.threads, cenario, args.concorrencia, args.duracao)
+            resultados.append(resultado)
+            latencia = resultado["latencia_ms"] or {}
+            print(f"{resultado['cenario']:<16} p={processos:<3} {'threads' if args.threads else 'simples'}  "
+                  f"pronto={resultado['pronto_ms']:>7.1f}ms todos={resultado['todos_prontos_ms'] or 0:>7.1f}ms  "
+                  f"{resultado['vazao_rps']:>8.1f} req/s ({resultado['vazao_por_nucleo_rps']:>8.1f}/núcleo)  "
+                  f"p99={latencia.get('p99', 0):>8.2f}ms erros={resultado['erros']} encerramento={resultado['encerramento_ms']:.0f}ms")
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as arquivo:
+                json.dump({"meta": {"commit": _commit_atual(), "cpus": os.cpu_count(), "python": platform.python_version()},
+                           "resultados": resultados}, arquivo, ensure_ascii=False, indent=2)
+        return 1 if any(resultado["erros"] for resultado in resultados) else 0
+
+    if args.banco == "mysql" and len(args.linhas) > 1:
+        raise SystemExit("com --banco mysql rode um tamanho de tabela por vez (um banco por tamanho)")
+
+    # Importado só agora: o servidor lê a configuração do ambiente ao ser importado
+    import servidor
+
+    cenarios = _selecionar_cenarios(args)
+    fundo = _cenario_de_fundo(args.fundo) if args.fundo else None
+    inicio = datetime.now()
+    resultados = []
+    for linhas in args.linhas:
+        if args.banco == "sqlite":
+            caminho = preparar_sqlite(linhas, args.pasta_dados)
+            conectar = lambda caminho=caminho: banco_local.conectar(caminho)
+        else:
+            conectar = preparar_mysql(linhas)
+        resultados += rodar(servidor, conectar, linhas, cenarios, args.concorrencia, args.requisicoes, args.aquecimento, args.sem_cache, fundo=fundo)
+
+    commit = _commit_atual()
+    documento = {
+        "meta": {
+            "commit": commit,
+            "inicio": inicio.isoformat(timespec="seconds"),
+            "banco": args.banco,
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "pool": pool_config,
+            "cache": not args.sem_cache,
+            "requisicoes": args.requisicoes,
+            "fundo": args.fundo,
+        },
+        "resultados": resultados,
+    }
+    saida = args.saida or os.path.join("bench_resultados", f"{commit or 'sem-git'}-{inicio:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(saida) or ".", exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(documento, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {saida}")
+    return 1 if any(resultado["erros"] for resultado in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
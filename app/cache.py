@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+# Custo aproximado (em bytes) de cada entrada além do corpo da resposta
+_OVERHEAD_ENTRADA = 200
+
+
+class _Entrada:
+    __slots__ = ("valor", "tamanho", "expira_em", "tags")
+
+    def __init__(self, valor, tamanho, expira_em, tags):
+        self.valor = valor
+        self.tamanho = tamanho
+        self.expira_em = expira_em
+        self.tags = tags
+
+
+class CacheLRU:
+    """Cache LRU em memória com TTL, limite de itens/bytes e invalidação por tags.
+
+    Cada entrada é marcada com tags como ("cidade", "São Paulo") ou ("id", 42);
+    `invalidar` remove só as entradas que carregam alguma das tags pedidas.
+    """
+
+    def __init__(self, max_itens=1000, max_bytes=32 * 1024 * 1024, ttl=60.0):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._itens = OrderedDict()
+        self._por_tag = defaultdict(set)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expiradas = 0
+        self._invalidadas = 0
+
+    def get(self, chave):
+        """Retorna o valor guardado em `chave` ou None (ausente ou expirado)."""
+        with self._lock:
+            entrada = self._itens.get(chave)
+            if entrada is None:
+                self._misses += 1
+                return None
+            if entrada.expira_em <= time.monotonic():
+                self._remover(chave)
+                self._expiradas += 1
+                self._misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self._hits += 1
+            return entrada.valor
+
+    def set(self, chave, valor, tamanho, tags=(), valido=None):
+        """Guarda `valor` (que ocupa `tamanho` bytes) marcado com `tags`; retorna se guardou.
+
+        `valido`, se informada, é conferida sob o mesmo lock de `invalidar`:
+        uma invalidação que chega depois dela sempre alcança a entrada nova.
+        """
+        tamanho += _OVERHEAD_ENTRADA
+        if self.max_itens <= 0 or tamanho > self.max_bytes:
+            return False
+        tags = frozenset(tags)
+        with self._lock:
+            if valido is not None and not valido():
+                return False
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = _Entrada(valor, tamanho, time.monotonic() + self.ttl, tags)
+            self._bytes += tamanho
+            for tag in tags:
+                self._por_tag[tag].add(chave)
+            self._reduzir()
+            return True
+
+    def crescer(self, chave, bytes, valido=None):
+        """Soma `bytes` ao tamanho da entrada em `chave` (algo guardado no valor depois do set); retorna se somou.
+
+        `valido(valor)`, se informada, confere sob o lock que a entrada ainda é
+        a que recebeu os bytes, e não uma guardada de novo na mesma chave.
+        """
+        with self._lock:
+            entrada = self._itens.get(chave)
+            if entrada is None or (valido is not None and not valido(entrada.valor)):
+                return False
+            entrada.tamanho += bytes
+            self._bytes += bytes
+            self._reduzir()
+            return True
+
+    def invalidar(self, *tags):
+        """Remove todas as entradas marcadas com qualquer uma das `tags`; retorna quantas saíram."""
+        with self._lock:
+            chaves = set()
+            for tag in tags:
+                chaves |= self._por_tag.get(tag, set())
+            for chave in chaves:
+                self._remover(chave)
+            self._invalidadas += len(chaves)
+            return len(chaves)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._por_tag.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            consultas = self._hits + self._misses
+            return {
+                "itens": len(self._itens),
+                "bytes": self._bytes,
+                "max_itens": self.max_itens,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "taxa_acerto": self._hits / consultas if consultas else 0.0,
+                "evictions": self._evictions,
+                "expiradas": self._expiradas,
+                "invalidadas": self._invalidadas,
+            }
+
+    def _reduzir(self):
+        # Remove as menos usadas até voltar aos limites
+        while len(self._itens) > self.max_itens or self._bytes > self.max_bytes:
+            self._remover(next(iter(self._itens)))
+            self._evictions += 1
+
+    def _remover(self, chave):
+        entrada = self._itens.pop(chave)
+        self._bytes -= entrada.tamanho
+        for tag in entrada.tags:
+            chaves = self._por_tag.get(tag)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._por_tag[tag]
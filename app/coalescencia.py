@@ -0,0 +1,79 @@
+"""Coalescência (single-flight) de leituras idênticas simultâneas.
+
+Quando uma listagem popular esfria no cache ou é invalidada, várias
+requisições iguais chegam juntas; em vez de cada uma abrir uma conexão e
+rodar o mesmo SELECT, só a primeira consulta o banco e as outras esperam e
+reaproveitam a resposta já serializada.
+"""
+import threading
+
+
+class _Voo:
+    """Uma execução em andamento; os seguidores esperam `pronto`."""
+
+    __slots__ = ("pronto", "resultado", "erro")
+
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class Coalescedor:
+    """Single-flight: chamadas simultâneas com a mesma chave esperam a primeira e recebem o mesmo resultado.
+
+    Quem chega primeiro (o líder) executa a função; quem chega enquanto ela
+    roda espera até `timeout` segundos e recebe o resultado (ou a exceção) do
+    líder. Se o líder demorar mais que isso, o seguidor executa por conta própria,
+    para que uma consulta travada não prenda todas as outras.
+    """
+
+    def __init__(self, timeout=5.0):
+        self.timeout = timeout
+        self._voos = {}
+        self._lock = threading.Lock()
+
+        self._lideres = 0
+        self._economizadas = 0
+        self._timeouts = 0
+
+    def executar(self, chave, funcao):
+        with self._lock:
+            voo = self._voos.get(chave)
+            lider = voo is None
+            if lider:
+                voo = self._voos[chave] = _Voo()
+                self._lideres += 1
+
+        if lider:
+            try:
+                voo.resultado = funcao()
+                return voo.resultado
+            except BaseException as err:
+                voo.erro = err
+                raise
+            finally:
+                # Sai do mapa antes de acordar os seguidores: quem chegar agora começa outra execução
+                with self._lock:
+                    del self._voos[chave]
+                voo.pronto.set()
+
+        if not voo.pronto.wait(self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            return funcao()
+        with self._lock:
+            self._economizadas += 1
+        if voo.erro is not None:
+            raise voo.erro
+        return voo.resultado
+
+    def stats(self):
+        with self._lock:
+            return {
+                "timeout": self.timeout,
+                "em_andamento": len(self._voos),
+                "lideres": self._lideres,
+                "economizadas": self._economizadas,
+                "timeouts": self._timeouts,
+            }
@@ -0,0 +1,105 @@
+"""Compressão das respostas negociada pelo Accept-Encoding.
+
+gzip está sempre disponível; zstd e br entram quando os pacotes `zstandard`
+e `brotli` estão instalados. As respostas já prontas são comprimidas de uma
+vez; as de streaming, pedaço a pedaço, com um flush por pedaço para o
+cliente continuar recebendo os lotes assim que saem do banco.
+"""
+import zlib
+
+from metricas import medir
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Ordem de preferência do servidor quando o cliente aceita várias com a mesma qualidade
+CODIFICACOES = tuple(
+    nome for nome, disponivel in (("zstd", zstandard), ("br", brotli), ("gzip", True)) if disponivel
+)
+
+# Tipos que valem a pena comprimir (JSON, NDJSON e o texto do /metrics)
+TIPOS_COMPRIMIVEIS = ("application/json", "application/x-ndjson", "text/plain")
+
+
+def escolher(aceitas, disponiveis=CODIFICACOES):
+    """Codificação a usar para o `Accept-Encoding` (werkzeug `request.accept_encodings`), ou None."""
+    melhor, qualidade_melhor = None, 0
+    for nome in disponiveis:
+        qualidade = aceitas[nome]
+        if qualidade > qualidade_melhor:
+            melhor, qualidade_melhor = nome, qualidade
+    return melhor
+
+
+class _Gzip:
+    def __init__(self, nivel):
+        # wbits=31: cabeçalho e rodapé do gzip
+        self._obj = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+
+    def comprimir(self, dados):
+        return self._obj.compress(dados) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _Zstd:
+    def __init__(self, nivel):
+        self._obj = zstandard.ZstdCompressor(level=nivel).compressobj()
+
+    def comprimir(self, dados):
+        return self._obj.compress(dados) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finalizar(self):
+        return self._obj.flush()
+
+
+class _Brotli:
+    def __init__(self, nivel):
+        # O nível do brotli vai de 0 a 11; 4 a 6 é o equilíbrio usual para respostas dinâmicas
+        self._obj = brotli.Compressor(quality=min(nivel, 11))
+
+    def comprimir(self, dados):
+        return self._obj.process(dados) + self._obj.flush()
+
+    def finalizar(self):
+        return self._obj.finish()
+
+
+_COMPRESSORES = {"gzip": _Gzip, "zstd": _Zstd, "br": _Brotli}
+
+
+def comprimir(dados, codificacao, nivel=6):
+    """Comprime um corpo inteiro."""
+    compressor = _COMPRESSORES[codificacao](nivel)
+    return compressor.comprimir(dados) + compressor.finalizar()
+
+
+def comprimir_pedacos(pedacos, codificacao, nivel=6):
+    """Comprime uma resposta em streaming sem juntar os pedaços (str ou bytes).
+
+    Fecha o iterável original no fim (ou quando o cliente desconecta), como o
+    servidor WSGI faria com ele, para a conexão do streaming voltar ao pool.
+    """
+    compressor = _COMPRESSORES[codificacao](nivel)
+    try:
+        for pedaco in pedacos:
+            if isinstance(pedaco, str):
+                pedaco = pedaco.encode()
+            if pedaco:
+                with medir("compressao"):
+                    comprimido = compressor.comprimir(pedaco)
+                yield comprimido
+        yield compressor.finalizar()
+    finally:
+        fechar = getattr(pedacos, "close", None)
+        if fechar is not None:
+            fechar()
@@ -14,3 +14,121 @@ config = {
     'ssl_ca': os.getenv('SSL_CA_PATH')  # Caminho para o certificado SSL
 }
 
+
+# Configurações do pool de conexões (ver utils.connect_db)
+pool_config = {
+    'tamanho': int(os.getenv('DB_POOL_SIZE', 5)),  # Número máximo de conexões abertas por processo
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),  # Segundos que um pedido espera por uma conexão livre
+    'validar_apos': float(os.getenv('DB_POOL_VALIDAR_APOS', 30)),  # Conexões ociosas há mais tempo levam um ping antes do uso
+    'max_ociosa': float(os.getenv('DB_POOL_MAX_OCIOSA', 300)),  # Conexões ociosas há mais tempo são descartadas
+}
+
+# Paginação por cursor (keyset em `id`) das rotas de listagem
+paginacao_config = {
+    'padrao': int(os.getenv('PAGINA_PADRAO', 100)),  # Tamanho da página quando `limit` não é informado
+    'maximo': int(os.getenv('PAGINA_MAXIMA', 1000)),  # Maior `limit` aceito
+}
+
+# Respostas em streaming (?formato=ndjson|stream) das rotas de listagem
+stream_config = {
+    'lote': int(os.getenv('STREAM_LOTE', 1000)),  # Linhas lidas por fetchmany em cada lote
+}
+
+# Cache em memória das rotas por id/tipo/cidade (invalidado pelas escritas)
+cache_config = {
+    'max_itens': int(os.getenv('CACHE_MAX_ITENS', 10000)),  # 0 desliga o cache
+    'max_bytes': int(os.getenv('CACHE_MAX_BYTES', 64 * 1024 * 1024)),  # Memória máxima ocupada pelos corpos guardados
+    'ttl': float(os.getenv('CACHE_TTL', 60)),  # Segundos até uma entrada expirar mesmo sem escrita
+}
+
+# Versão da tabela compartilhada entre processos (migração 0008): escritas de outros workers,
+# da transferencia.py ou direto no banco derrubam o cache e mudam as ETags deste processo
+versao_config = {
+    'intervalo': float(os.getenv('VERSAO_INTERVALO', 1)),  # Segundos entre as leituras da versão no banco; 0 desliga
+}
+
+# Escritas em lote (/imoveis/batch)
+lote_config = {
+    'tamanho': int(os.getenv('LOTE_TAMANHO', 1000)),  # Linhas por executemany/commit
+}
+
+# Réplica em memória da tabela imoveis para as rotas de leitura (replica.py)
+replica_config = {
+    'ativa': os.getenv('LEITURA_MEMORIA', '0') == '1',  # Liga o modo de leitura em memória
+    'max_linhas': int(os.getenv('REPLICA_MAX_LINHAS', 2000000)),  # Acima disso a réplica desliga e as leituras voltam ao banco
+    'intervalo_sync': float(os.getenv('REPLICA_INTERVALO_SYNC', 5)),  # Segundos entre as sincronizações incrementais
+    'max_transacao': float(os.getenv('REPLICA_MAX_TRANSACAO', 600)),  # Duração máxima (s) de uma transação de escrita na tabela
+}
+
+# Réplicas de leitura do MySQL: "host1:3306,host2" (mesmo usuário, senha e banco do primário)
+replicas_config = {
+    'hosts': [host.strip() for host in os.getenv('DB_REPLICAS', '').split(',') if host.strip()],
+    'politica': os.getenv('DB_REPLICAS_POLITICA', 'round_robin'),  # round_robin ou menos_ocupada
+    'sticky': float(os.getenv('DB_STICKY_SEGUNDOS', 5)),  # Depois de escrever, o cliente lê do primário por esse tempo
+    'intervalo_health': float(os.getenv('DB_REPLICAS_HEALTH', 10)),  # Segundos entre os health checks
+    'ejecao': float(os.getenv('DB_REPLICAS_EJECAO', 30)),  # Segundos que uma réplica com falha fica fora do rodízio
+}
+
+
+# Métricas por rota em /metrics (metricas.py)
+metricas_config = {
+    'ativas': os.getenv('METRICAS', '1') == '1',  # Mede as fases de cada requisição
+    'server_timing': os.getenv('SERVER_TIMING', '0') == '1',  # Devolve os tempos no cabeçalho Server-Timing
+}
+
+
+# Log de consultas lentas com EXPLAIN (consultas_lentas.py); depende de METRICAS=1
+consultas_lentas_config = {
+    'ativas': os.getenv('CONSULTAS_LENTAS', '1') == '1',  # Ranking em /interno/consultas e log das lentas
+    'limiar': float(os.getenv('CONSULTAS_LENTAS_MS', 200)) / 1000,  # Acima disso (execute + fetch) a consulta é lenta
+    'arquivo': os.getenv('CONSULTAS_LENTAS_ARQUIVO', 'consultas_lentas.log'),  # Arquivo do log (rotativo)
+    'max_bytes': int(os.getenv('CONSULTAS_LENTAS_MAX_BYTES', 10 * 1024 * 1024)),  # Tamanho em que o arquivo roda
+    'backups': int(os.getenv('CONSULTAS_LENTAS_BACKUPS', 5)),  # Arquivos antigos mantidos
+    'por_minuto': int(os.getenv('CONSULTAS_LENTAS_POR_MINUTO', 60)),  # Máximo de linhas de log por minuto
+    'top': int(os.getenv('CONSULTAS_LENTAS_TOP', 50)),  # Consultas mostradas em /interno/consultas
+}
+
+
+# Compressão das respostas negociada pelo Accept-Encoding (compressao.py)
+compressao_config = {
+    'ativa': os.getenv('COMPRESSAO', '1') == '1',  # gzip sempre; zstd e br se os pacotes estiverem instalados
+    'minimo': int(os.getenv('COMPRESSAO_MINIMO', 1024)),  # Corpos menores (em bytes) saem sem compressão
+    'nivel': int(os.getenv('COMPRESSAO_NIVEL', 6)),  # Nível do compressor: 1 (rápido) a 9 (menor)
+}
+
+
+# Coalescência de leituras idênticas simultâneas nas rotas GET (coalescencia.py)
+coalescencia_config = {
+    'ativa': os.getenv('COALESCENCIA', '1') == '1',  # Requisições iguais em andamento esperam uma só consulta
+    'timeout': float(os.getenv('COALESCENCIA_TIMEOUT', 5)),  # Segundos que uma requisição espera a primeira antes de consultar sozinha
+}
+
+
+# Controle de admissão na frente do banco (admissao.py)
+admissao_config = {
+    'taxa': float(os.getenv('ADMISSAO_TAXA', 0)),  # Requisições por segundo por cliente (IP); 0 desliga o limite
+    'rajada': int(os.getenv('ADMISSAO_RAJADA', 100)),  # Requisições seguidas aceitas antes de a taxa valer
+    'fila': os.getenv('ADMISSAO_FILA_BANCO', '1') == '1',  # Liga a fila limitada para o trabalho no banco
+    # Requisições trabalhando no banco ao mesmo tempo; padrão: uma por conexão do primário e das réplicas
+    'vagas': int(os.getenv('ADMISSAO_VAGAS', 0)) or pool_config['tamanho'] * (1 + len(replicas_config['hosts'])),
+    'fila_maxima': int(os.getenv('ADMISSAO_FILA_MAXIMA', 100)),  # Requisições esperando vaga; as seguintes recebem 503
+    'prazo': float(os.getenv('ADMISSAO_PRAZO', 5)),  # Segundos de espera por uma vaga antes do 503
+}
+
+
+# Servidor de produção (servir.py): mestre e workers pré-criados com fork
+servir_config = {
+    'host': os.getenv('SERVIDOR_HOST', '0.0.0.0'),
+    'porta': int(os.getenv('SERVIDOR_PORTA', 8000)),
+    'processos': int(os.getenv('SERVIDOR_PROCESSOS', 0)) or os.cpu_count() or 1,  # Workers; padrão: um por núcleo
+    'threads': os.getenv('SERVIDOR_THREADS', '0') == '1',  # Cada worker atende várias conexões ao mesmo tempo (uma thread por conexão)
+    'aquecer': int(os.getenv('SERVIDOR_AQUECER', pool_config['tamanho'])),  # Conexões que cada worker abre antes de atender
+    'graca': float(os.getenv('SERVIDOR_GRACA', 30)),  # Segundos para os workers terminarem as requisições ao encerrar
+    'drenar': float(os.getenv('SERVIDOR_DRENAR', 0)),  # Segundos com /saude/pronto em 503 antes de parar de aceitar conexões
+}
+
+
+def config_replica(endereco):
+    """Configuração de conexão de uma réplica a partir de "host[:porta]"."""
+    host, _, porta = endereco.partition(':')
+    return {**config, 'host': host, 'port': int(porta or config['port'])}
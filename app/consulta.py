@@ -0,0 +1,298 @@
+import base64
+import json
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+
+# Colunas da tabela imoveis, na ordem de SELECT *
+COLUNAS = ("id", "logradouro", "tipo_logradouro", "bairro", "cidade", "cep", "tipo", "valor", "data_aquisicao")
+
+
+def _texto(valor):
+    if not valor.strip():
+        raise ValueError("não pode ser vazio")
+    return valor
+
+
+def _decimal(valor):
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        raise ValueError("deve ser numérico")
+    if not numero.is_finite():
+        raise ValueError("deve ser numérico")
+    return numero
+
+
+def _data(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ValueError("deve estar no formato AAAA-MM-DD")
+
+
+def _prefixo_cep(valor):
+    if not (1 <= len(valor) <= 8 and valor.isdigit()):
+        raise ValueError("deve ter de 1 a 8 dígitos")
+    return valor
+
+
+# Filtros aceitos: parâmetro -> (trecho SQL, conversor). Só nomes desta lista chegam ao SQL.
+FILTROS = {
+    "tipo": ("tipo = %s", _texto),
+    "cidade": ("cidade = %s", _texto),
+    "bairro": ("bairro = %s", _texto),
+    "valor_min": ("valor >= %s", _decimal),
+    "valor_max": ("valor <= %s", _decimal),
+    "data_de": ("data_aquisicao >= %s", _data),
+    "data_ate": ("data_aquisicao <= %s", _data),
+}
+
+# Colunas pelas quais a busca pode ordenar, com o conversor do valor guardado no cursor
+ORDENACOES = {
+    "id": int,
+    "valor": Decimal,
+    "data_aquisicao": date.fromisoformat,
+}
+
+
+# Rotas de faixa e top-N: coluna -> filtros da busca que limitam o início e o fim da faixa
+FAIXAS = {
+    "valor": ("valor_min", "valor_max"),
+    "data_aquisicao": ("data_de", "data_ate"),
+}
+
+
+def args_da_faixa(coluna, args, ordem_padrao="asc"):
+    """Traduz `de`, `ate`, `ordem` (asc/desc), `cidade`, `tipo` e `after` para os parâmetros de montar_busca."""
+    if coluna not in FAIXAS:
+        raise ValueError(f"coluna deve ser uma de: {', '.join(FAIXAS)}")
+    ordem = args.get("ordem", ordem_padrao)
+    if ordem not in ("asc", "desc"):
+        raise ValueError("ordem deve ser asc ou desc")
+
+    traduzidos = {nome: args[nome] for nome in ("cidade", "tipo", "after") if nome in args}
+    for nome, filtro in zip(("de", "ate"), FAIXAS[coluna]):
+        if nome in args:
+            try:
+                FILTROS[filtro][1](args[nome])
+            except ValueError as err:
+                raise ValueError(f"{nome} {err}")
+            traduzidos[filtro] = args[nome]
+    traduzidos["sort"] = f"-{coluna}" if ordem == "desc" else coluna
+    return traduzidos
+
+
+def ler_campos(valor):
+    """`fields=id,cep,valor` -> colunas pedidas, na ordem pedida (None quando o parâmetro não veio)."""
+    if valor is None:
+        return None
+    pedidos = [campo.strip() for campo in valor.split(",") if campo.strip()]
+    if not pedidos or any(campo not in COLUNAS for campo in pedidos):
+        raise ValueError(f"fields deve ser uma lista separada por vírgulas de: {', '.join(COLUNAS)}")
+    return tuple(dict.fromkeys(pedidos))
+
+
+def projecao(campos, *obrigatorias):
+    """Colunas do SELECT que atendem `campos`, na ordem de COLUNAS.
+
+    O id vem sempre (cursor `next` e tags do cache dependem dele), assim como
+    as `obrigatorias` (ex.: a coluna de ordenação da busca).
+    """
+    if campos is None:
+        return COLUNAS
+    return tuple(coluna for coluna in COLUNAS if coluna == "id" or coluna in campos or coluna in obrigatorias)
+
+
+def faixa_cep(prefixo):
+    """Converte um prefixo de CEP no intervalo fechado equivalente (ex.: '0455' -> '04550000'..'04559999')."""
+    return prefixo.ljust(8, "0"), prefixo.ljust(8, "9")
+
+
+# Níveis do CEP: cada dígito a mais no prefixo é uma divisão menor dos Correios
+NIVEIS_CEP = {1: "região", 2: "sub-região", 3: "setor", 4: "subsetor", 5: "divisor de subsetor"}
+
+
+def ler_faixa_cep(args):
+    """`prefixo=0455` ou `de=01&ate=05` (completados com 0 e 9) -> intervalo fechado de CEPs."""
+    try:
+        if "prefixo" in args:
+            if "de" in args or "ate" in args:
+                raise ValueError("use prefixo ou de/ate, não os dois")
+            return faixa_cep(_prefixo_cep(args["prefixo"]))
+        if "de" in args or "ate" in args:
+            inicio = faixa_cep(_prefixo_cep(args.get("de", "0")))[0]
+            fim = faixa_cep(_prefixo_cep(args.get("ate", "9")))[1]
+            if inicio > fim:
+                raise ValueError("de deve ser menor ou igual a ate")
+            return inicio, fim
+    except ValueError as err:
+        raise ValueError(f"cep {err}")
+    return None
+
+
+def montar_busca_cep(args, limit, colunas="*"):
+    """SELECT dos imóveis numa faixa de CEP, em ordem de (cep, id), com keyset; sem faixa, todos os CEPs.
+
+    O intervalo fechado é um range scan no índice de cep, que termina no id: não há filesort.
+    """
+    inicio, fim = ler_faixa_cep(args) or faixa_cep("")
+    where, params = ["cep BETWEEN %s AND %s"], [inicio, fim]
+    if "after" in args:
+        ultimo_cep, ultimo_id = decodificar_cursor(args["after"], [str, int])
+        where.append("(cep > %s OR (cep = %s AND id > %s))")
+        params += [ultimo_cep, ultimo_cep, ultimo_id]
+    sql = f"SELECT {colunas} from imoveis WHERE {' AND '.join(where)} ORDER BY cep ASC, id ASC LIMIT %s"
+    params.append(limit + 1)
+    return sql, tuple(params)
+
+
+def montar_contagem_cep(args):
+    """Quantidade de imóveis por prefixo de `nivel` dígitos (1 a 5), opcionalmente numa faixa de CEP.
+
+    Soma as linhas de imoveis_cep (uma por prefixo de 5 dígitos, mantida por
+    triggers), nunca o índice de cep: por isso a faixa também vai até 5 dígitos.
+    """
+    try:
+        nivel = int(args.get("nivel", 1))
+    except ValueError:
+        raise ValueError("nivel deve ser um número inteiro")
+    if nivel not in NIVEIS_CEP:
+        raise ValueError(f"nivel deve estar entre 1 e {len(NIVEIS_CEP)}")
+    if any(len(args[chave]) > len(NIVEIS_CEP) for chave in ("prefixo", "de", "ate") if chave in args):
+        raise ValueError(f"cep deve ter até {len(NIVEIS_CEP)} dígitos na contagem")
+    sql = "SELECT LEFT(prefixo, %s) AS grupo, SUM(quantidade) from imoveis_cep"
+    params = [nivel]
+    faixa = ler_faixa_cep(args)
+    if faixa is not None:
+        sql += " WHERE prefixo BETWEEN %s AND %s"
+        params += [cep[:len(NIVEIS_CEP)] for cep in faixa]
+    return sql + " GROUP BY grupo ORDER BY grupo", tuple(params), nivel
+
+
+def codificar_cursor(valores):
+    """Cursor opaco (base64 de JSON) com os valores da última linha da página."""
+    bruto = json.dumps([str(valor) if isinstance(valor, (Decimal, date)) else valor for valor in valores])
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, conversores):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+        if len(valores) != len(conversores):
+            raise ValueError
+        return [converter(valor) for converter, valor in zip(conversores, valores)]
+    except (ValueError, TypeError):
+        raise ValueError("after inválido")
+
+
+def ler_ordenacao(sort):
+    """`sort=valor` (crescente) ou `sort=-valor` (decrescente); retorna (coluna, decrescente)."""
+    decrescente = sort.startswith("-")
+    coluna = sort.lstrip("-")
+    if coluna not in ORDENACOES:
+        raise ValueError(f"sort deve ser um de: {', '.join(ORDENACOES)} (prefixe com - para decrescente)")
+    return coluna, decrescente
+
+
+def montar_busca(args, limit, colunas="*"):
+    """Compila os parâmetros da busca num único SELECT parametrizado.
+
+    Retorna (sql, params, coluna de ordenação). A paginação é por keyset sobre
+    (coluna de ordenação, id), então `after` é o cursor `next` da página anterior.
+    """
+    where, params = [], []
+    for nome, (trecho, converter) in FILTROS.items():
+        if nome in args:
+            try:
+                params.append(converter(args[nome]))
+            except ValueError as err:
+                raise ValueError(f"{nome} {err}")
+            where.append(trecho)
+
+    if "cep" in args:
+        try:
+            inicio, fim = faixa_cep(_prefixo_cep(args["cep"]))
+        except ValueError as err:
+            raise ValueError(f"cep {err}")
+        # Intervalo em vez de LIKE/LEFT(): é um range scan no índice de cep
+        where.append("cep BETWEEN %s AND %s")
+        params += [inicio, fim]
+
+    coluna, decrescente = ler_ordenacao(args.get("sort", "id"))
+    comparador, direcao = ("<", "DESC") if decrescente else (">", "ASC")
+
+    if "after" in args:
+        if coluna == "id":
+            (ultimo_id,) = decodificar_cursor(args["after"], [int])
+            where.append(f"id {comparador} %s")
+            params.append(ultimo_id)
+        else:
+            ultimo, ultimo_id = decodificar_cursor(args["after"], [ORDENACOES[coluna], int])
+            # Equivalente a (coluna, id) > (ultimo, ultimo_id), escrito de forma que o MySQL usa como range
+            where.append(f"({coluna} {comparador} %s OR ({coluna} = %s AND id {comparador} %s))")
+            params += [ultimo, ultimo, ultimo_id]
+
+    ordem = f"id {direcao}" if coluna == "id" else f"{coluna} {direcao}, id {direcao}"
+    sql = f"SELECT {colunas} from imoveis"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {ordem} LIMIT %s"
+    params.append(limit + 1)
+    return sql, tuple(params), coluna
+
+
+# Busca textual (/imoveis/busca?q=) no índice FULLTEXT de logradouro e bairro (migração 0006)
+_MATCH = "MATCH(logradouro, bairro) AGAINST (%s IN BOOLEAN MODE)"
+_PALAVRA = re.compile(r"\w+")
+
+# Palavras menores que isso ficam fora do índice (innodb_ft_min_token_size) e são ignoradas
+MIN_LETRAS_BUSCA = 3
+MAX_PALAVRAS_BUSCA = 8
+# O tipo do logradouro fica em outra coluna: "Rua Sete de Setembro" busca só "Sete" e "Setembro"
+PALAVRAS_IGNORADAS = {"rua", "avenida", "travessa", "alameda", "praça", "praca", "estrada", "rodovia", "das", "dos"}
+
+
+def termos_busca(q):
+    """Texto livre -> consulta do modo booleano: toda palavra obrigatória e como prefixo ("sete set" -> "+sete* +set*")."""
+    palavras = [
+        palavra for palavra in _PALAVRA.findall(q or "")
+        if len(palavra) >= MIN_LETRAS_BUSCA and palavra.lower() not in PALAVRAS_IGNORADAS
+    ]
+    if not palavras:
+        raise ValueError(f"q deve ter ao menos uma palavra com {MIN_LETRAS_BUSCA} ou mais letras")
+    # Os operadores do modo booleano (+ - * " etc.) nunca chegam ao MySQL: só as palavras
+    return " ".join(f"+{palavra}*" for palavra in list(dict.fromkeys(palavras))[:MAX_PALAVRAS_BUSCA])
+
+
+def montar_busca_texto(q, limit, after=None, colunas="*"):
+    """SELECT da busca textual, ordenado por relevância (e id nos empates), com keyset sobre (relevancia, id).
+
+    A relevância é a última coluna de cada linha; `after` é o cursor `next` da página anterior.
+    """
+    termos = termos_busca(q)
+    where, params = [_MATCH], [termos, termos]
+    if after is not None:
+        relevancia, ultimo_id = decodificar_cursor(after, [float, int])
+        where.append(f"({_MATCH} < %s OR ({_MATCH} = %s AND id > %s))")
+        params += [termos, relevancia, termos, relevancia, ultimo_id]
+    sql = (
+        f"SELECT {colunas}, {_MATCH} AS relevancia from imoveis WHERE {' AND '.join(where)}"
+        " ORDER BY relevancia DESC, id ASC LIMIT %s"
+    )
+    params.append(limit + 1)
+    return sql, tuple(params)
+
+
+def cursor_da_relevancia(linha):
+    """Cursor `next` da busca textual: (relevância, id) da última linha."""
+    return codificar_cursor([linha[-1], linha[0]])
+
+
+def cursor_da_linha(linha, coluna, colunas=COLUNAS):
+    """Cursor `next` a partir da última linha devolvida (com as `colunas` do SELECT, id primeiro)."""
+    if coluna == "id":
+        return codificar_cursor([linha[0]])
+    return codificar_cursor([linha[colunas.index(coluna)], linha[0]])
@@ -0,0 +1,235 @@
+"""Log de consultas lentas com EXPLAIN automático.
+
+Toda consulta feita pelas rotas passa pelo cursor medido (metricas.py); no fim
+da requisição cada uma é somada ao ranking em memória (top-N por tempo total,
+em /interno/consultas) e as que passam do limiar vão para um arquivo rotativo,
+uma linha JSON por consulta, com o plano do EXPLAIN capturado em segundo plano.
+"""
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+
+
+_ESPACOS = re.compile(r"\s+")
+_LISTA_IN = re.compile(r"%s(?:\s*,\s*%s)+")
+_TEXTO = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+# Comandos que o MySQL aceita em EXPLAIN
+_EXPLICAVEIS = ("SELECT", "UPDATE", "DELETE")
+
+# Limite de parâmetros e de caracteres por parâmetro guardados no log
+_MAX_PARAMS = 20
+_MAX_TEXTO = 200
+
+
+def normalizar(sql):
+    """Forma canônica do comando para agrupar execuções: literais viram ? e listas IN viram `%s, ...`."""
+    sql = _ESPACOS.sub(" ", sql).strip()
+    sql = _LISTA_IN.sub("%s, ...", sql)
+    sql = _TEXTO.sub("?", sql)
+    return _NUMERO.sub("?", sql)
+
+
+def _para_json(valor):
+    if isinstance(valor, (Decimal, date, datetime, bytes)):
+        valor = valor.decode(errors="replace") if isinstance(valor, bytes) else str(valor)
+    if isinstance(valor, str) and len(valor) > _MAX_TEXTO:
+        return valor[:_MAX_TEXTO] + "..."
+    return valor
+
+
+def varredura_completa(plano):
+    """O plano lê a tabela inteira? (type=ALL no MySQL, SCAN sem índice no SQLite)."""
+    for linha in plano:
+        if linha.get("type") == "ALL":
+            return True
+        detalhe = str(linha.get("detail", ""))
+        if detalhe.startswith("SCAN") and "USING" not in detalhe:
+            return True
+    return False
+
+
+class _Agregado:
+    __slots__ = ("sql", "execucoes", "total", "maximo", "linhas", "lentas", "plano", "rotas")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.execucoes = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.linhas = 0
+        self.lentas = 0
+        self.plano = None
+        self.rotas = set()
+
+    def como_dict(self):
+        return {
+            "sql": self.sql,
+            "execucoes": self.execucoes,
+            "total_ms": round(self.total * 1000, 3),
+            "media_ms": round(self.total / self.execucoes * 1000, 3),
+            "max_ms": round(self.maximo * 1000, 3),
+            "linhas_media": round(self.linhas / self.execucoes, 1),
+            "lentas": self.lentas,
+            "rotas": sorted(self.rotas),
+            "varredura_completa": varredura_completa(self.plano) if self.plano is not None else None,
+            "explain": self.plano,
+        }
+
+
+class RegistroConsultasLentas:
+    """Ranking por tempo total de todas as consultas e log (com EXPLAIN) das que passam de `limiar` segundos.
+
+    O log é limitado a `por_minuto` linhas por minuto (as excedentes só são
+    contadas) e cada comando normalizado ganha no máximo um EXPLAIN por minuto.
+    """
+
+    def __init__(self, conectar, limiar=0.2, arquivo="consultas_lentas.log", max_bytes=10 * 1024 * 1024,
+                 backups=5, por_minuto=60, top=50, max_distintas=1000):
+        self.conectar = conectar
+        self.limiar = limiar
+        self.arquivo = arquivo
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.por_minuto = por_minuto
+        self.top = top
+        self.max_distintas = max_distintas
+
+        self._agregados = {}
+        self._lock = threading.Lock()
+        self._fichas = float(por_minuto)
+        self._reposto_em = time.monotonic()
+        self._ultimo_explain = {}
+        self._registradas = 0
+        self._suprimidas = 0
+
+        self._fila = queue.Queue(maxsize=100)
+        self._thread = None
+        self._arquivo_log = None
+
+    def observar(self, rota, sql, params, duracao, linhas):
+        """Conta uma execução; se passou do limiar, agenda o registro no log."""
+        normalizado = normalizar(sql)
+        lenta = duracao >= self.limiar
+        with self._lock:
+            agregado = self._agregados.get(normalizado)
+            if agregado is None:
+                if len(self._agregados) >= self.max_distintas:
+                    self._descartar_menor()
+                agregado = self._agregados[normalizado] = _Agregado(normalizado)
+            agregado.execucoes += 1
+            agregado.total += duracao
+            agregado.maximo = max(agregado.maximo, duracao)
+            agregado.linhas += linhas
+            agregado.rotas.add(rota)
+            if not lenta:
+                return
+            agregado.lentas += 1
+            if not self._tem_ficha():
+                self._suprimidas += 1
+                return
+            agora = time.monotonic()
+            explicar = agora - self._ultimo_explain.get(normalizado, -60.0) >= 60.0
+            if explicar:
+                self._ultimo_explain[normalizado] = agora
+
+        entrada = {
+            "quando": datetime.now().isoformat(timespec="milliseconds"),
+            "rota": rota,
+            "sql": normalizado,
+            "params": [_para_json(param) for param in list(params or ())[:_MAX_PARAMS]],
+            "linhas": linhas,
+            "duracao_ms": round(duracao * 1000, 3),
+        }
+        try:
+            self._fila.put_nowait((entrada, sql if explicar else None, params))
+        except queue.Full:
+            with self._lock:
+                self._suprimidas += 1
+            return
+        self._iniciar()
+
+    def ranking(self):
+        with self._lock:
+            agregados = sorted(self._agregados.values(), key=lambda agregado: agregado.total, reverse=True)[:self.top]
+            return {
+                "limiar_ms": self.limiar * 1000,
+                "registradas": self._registradas,
+                "suprimidas": self._suprimidas,
+                "consultas": [agregado.como_dict() for agregado in agregados],
+            }
+
+    def limpar(self):
+        with self._lock:
+            self._agregados.clear()
+            self._ultimo_explain.clear()
+
+    def esperar(self):
+        """Bloqueia até a fila de registro esvaziar (usado nos testes)."""
+        self._fila.join()
+
+    def _tem_ficha(self):
+        # Balde de fichas: repõe `por_minuto` fichas por minuto, até `por_minuto`
+        agora = time.monotonic()
+        self._fichas = min(self.por_minuto, self._fichas + (agora - self._reposto_em) * self.por_minuto / 60.0)
+        self._reposto_em = agora
+        if self._fichas < 1:
+            return False
+        self._fichas -= 1
+        return True
+
+    def _descartar_menor(self):
+        menor = min(self._agregados, key=lambda chave: self._agregados[chave].total)
+        del self._agregados[menor]
+
+    def _iniciar(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._laco, name="consultas-lentas", daemon=True)
+                    self._thread.start()
+
+    def _laco(self):
+        while True:
+            entrada, sql, params = self._fila.get()
+            try:
+                if sql is not None:
+                    entrada["explain"] = self._explicar(sql, params)
+                    with self._lock:
+                        agregado = self._agregados.get(entrada["sql"])
+                        if agregado is not None:
+                            agregado.plano = entrada["explain"]
+                    entrada["varredura_completa"] = varredura_completa(entrada["explain"] or [])
+                self._escrever(entrada)
+            except Exception as err:
+                print(f"Erro no log de consultas lentas: {err}")
+            finally:
+                self._fila.task_done()
+
+    def _explicar(self, sql, params):
+        if not sql.lstrip().upper().startswith(_EXPLICAVEIS):
+            return None
+        conn = self.conectar()
+        if conn is None:
+            return None
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute("EXPLAIN " + sql, params)
+            colunas = [coluna[0] for coluna in cursor.description]
+            return [{coluna: _para_json(valor) for coluna, valor in zip(colunas, linha)} for linha in cursor.fetchall()]
+
+    def _escrever(self, entrada):
+        if self._arquivo_log is None:
+            # Aberto só na primeira consulta lenta; o RotatingFileHandler cuida da rotação
+            self._arquivo_log = RotatingFileHandler(self.arquivo, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+        with self._lock:
+            self._registradas += 1
+            entrada["suprimidas_ate_agora"] = self._suprimidas
+        self._arquivo_log.handle(logging.makeLogRecord({"msg": json.dumps(entrada, ensure_ascii=False), "levelno": logging.INFO}))
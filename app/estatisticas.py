@@ -0,0 +1,95 @@
+"""Estatísticas de imóveis por cidade, tipo e bairro, lidas da tabela imoveis_resumo.
+
+O resumo é mantido pelos triggers da migração 0004, e a contagem por prefixo de
+CEP (imoveis_cep) pelos da 0011. Para recalcular os dois do zero (por exemplo
+depois de uma carga feita com os triggers desligados):
+    python estatisticas.py reconstruir
+"""
+import sys
+
+from utils import connect_db
+
+
+DIMENSOES = ("cidade", "tipo", "bairro")
+
+SQL_RECONSTRUIR = [
+    "DELETE FROM imoveis_resumo",
+    "INSERT INTO imoveis_resumo (dimensao, cidade, grupo, quantidade, soma_valor, valor_min, valor_max) "
+    "SELECT 'cidade', '', cidade, COUNT(*), SUM(valor), MIN(valor), MAX(valor) FROM imoveis GROUP BY cidade",
+    "INSERT INTO imoveis_resumo (dimensao, cidade, grupo, quantidade, soma_valor, valor_min, valor_max) "
+    "SELECT 'tipo', '', tipo, COUNT(*), SUM(valor), MIN(valor), MAX(valor) FROM imoveis GROUP BY tipo",
+    "INSERT INTO imoveis_resumo (dimensao, cidade, grupo, quantidade, soma_valor, valor_min, valor_max) "
+    "SELECT 'bairro', cidade, bairro, COUNT(*), SUM(valor), MIN(valor), MAX(valor) FROM imoveis GROUP BY cidade, bairro",
+    "DELETE FROM imoveis_cep",
+    "INSERT INTO imoveis_cep (prefixo, quantidade) SELECT SUBSTR(cep, 1, 5), COUNT(*) FROM imoveis GROUP BY SUBSTR(cep, 1, 5)",
+]
+
+
+def ler_resumo(conn, dimensao, cidade=None):
+    """Uma entrada por grupo da dimensão (custo proporcional ao número de grupos)."""
+    if dimensao not in DIMENSOES:
+        raise ValueError(f"dimensão deve ser uma de: {', '.join(DIMENSOES)}")
+
+    sql = "SELECT cidade, grupo, quantidade, soma_valor, valor_min, valor_max from imoveis_resumo WHERE dimensao = %s"
+    params = [dimensao]
+    if cidade is not None:
+        if dimensao != "bairro":
+            raise ValueError("o filtro cidade só vale para a dimensão bairro")
+        sql += " AND cidade = %s"
+        params.append(cidade)
+    sql += " ORDER BY cidade, grupo"
+
+    cursor = conn.cursor()
+    cursor.execute(sql, tuple(params))
+
+    grupos = []
+    for cidade_grupo, grupo, quantidade, soma, minimo, maximo in cursor.fetchall():
+        item = {
+            dimensao: grupo,
+            "quantidade": quantidade,
+            "soma_valor": soma,
+            "media_valor": soma / quantidade if quantidade else None,
+            "valor_min": minimo,
+            "valor_max": maximo,
+        }
+        if dimensao == "bairro":
+            item["cidade"] = cidade_grupo
+        grupos.append(item)
+    return grupos
+
+
+def reconstruir(conn):
+    """Recalcula o resumo e a contagem por prefixo de CEP inteiros a partir de imoveis.
+
+    As tabelas ficam travadas durante a reconstrução para que nenhum trigger
+    conte uma escrita duas vezes (uma no recálculo e outra no incremento).
+    """
+    cursor = conn.cursor()
+    cursor.execute("LOCK TABLES imoveis READ, imoveis_resumo WRITE, imoveis_cep WRITE")
+    try:
+        for sql in SQL_RECONSTRUIR:
+            cursor.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("UNLOCK TABLES")
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != "reconstruir":
+        print(__doc__)
+        return 2
+
+    conn = connect_db()
+    if conn is None:
+        return 1
+    with conn:
+        reconstruir(conn)
+    print("Resumo reconstruído")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
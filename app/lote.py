@@ -0,0 +1,307 @@
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+
+# Colunas gravadas pelo INSERT de add_imoveis, na mesma ordem
+COLUNAS_ESCRITA = ("logradouro", "tipo_logradouro", "bairro", "cidade", "cep", "tipo", "valor", "data_aquisicao")
+COLUNAS_TEXTO = ("logradouro", "tipo_logradouro", "bairro", "cidade", "tipo")
+
+SQL_INSERT = "INSERT INTO imoveis (logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao) VALUES ( %s, %s, %s, %s, %s, %s, %s, %s)"
+
+MODOS = ("tudo_ou_nada", "melhor_esforco")
+
+
+class ErroLote(Exception):
+    """Falha que aborta um lote no modo tudo_ou_nada."""
+
+    def __init__(self, indice, mensagem):
+        super().__init__(mensagem)
+        self.indice = indice
+        self.mensagem = mensagem
+
+
+def validar_campo(coluna, valor):
+    """Valida um campo gravável; lança ValueError com a mensagem para o cliente."""
+    if coluna not in COLUNAS_ESCRITA:
+        raise ValueError(f"coluna desconhecida: {coluna}")
+    if valor in (None, ""):
+        raise ValueError(f"campos obrigatórios ausentes: {coluna}")
+
+    if coluna in COLUNAS_TEXTO:
+        if not isinstance(valor, str):
+            raise ValueError(f"{coluna} deve ser texto")
+    elif coluna == "cep":
+        if not (isinstance(valor, str) and len(valor) == 8 and valor.isdigit()):
+            raise ValueError("cep deve ter oito dígitos")
+    elif coluna == "valor":
+        if isinstance(valor, bool):
+            raise ValueError("valor deve ser numérico")
+        try:
+            valor = Decimal(str(valor))
+        except InvalidOperation:
+            raise ValueError("valor deve ser numérico")
+        if not valor.is_finite() or valor < 0:
+            raise ValueError("valor deve ser um número não negativo")
+    elif coluna == "data_aquisicao":
+        try:
+            date.fromisoformat(valor)
+        except (TypeError, ValueError):
+            raise ValueError("data_aquisicao deve estar no formato AAAA-MM-DD")
+
+
+def validar_imovel(imovel):
+    """Valida as oito colunas do INSERT e retorna a tupla de valores (ou lança ValueError)."""
+    if not isinstance(imovel, dict):
+        raise ValueError("cada imóvel deve ser um objeto JSON")
+
+    faltando = [coluna for coluna in COLUNAS_ESCRITA if imovel.get(coluna) in (None, "")]
+    if faltando:
+        raise ValueError(f"campos obrigatórios ausentes: {', '.join(faltando)}")
+
+    for coluna in COLUNAS_ESCRITA:
+        validar_campo(coluna, imovel[coluna])
+
+    return tuple(imovel[coluna] for coluna in COLUNAS_ESCRITA)
+
+
+def ler_imoveis(corpo, ndjson):
+    """Itera (índice, objeto ou exceção) de um array JSON ou de um corpo NDJSON linha a linha."""
+    if not ndjson:
+        try:
+            dados = json.load(corpo)
+        except ValueError as err:
+            raise ValueError(f"JSON inválido: {err}")
+        if not isinstance(dados, list):
+            raise ValueError("o corpo deve ser um array JSON de imóveis")
+        yield from enumerate(dados)
+        return
+
+    indice = 0
+    for linha in corpo:
+        if not linha.strip():
+            continue
+        try:
+            yield indice, json.loads(linha)
+        except ValueError as err:
+            yield indice, ValueError(f"linha NDJSON inválida: {err}")
+        indice += 1
+
+
+def em_pedacos(itens, tamanho):
+    """Agrupa um iterável em listas de até `tamanho` itens."""
+    pedaco = []
+    for item in itens:
+        pedaco.append(item)
+        if len(pedaco) >= tamanho:
+            yield pedaco
+            pedaco = []
+    if pedaco:
+        yield pedaco
+
+
+def inserir_lote(conn, imoveis, tamanho_lote, modo, ao_gravar=None, antes_do_commit=None):
+    """Insere os imóveis com executemany em pedaços de `tamanho_lote`.
+
+    No modo tudo_ou_nada tudo roda numa transação só e qualquer linha inválida
+    desfaz o lote inteiro (ErroLote). No modo melhor_esforco cada pedaço tem seu
+    commit; se um pedaço falhar no banco, as linhas dele são repetidas uma a uma
+    para isolar as que têm problema. `ao_gravar(ids, imoveis)` é chamado a cada
+    commit e `antes_do_commit(cursor, linhas gravadas)`, na transação, logo antes dele.
+    Retorna a lista de resultados por linha (`{"indice", "id"}` ou `{"indice", "erro"}`).
+    """
+    cursor = conn.cursor()
+    resultados = []
+    pendentes = []  # (ids, imoveis) gravados mas ainda não confirmados
+
+    for pedaco in em_pedacos(imoveis, tamanho_lote):
+        validos = []
+        for indice, imovel in pedaco:
+            try:
+                if isinstance(imovel, Exception):
+                    raise imovel
+                validos.append((indice, imovel, validar_imovel(imovel)))
+            except ValueError as err:
+                if modo == "tudo_ou_nada":
+                    conn.rollback()
+                    raise ErroLote(indice, str(err))
+                resultados.append({"indice": indice, "erro": str(err)})
+
+        if not validos:
+            continue
+
+        try:
+            cursor.executemany(SQL_INSERT, [valores for _, _, valores in validos])
+            # Um INSERT de várias linhas recebe ids consecutivos a partir de lastrowid
+            primeiro = cursor.lastrowid
+            ids = [primeiro + n for n in range(len(validos))]
+        except Exception as err:
+            if modo == "tudo_ou_nada":
+                conn.rollback()
+                raise ErroLote(validos[0][0], f"erro ao gravar o lote: {err}")
+            conn.rollback()
+            ids = _inserir_um_a_um(cursor, validos, resultados)
+            validos = [item for item, id in zip(validos, ids) if id is not None]
+            ids = [id for id in ids if id is not None]
+        else:
+            resultados.extend({"indice": indice, "id": id} for (indice, _, _), id in zip(validos, ids))
+
+        pendentes.append((ids, [imovel for _, imovel, _ in validos]))
+        if modo == "melhor_esforco":
+            _confirmar(conn, cursor, antes_do_commit, pendentes)
+            _avisar(ao_gravar, pendentes)
+
+    if modo == "tudo_ou_nada":
+        _confirmar(conn, cursor, antes_do_commit, pendentes)
+        _avisar(ao_gravar, pendentes)
+
+    resultados.sort(key=lambda resultado: resultado["indice"])
+    return resultados
+
+
+def _inserir_um_a_um(cursor, validos, resultados):
+    ids = []
+    for indice, _, valores in validos:
+        try:
+            cursor.execute(SQL_INSERT, valores)
+        except Exception as err:
+            resultados.append({"indice": indice, "erro": str(err)})
+            ids.append(None)
+        else:
+            resultados.append({"indice": indice, "id": cursor.lastrowid})
+            ids.append(cursor.lastrowid)
+    return ids
+
+
+def _confirmar(conn, cursor, antes_do_commit, pendentes):
+    if antes_do_commit is not None:
+        antes_do_commit(cursor, sum(len(lote_ids) for lote_ids, _ in pendentes))
+    conn.commit()
+
+
+def _avisar(ao_gravar, pendentes):
+    if ao_gravar is not None and pendentes:
+        ids = [id for lote_ids, _ in pendentes for id in lote_ids]
+        imoveis = [imovel for _, lote_imoveis in pendentes for imovel in lote_imoveis]
+        ao_gravar(ids, imoveis)
+    pendentes.clear()
+
+
+# Colunas aceitas em `filtro` nas escritas em lote
+COLUNAS_FILTRO = ("cidade", "tipo", "bairro")
+
+
+def ler_alvo(corpo):
+    """Extrai de um corpo `{"ids": [...]}` ou `{"filtro": {...}}` a lista de ids ou o filtro validado."""
+    if not isinstance(corpo, dict):
+        raise ValueError("o corpo deve ser um objeto JSON")
+    ids, filtro = corpo.get("ids"), corpo.get("filtro")
+    if (ids is None) == (filtro is None):
+        raise ValueError("informe exatamente um de: ids, filtro")
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(id, int) and not isinstance(id, bool) for id in ids):
+            raise ValueError("ids deve ser uma lista não vazia de inteiros")
+        return sorted(set(ids)), None
+
+    if not isinstance(filtro, dict) or not filtro:
+        raise ValueError(f"filtro deve ser um objeto com ao menos uma de: {', '.join(COLUNAS_FILTRO)}")
+    for coluna, valor in filtro.items():
+        if coluna not in COLUNAS_FILTRO:
+            raise ValueError(f"filtro só aceita: {', '.join(COLUNAS_FILTRO)}")
+        validar_campo(coluna, valor)
+    return None, filtro
+
+
+def ler_alteracoes(corpo):
+    """Monta o SET de uma atualização em lote a partir de `valores` e/ou `fator_valor`."""
+    valores = corpo.get("valores") or {}
+    fator = corpo.get("fator_valor")
+    if not isinstance(valores, dict):
+        raise ValueError("valores deve ser um objeto")
+    if not valores and fator is None:
+        raise ValueError("informe valores e/ou fator_valor")
+
+    sets, params = [], []
+    for coluna, valor in valores.items():
+        validar_campo(coluna, valor)
+        sets.append(f"{coluna} = %s")
+        params.append(valor)
+
+    if fator is not None:
+        if "valor" in valores:
+            raise ValueError("use valores.valor ou fator_valor, não os dois")
+        if isinstance(fator, bool) or not isinstance(fator, (int, float)) or fator <= 0:
+            raise ValueError("fator_valor deve ser um número positivo")
+        # Reajuste relativo (ex.: 1.05 = +5%), calculado pelo próprio MySQL
+        sets.append("valor = ROUND(valor * %s, 2)")
+        params.append(fator)
+
+    return ", ".join(sets), params
+
+
+def _ids_alvo(cursor, ids, filtro, tamanho_lote):
+    """Itera os ids alvo em pedaços de até `tamanho_lote`.
+
+    Para um filtro, os ids são lidos por keyset (id > último) e travados com
+    FOR UPDATE antes de serem alterados; assim cada linha é tocada uma vez só,
+    mesmo quando a atualização muda as próprias colunas do filtro.
+    """
+    if ids is not None:
+        yield from em_pedacos(ids, tamanho_lote)
+        return
+
+    where = " AND ".join(f"{coluna} = %s" for coluna in filtro)
+    sql = f"SELECT id from imoveis WHERE {where} AND id > %s ORDER BY id LIMIT %s FOR UPDATE"
+    ultimo = 0
+    while True:
+        cursor.execute(sql, (*filtro.values(), ultimo, tamanho_lote))
+        pedaco = [linha[0] for linha in cursor.fetchall()]
+        if not pedaco:
+            return
+        yield pedaco
+        if len(pedaco) < tamanho_lote:
+            return
+        ultimo = pedaco[-1]
+
+
+def _executar_por_ids(conn, ids, filtro, tamanho_lote, montar_sql, params, antes_do_commit=None):
+    """Executa `montar_sql(marcadores)` para cada pedaço de ids numa única transação.
+
+    `antes_do_commit(cursor, linhas afetadas)` roda na transação, logo antes do commit.
+    """
+    cursor = conn.cursor()
+    afetados, tocados = 0, []
+    try:
+        for pedaco in _ids_alvo(cursor, ids, filtro, tamanho_lote):
+            marcadores = ", ".join(["%s"] * len(pedaco))
+            cursor.execute(montar_sql(marcadores), (*params, *pedaco))
+            afetados += cursor.rowcount
+            tocados.extend(pedaco)
+        if antes_do_commit is not None:
+            antes_do_commit(cursor, afetados)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return afetados, tocados
+
+
+def atualizar_lote(conn, ids, filtro, set_sql, set_params, tamanho_lote, antes_do_commit=None):
+    """UPDATE ... WHERE id IN (...) em pedaços, numa transação; retorna (afetados, ids alvo)."""
+    return _executar_por_ids(
+        conn, ids, filtro, tamanho_lote,
+        lambda marcadores: f"UPDATE imoveis SET {set_sql} WHERE id IN ({marcadores})",
+        set_params,
+        antes_do_commit,
+    )
+
+
+def remover_lote(conn, ids, filtro, tamanho_lote, antes_do_commit=None):
+    """DELETE ... WHERE id IN (...) em pedaços, numa transação; retorna (afetados, ids alvo)."""
+    return _executar_por_ids(
+        conn, ids, filtro, tamanho_lote,
+        lambda marcadores: f"DELETE FROM imoveis WHERE id IN ({marcadores})",
+        (),
+        antes_do_commit,
+    )
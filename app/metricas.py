@@ -0,0 +1,280 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+from serializacao import ProvedorJSON
+
+
+# Fases de uma requisição, na ordem em que aparecem no Server-Timing
+FASES = ("conexao", "execute", "fetch", "commit", "montagem", "serializacao", "compressao")
+
+LIMITES_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_LINHAS = (0, 1, 10, 100, 1000, 10000, 100000)
+LIMITES_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histograma:
+    """Histograma com limites fixos (como os do Prometheus: `le` inclusivo, contagens cumulativas na exportação)."""
+
+    __slots__ = ("limites", "contagens", "soma", "total")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0  # continua inteira enquanto só entrarem inteiros (linhas, bytes)
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome, rotulos):
+        acumulado = 0
+        for limite, contagem in zip(self.limites, self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos},le="{_numero(limite)}"}} {acumulado}'
+        yield f'{nome}_bucket{{{rotulos},le="+Inf"}} {self.total}'
+        yield f"{nome}_sum{{{rotulos}}} {_numero(self.soma)}"
+        yield f"{nome}_count{{{rotulos}}} {self.total}"
+
+
+class Medicao:
+    """Tempos e contagens de uma requisição (guardada em `g.medicao`)."""
+
+    __slots__ = ("inicio", "fases", "linhas", "status", "bytes", "consultas")
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fases = defaultdict(float)
+        self.linhas = 0
+        self.status = None
+        self.bytes = None
+        self.consultas = []  # [sql, params, segundos, linhas] de cada comando (ver consultas_lentas.py)
+
+    def server_timing(self):
+        duracao = (time.perf_counter() - self.inicio) * 1000
+        partes = [f"{fase};dur={self.fases[fase] * 1000:.2f}" for fase in FASES if fase in self.fases]
+        partes.append(f"total;dur={duracao:.2f}")
+        return ", ".join(partes)
+
+
+class RegistroMetricas:
+    """Histogramas por rota (endpoint do Flask) das fases, linhas lidas e tamanho das respostas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requisicoes = defaultdict(int)
+        self._duracao = {}
+        self._fases = {}
+        self._linhas = {}
+        self._bytes = {}
+
+    def registrar(self, rota, metodo, medicao):
+        duracao = time.perf_counter() - medicao.inicio
+        with self._lock:
+            self._requisicoes[(rota, metodo, medicao.status)] += 1
+            self._histograma(self._duracao, rota, LIMITES_SEGUNDOS).observar(duracao)
+            for fase, segundos in medicao.fases.items():
+                self._histograma(self._fases, (rota, fase), LIMITES_SEGUNDOS).observar(segundos)
+            self._histograma(self._linhas, rota, LIMITES_LINHAS).observar(medicao.linhas)
+            if medicao.bytes is not None:
+                self._histograma(self._bytes, rota, LIMITES_BYTES).observar(medicao.bytes)
+
+    @staticmethod
+    def _histograma(tabela, chave, limites):
+        histograma = tabela.get(chave)
+        if histograma is None:
+            histograma = tabela[chave] = Histograma(limites)
+        return histograma
+
+    def exportar(self, extras=()):
+        """Texto no formato de exposição do Prometheus; `extras` são (nome, tipo, ajuda, valor)."""
+        saida = []
+        with self._lock:
+            saida += _cabecalho("imoveis_api_requisicoes_total", "counter", "Requisições atendidas por rota, método e status")
+            for (rota, metodo, status), total in sorted(self._requisicoes.items(), key=str):
+                saida.append(f'imoveis_api_requisicoes_total{{rota="{rota}",metodo="{metodo}",status="{status}"}} {total}')
+
+            saida += _cabecalho("imoveis_api_duracao_segundos", "histogram", "Duração total da requisição")
+            for rota, histograma in sorted(self._duracao.items()):
+                saida += histograma.linhas("imoveis_api_duracao_segundos", f'rota="{rota}"')
+
+            saida += _cabecalho("imoveis_api_fase_segundos", "histogram", "Tempo por fase: " + ", ".join(FASES))
+            for (rota, fase), histograma in sorted(self._fases.items()):
+                saida += histograma.linhas("imoveis_api_fase_segundos", f'rota="{rota}",fase="{fase}"')
+
+            saida += _cabecalho("imoveis_api_linhas", "histogram", "Linhas lidas do banco por requisição")
+            for rota, histograma in sorted(self._linhas.items()):
+                saida += histograma.linhas("imoveis_api_linhas", f'rota="{rota}"')
+
+            saida += _cabecalho("imoveis_api_resposta_bytes", "histogram", "Tamanho do corpo das respostas (sem as de streaming)")
+            for rota, histograma in sorted(self._bytes.items()):
+                saida += histograma.linhas("imoveis_api_resposta_bytes", f'rota="{rota}"')
+
+        for nome, tipo, ajuda, valor in extras:
+            saida += _cabecalho(nome, tipo, ajuda)
+            saida.append(f"{nome} {_numero(valor)}")
+        return "\n".join(saida) + "\n"
+
+
+def _cabecalho(nome, tipo, ajuda):
+    return [f"# HELP {nome} {ajuda}", f"# TYPE {nome} {tipo}"]
+
+
+def _numero(valor):
+    """Valor de uma amostra sem perder precisão: inteiros com todos os dígitos, floats pelo repr."""
+    if isinstance(valor, float):
+        return repr(valor)
+    return str(int(valor))
+
+
+# Medição da requisição atual
+
+def atual():
+    """Medição da requisição em andamento (None fora de uma requisição ou com métricas desligadas)."""
+    return g.get("medicao") if has_request_context() else None
+
+
+@contextmanager
+def medir(fase):
+    medicao = atual()
+    if medicao is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.fases[fase] += time.perf_counter() - inicio
+
+
+class CursorMedido:
+    """Cursor que soma o tempo de execute/fetch* e conta as linhas lidas na medição da requisição.
+
+    Cada comando também fica em `medicao.consultas` com o seu tempo (execute +
+    fetch) e linhas, para o ranking e o log de consultas lentas.
+    """
+
+    __slots__ = ("_cursor", "_medicao", "_consulta")
+
+    def __init__(self, cursor, medicao):
+        self._cursor = cursor
+        self._medicao = medicao
+        self._consulta = None
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def _executar(self, metodo, sql, params, params_registrados):
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, params)
+        finally:
+            duracao = time.perf_counter() - inicio
+            self._medicao.fases["execute"] += duracao
+            # Em INSERT/UPDATE/DELETE as linhas são as afetadas; num SELECT, as lidas pelo fetch
+            afetadas = self._cursor.rowcount if not sql.lstrip()[:6].upper() == "SELECT" else 0
+            self._consulta = [sql, params_registrados, duracao, afetadas if isinstance(afetadas, int) and afetadas > 0 else 0]
+            self._medicao.consultas.append(self._consulta)
+
+    def execute(self, sql, params=()):
+        return self._executar(self._cursor.execute, sql, params, params)
+
+    def executemany(self, sql, linhas):
+        # Um lote não cabe no log: fica só a quantidade de linhas
+        return self._executar(self._cursor.executemany, sql, linhas, [f"{len(linhas)} linhas"])
+
+    def _buscar(self, metodo, *args):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            duracao = time.perf_counter() - inicio
+            self._medicao.fases["fetch"] += duracao
+            if self._consulta is not None:
+                self._consulta[2] += duracao
+
+    def _contar(self, quantidade):
+        self._medicao.linhas += quantidade
+        if self._consulta is not None:
+            self._consulta[3] += quantidade
+
+    def fetchone(self):
+        linha = self._buscar(self._cursor.fetchone)
+        if linha is not None:
+            self._contar(1)
+        return linha
+
+    def fetchmany(self, *args):
+        linhas = self._buscar(self._cursor.fetchmany, *args)
+        self._contar(len(linhas))
+        return linhas
+
+    def fetchall(self):
+        linhas = self._buscar(self._cursor.fetchall)
+        self._contar(len(linhas))
+        return linhas
+
+
+class ConexaoMedida:
+    """Conexão do pool cujos cursores e commits entram na medição da requisição."""
+
+    __slots__ = ("_conn", "_medicao")
+
+    def __init__(self, conn, medicao):
+        self._conn = conn
+        self._medicao = medicao
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def cursor(self, *args, **kwargs):
+        return CursorMedido(self._conn.cursor(*args, **kwargs), self._medicao)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        try:
+            self._conn.commit()
+        finally:
+            self._medicao.fases["commit"] += time.perf_counter() - inicio
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+
+def medir_conexoes(conectar):
+    """Envolve uma função como connect_db: mede o empréstimo da conexão e instrumenta a conexão devolvida."""
+    def conectar_medido(*args, **kwargs):
+        medicao = atual()
+        if medicao is None:
+            return conectar(*args, **kwargs)
+        inicio = time.perf_counter()
+        conn = conectar(*args, **kwargs)
+        medicao.fases["conexao"] += time.perf_counter() - inicio
+        return conn if conn is None else ConexaoMedida(conn, medicao)
+
+    conectar_medido.__wrapped__ = conectar
+    return conectar_medido
+
+
+class JSONMedido(ProvedorJSON):
+    """Provedor JSON do Flask que soma o tempo de cada dumps (jsonify e streaming) na fase serializacao."""
+
+    def dumps(self, obj, **kwargs):
+        medicao = atual()
+        if medicao is None:
+            return super().dumps(obj, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            medicao.fases["serializacao"] += time.perf_counter() - inicio
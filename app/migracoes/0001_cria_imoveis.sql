@@ -0,0 +1,13 @@
+-- Tabela principal. A ordem das colunas é a que as rotas esperam em SELECT *.
+CREATE TABLE IF NOT EXISTS imoveis (
+    id INT NOT NULL AUTO_INCREMENT,
+    logradouro VARCHAR(255) NOT NULL,
+    tipo_logradouro VARCHAR(50) NOT NULL,
+    bairro VARCHAR(120) NOT NULL,
+    cidade VARCHAR(120) NOT NULL,
+    cep CHAR(8) NOT NULL,
+    tipo VARCHAR(60) NOT NULL,
+    valor DECIMAL(15, 2) NOT NULL,
+    data_aquisicao DATE NOT NULL,
+    PRIMARY KEY (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,8 @@
+-- Índices das rotas filtradas. No InnoDB todo índice secundário termina na
+-- chave primária, então (tipo) e (cidade) já servem WHERE ... AND id > %s ORDER BY id
+-- sem filesort; (cidade, tipo) atende os filtros combinados.
+CREATE INDEX idx_imoveis_tipo ON imoveis (tipo);
+CREATE INDEX idx_imoveis_cidade ON imoveis (cidade);
+CREATE INDEX idx_imoveis_cidade_tipo ON imoveis (cidade, tipo);
+CREATE INDEX idx_imoveis_cep ON imoveis (cep);
+CREATE INDEX idx_imoveis_data_aquisicao ON imoveis (data_aquisicao);
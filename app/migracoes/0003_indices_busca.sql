@@ -0,0 +1,5 @@
+-- Índices da busca combinada (/imoveis/search): filtro por bairro e
+-- faixa/ordenação por valor. (valor) termina em id, o que cobre o
+-- ORDER BY valor, id da paginação por keyset.
+CREATE INDEX idx_imoveis_bairro ON imoveis (bairro);
+CREATE INDEX idx_imoveis_valor ON imoveis (valor);
@@ -0,0 +1,94 @@
+-- Resumo por cidade, tipo e bairro (dentro da cidade) mantido pelos triggers
+-- abaixo: cada INSERT/UPDATE/DELETE em imoveis aplica só a diferença da linha,
+-- então /imoveis/stats lê uma linha por grupo em vez de varrer a tabela.
+-- `cidade` fica vazia nas dimensões cidade e tipo.
+CREATE TABLE IF NOT EXISTS imoveis_resumo (
+    dimensao VARCHAR(10) NOT NULL,
+    cidade VARCHAR(120) NOT NULL DEFAULT '',
+    grupo VARCHAR(120) NOT NULL,
+    quantidade BIGINT NOT NULL,
+    soma_valor DECIMAL(20, 2) NOT NULL,
+    valor_min DECIMAL(15, 2) NOT NULL,
+    valor_max DECIMAL(15, 2) NOT NULL,
+    PRIMARY KEY (dimensao, cidade, grupo)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Índice para recalcular mínimo/máximo do bairro quando o extremo sai do grupo
+CREATE INDEX idx_imoveis_cidade_bairro ON imoveis (cidade, bairro);
+
+DELIMITER $$
+
+CREATE PROCEDURE resumo_adicionar(p_dimensao VARCHAR(10), p_cidade VARCHAR(120), p_grupo VARCHAR(120), p_valor DECIMAL(15, 2))
+BEGIN
+    INSERT INTO imoveis_resumo (dimensao, cidade, grupo, quantidade, soma_valor, valor_min, valor_max)
+    VALUES (p_dimensao, p_cidade, p_grupo, 1, p_valor, p_valor, p_valor)
+    ON DUPLICATE KEY UPDATE
+        quantidade = quantidade + 1,
+        soma_valor = soma_valor + p_valor,
+        valor_min = LEAST(valor_min, p_valor),
+        valor_max = GREATEST(valor_max, p_valor);
+END$$
+
+CREATE PROCEDURE resumo_remover(p_dimensao VARCHAR(10), p_cidade VARCHAR(120), p_grupo VARCHAR(120), p_valor DECIMAL(15, 2))
+BEGIN
+    DECLARE v_min DECIMAL(15, 2);
+    DECLARE v_max DECIMAL(15, 2);
+
+    UPDATE imoveis_resumo
+    SET quantidade = quantidade - 1, soma_valor = soma_valor - p_valor
+    WHERE dimensao = p_dimensao AND cidade = p_cidade AND grupo = p_grupo;
+
+    DELETE FROM imoveis_resumo
+    WHERE dimensao = p_dimensao AND cidade = p_cidade AND grupo = p_grupo AND quantidade <= 0;
+
+    -- Mínimo e máximo só precisam ser recalculados se o valor removido era um deles
+    IF EXISTS (SELECT 1 FROM imoveis_resumo
+               WHERE dimensao = p_dimensao AND cidade = p_cidade AND grupo = p_grupo
+                 AND (valor_min = p_valor OR valor_max = p_valor)) THEN
+        IF p_dimensao = 'cidade' THEN
+            SELECT MIN(valor), MAX(valor) INTO v_min, v_max FROM imoveis WHERE cidade = p_grupo;
+        ELSEIF p_dimensao = 'tipo' THEN
+            SELECT MIN(valor), MAX(valor) INTO v_min, v_max FROM imoveis WHERE tipo = p_grupo;
+        ELSE
+            SELECT MIN(valor), MAX(valor) INTO v_min, v_max FROM imoveis WHERE cidade = p_cidade AND bairro = p_grupo;
+        END IF;
+        UPDATE imoveis_resumo SET valor_min = v_min, valor_max = v_max
+        WHERE dimensao = p_dimensao AND cidade = p_cidade AND grupo = p_grupo;
+    END IF;
+END$$
+
+CREATE TRIGGER imoveis_resumo_insert AFTER INSERT ON imoveis FOR EACH ROW
+BEGIN
+    CALL resumo_adicionar('cidade', '', NEW.cidade, NEW.valor);
+    CALL resumo_adicionar('tipo', '', NEW.tipo, NEW.valor);
+    CALL resumo_adicionar('bairro', NEW.cidade, NEW.bairro, NEW.valor);
+END$$
+
+CREATE TRIGGER imoveis_resumo_update AFTER UPDATE ON imoveis FOR EACH ROW
+BEGIN
+    IF NOT (OLD.cidade <=> NEW.cidade AND OLD.tipo <=> NEW.tipo AND OLD.bairro <=> NEW.bairro AND OLD.valor <=> NEW.valor) THEN
+        CALL resumo_remover('cidade', '', OLD.cidade, OLD.valor);
+        CALL resumo_remover('tipo', '', OLD.tipo, OLD.valor);
+        CALL resumo_remover('bairro', OLD.cidade, OLD.bairro, OLD.valor);
+        CALL resumo_adicionar('cidade', '', NEW.cidade, NEW.valor);
+        CALL resumo_adicionar('tipo', '', NEW.tipo, NEW.valor);
+        CALL resumo_adicionar('bairro', NEW.cidade, NEW.bairro, NEW.valor);
+    END IF;
+END$$
+
+CREATE TRIGGER imoveis_resumo_delete AFTER DELETE ON imoveis FOR EACH ROW
+BEGIN
+    CALL resumo_remover('cidade', '', OLD.cidade, OLD.valor);
+    CALL resumo_remover('tipo', '', OLD.tipo, OLD.valor);
+    CALL resumo_remover('bairro', OLD.cidade, OLD.bairro, OLD.valor);
+END$$
+
+DELIMITER ;
+
+-- Carga inicial a partir do que já existe na tabela
+INSERT INTO imoveis_resumo (dimensao, cidade, grupo, quantidade, soma_valor, valor_min, valor_max)
+SELECT 'cidade', '', cidade, COUNT(*), SUM(valor), MIN(valor), MAX(valor) FROM imoveis GROUP BY cidade;
+INSERT INTO imoveis_resumo (dimensao, cidade, grupo, quantidade, soma_valor, valor_min, valor_max)
+SELECT 'tipo', '', tipo, COUNT(*), SUM(valor), MIN(valor), MAX(valor) FROM imoveis GROUP BY tipo;
+INSERT INTO imoveis_resumo (dimensao, cidade, grupo, quantidade, soma_valor, valor_min, valor_max)
+SELECT 'bairro', cidade, bairro, COUNT(*), SUM(valor), MIN(valor), MAX(valor) FROM imoveis GROUP BY cidade, bairro;
@@ -0,0 +1,23 @@
+-- Suporte à sincronização incremental da réplica em memória (replica.py):
+-- atualizado_em marca a última escrita de cada linha e imoveis_removidos
+-- guarda os ids apagados, que não aparecem numa consulta por data.
+ALTER TABLE imoveis
+    ADD COLUMN atualizado_em TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+CREATE INDEX idx_imoveis_atualizado_em ON imoveis (atualizado_em);
+
+CREATE TABLE IF NOT EXISTS imoveis_removidos (
+    id INT NOT NULL PRIMARY KEY,
+    removido_em TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    KEY idx_imoveis_removidos_removido_em (removido_em)
+) ENGINE=InnoDB;
+
+DELIMITER $$
+
+CREATE TRIGGER imoveis_removidos_delete AFTER DELETE ON imoveis FOR EACH ROW
+BEGIN
+    INSERT INTO imoveis_removidos (id) VALUES (OLD.id)
+    ON DUPLICATE KEY UPDATE removido_em = CURRENT_TIMESTAMP(6);
+END$$
+
+DELIMITER ;
@@ -0,0 +1,5 @@
+-- Busca textual (/imoveis/busca?q=) por logradouro e bairro. O MATCH ...
+-- AGAINST em modo booleano usa este índice (acesso "fulltext") e já devolve
+-- a relevância; a collation padrão (utf8mb4_0900_ai_ci) ignora acentos e
+-- maiúsculas, então "sao" encontra "São".
+CREATE FULLTEXT INDEX ft_imoveis_endereco ON imoveis (logradouro, bairro);
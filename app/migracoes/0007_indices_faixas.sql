@@ -0,0 +1,7 @@
+-- Faixas e top-N por cidade (/imoveis/faixa, /imoveis/top e /imoveis/search
+-- com cidade e sort). Com cidade = %s fixa, (cidade, valor) já entrega as
+-- linhas em ordem de valor, e o id no fim do índice desempata o keyset:
+-- ORDER BY valor DESC, id DESC LIMIT n vira um range scan de trás para
+-- frente, sem filesort. O mesmo vale para data_aquisicao.
+CREATE INDEX idx_imoveis_cidade_valor ON imoveis (cidade, valor);
+CREATE INDEX idx_imoveis_cidade_data_aquisicao ON imoveis (cidade, data_aquisicao);
@@ -0,0 +1,31 @@
+-- Versão da tabela imoveis compartilhada por todos os processos (versao.py):
+-- os triggers abaixo incrementam um contador a cada linha escrita, qualquer
+-- que seja a origem (rotas de outro worker, transferencia.py, SQL direto), e
+-- os servidores leem SUM(versao) periodicamente para invalidar o cache e as
+-- ETags. O contador é dividido em 16 linhas (escolhida pela conexão) para que
+-- escritas concorrentes não disputem o lock de uma linha só até o commit.
+CREATE TABLE IF NOT EXISTS imoveis_versao (
+    fatia TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+    versao BIGINT UNSIGNED NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+INSERT IGNORE INTO imoveis_versao (fatia) VALUES (0), (1), (2), (3), (4), (5), (6), (7), (8), (9), (10), (11), (12), (13), (14), (15);
+
+DELIMITER $$
+
+CREATE TRIGGER imoveis_versao_insert AFTER INSERT ON imoveis FOR EACH ROW
+BEGIN
+    UPDATE imoveis_versao SET versao = versao + 1 WHERE fatia = CONNECTION_ID() % 16;
+END$$
+
+CREATE TRIGGER imoveis_versao_update AFTER UPDATE ON imoveis FOR EACH ROW
+BEGIN
+    UPDATE imoveis_versao SET versao = versao + 1 WHERE fatia = CONNECTION_ID() % 16;
+END$$
+
+CREATE TRIGGER imoveis_versao_delete AFTER DELETE ON imoveis FOR EACH ROW
+BEGIN
+    UPDATE imoveis_versao SET versao = versao + 1 WHERE fatia = CONNECTION_ID() % 16;
+END$$
+
+DELIMITER ;
@@ -0,0 +1,16 @@
+-- Progresso das importações da transferencia.py. A linha de um arquivo é
+-- gravada na mesma transação que os INSERTs de cada bloco: depois de uma
+-- queda, a importação retoma exatamente do último bloco confirmado, sem
+-- gravar nenhuma linha duas vezes. O checkpoint em JSON ao lado do arquivo é
+-- só uma cópia desta linha.
+CREATE TABLE IF NOT EXISTS importacoes (
+    arquivo VARCHAR(512) NOT NULL PRIMARY KEY,
+    tamanho BIGINT NOT NULL,
+    posicao BIGINT NOT NULL,
+    linha BIGINT NOT NULL,
+    inseridas BIGINT NOT NULL,
+    rejeitadas BIGINT NOT NULL,
+    concluida BOOLEAN NOT NULL DEFAULT FALSE,
+    cabecalho TEXT NULL,
+    atualizada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,10 @@
+-- Mínimo e máximo do resumo de estatísticas (procedure resumo_remover da
+-- migração 0004). Quando o extremo sai do grupo, o recálculo faz
+-- SELECT MIN(valor), MAX(valor) com o grupo fixo: com o valor no fim do
+-- índice, cada extremo é uma leitura na ponta do range, em vez de percorrer
+-- todas as linhas do tipo ou do bairro. A cidade já tem (cidade, valor), da
+-- migração 0007. (cidade, bairro, valor) substitui o (cidade, bairro) da 0004,
+-- que é prefixo dele.
+CREATE INDEX idx_imoveis_tipo_valor ON imoveis (tipo, valor);
+CREATE INDEX idx_imoveis_cidade_bairro_valor ON imoveis (cidade, bairro, valor);
+DROP INDEX idx_imoveis_cidade_bairro ON imoveis;
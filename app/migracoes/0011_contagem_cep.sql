@@ -0,0 +1,38 @@
+-- Contagem de imóveis por prefixo de CEP (GET /imoveis/cep/contagem). Uma linha
+-- por prefixo de 5 dígitos, o nível mais fino da rota, mantida pelos triggers
+-- abaixo: a rota soma os prefixos da faixa pedida em vez de percorrer o índice
+-- de cep inteiro, e o custo depende só do número de prefixos com imóveis.
+CREATE TABLE IF NOT EXISTS imoveis_cep (
+    prefixo CHAR(5) NOT NULL PRIMARY KEY,
+    quantidade INT NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+DELIMITER $$
+
+CREATE TRIGGER imoveis_cep_insert AFTER INSERT ON imoveis FOR EACH ROW
+BEGIN
+    INSERT INTO imoveis_cep (prefixo, quantidade) VALUES (LEFT(NEW.cep, 5), 1)
+    ON DUPLICATE KEY UPDATE quantidade = quantidade + 1;
+END$$
+
+CREATE TRIGGER imoveis_cep_update AFTER UPDATE ON imoveis FOR EACH ROW
+BEGIN
+    IF LEFT(OLD.cep, 5) <> LEFT(NEW.cep, 5) THEN
+        UPDATE imoveis_cep SET quantidade = quantidade - 1 WHERE prefixo = LEFT(OLD.cep, 5);
+        DELETE FROM imoveis_cep WHERE prefixo = LEFT(OLD.cep, 5) AND quantidade <= 0;
+        INSERT INTO imoveis_cep (prefixo, quantidade) VALUES (LEFT(NEW.cep, 5), 1)
+        ON DUPLICATE KEY UPDATE quantidade = quantidade + 1;
+    END IF;
+END$$
+
+CREATE TRIGGER imoveis_cep_delete AFTER DELETE ON imoveis FOR EACH ROW
+BEGIN
+    UPDATE imoveis_cep SET quantidade = quantidade - 1 WHERE prefixo = LEFT(OLD.cep, 5);
+    DELETE FROM imoveis_cep WHERE prefixo = LEFT(OLD.cep, 5) AND quantidade <= 0;
+END$$
+
+DELIMITER ;
+
+-- Carga inicial a partir do que já existe na tabela
+INSERT INTO imoveis_cep (prefixo, quantidade)
+SELECT LEFT(cep, 5), COUNT(*) FROM imoveis GROUP BY LEFT(cep, 5);
@@ -0,0 +1,37 @@
+-- Log de alterações para a sincronização da réplica em memória (replica.py):
+-- cada linha inserida, alterada ou removida em imoveis ganha uma entrada com
+-- um seq crescente, e a sincronização lê as entradas com seq maior que o
+-- último lido. Ao contrário de atualizado_em (migração 0005), que é gravado
+-- quando a linha é escrita e não no commit, um seq que ainda não apareceu
+-- fica pendente na réplica até a transação dele terminar, por mais longa que
+-- ela seja (até REPLICA_MAX_TRANSACAO segundos). Entradas mais antigas que
+-- esse limite já foram lidas por todos os processos e podem ser apagadas por
+-- registrada_em.
+CREATE TABLE IF NOT EXISTS imoveis_alteracoes (
+    seq BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    imovel_id INT NOT NULL,
+    registrada_em TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    KEY idx_imoveis_alteracoes_registrada_em (registrada_em)
+) ENGINE=InnoDB;
+
+DELIMITER $$
+
+CREATE TRIGGER imoveis_alteracoes_insert AFTER INSERT ON imoveis FOR EACH ROW
+BEGIN
+    INSERT INTO imoveis_alteracoes (imovel_id) VALUES (NEW.id);
+END$$
+
+CREATE TRIGGER imoveis_alteracoes_update AFTER UPDATE ON imoveis FOR EACH ROW
+BEGIN
+    INSERT INTO imoveis_alteracoes (imovel_id) VALUES (NEW.id);
+    IF OLD.id <> NEW.id THEN
+        INSERT INTO imoveis_alteracoes (imovel_id) VALUES (OLD.id);
+    END IF;
+END$$
+
+CREATE TRIGGER imoveis_alteracoes_delete AFTER DELETE ON imoveis FOR EACH ROW
+BEGIN
+    INSERT INTO imoveis_alteracoes (imovel_id) VALUES (OLD.id);
+END$$
+
+DELIMITER ;
@@ -0,0 +1,186 @@
+"""Migrações versionadas do esquema do banco.
+
+Cada arquivo em migracoes/ (NNNN_descricao.sql) é aplicado uma vez, em ordem,
+e registrado na tabela schema_migracoes.
+
+Uso:
+    python migrar.py status     # lista as migrações aplicadas e pendentes
+    python migrar.py aplicar    # aplica as pendentes
+    python migrar.py explain    # confere com EXPLAIN se as consultas das rotas usam índice
+"""
+import os
+import re
+import sys
+
+from utils import connect_db
+
+
+PASTA_MIGRACOES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migracoes")
+
+SQL_TABELA_CONTROLE = """CREATE TABLE IF NOT EXISTS schema_migracoes (
+    versao INT NOT NULL PRIMARY KEY,
+    nome VARCHAR(255) NOT NULL,
+    aplicada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)"""
+
+# Consultas das rotas (com parâmetros de exemplo) que precisam usar índice
+CONSULTAS_INDEXADAS = [
+    ("por_id", "SELECT * from imoveis WHERE id = %s", (1,)),
+    ("por_tipo", "SELECT * from imoveis WHERE tipo = %s AND id > %s ORDER BY id LIMIT %s", ("casa", 0, 101)),
+    ("por_cidade", "SELECT * from imoveis WHERE cidade = %s AND id > %s ORDER BY id LIMIT %s", ("São Paulo", 0, 101)),
+    ("busca_bairro_valor", "SELECT * from imoveis WHERE bairro = %s AND valor <= %s ORDER BY valor ASC, id ASC LIMIT %s", ("Centro", 500000, 101)),
+    ("busca_valor", "SELECT * from imoveis WHERE valor >= %s AND valor <= %s ORDER BY valor ASC, id ASC LIMIT %s", (100000, 200000, 101)),
+    ("busca_texto", "SELECT *, MATCH(logradouro, bairro) AGAINST (%s IN BOOLEAN MODE) AS relevancia from imoveis"
+                    " WHERE MATCH(logradouro, bairro) AGAINST (%s IN BOOLEAN MODE) ORDER BY relevancia DESC, id ASC LIMIT %s",
+     ("+centro*", "+centro*", 101)),
+    ("top_cidade_valor", "SELECT * from imoveis WHERE cidade = %s ORDER BY valor DESC, id DESC LIMIT %s", ("São Paulo", 101)),
+    ("faixa_cidade_data", "SELECT * from imoveis WHERE cidade = %s AND data_aquisicao >= %s AND data_aquisicao <= %s"
+                          " ORDER BY data_aquisicao ASC, id ASC LIMIT %s", ("São Paulo", "2022-07-01", "2022-09-30", 101)),
+    ("cep_faixa", "SELECT * from imoveis WHERE cep BETWEEN %s AND %s ORDER BY cep ASC, id ASC LIMIT %s", ("04550000", "04559999", 101)),
+    ("cep_contagem", "SELECT LEFT(prefixo, %s) AS grupo, SUM(quantidade) from imoveis_cep WHERE prefixo BETWEEN %s AND %s GROUP BY grupo ORDER BY grupo",
+     (3, "00000", "09999")),
+    ("lote_por_filtro", "SELECT id from imoveis WHERE cidade = %s AND tipo = %s AND id > %s ORDER BY id LIMIT %s", ("São Paulo", "casa", 0, 1000)),
+]
+
+_NOME_ARQUIVO = re.compile(r"^(\d+)_(.+)\.sql$")
+
+
+class ErroMigracao(Exception):
+    """Falha ao ler ou aplicar uma migração."""
+
+
+def listar_migracoes(pasta=PASTA_MIGRACOES):
+    """Lista (versao, nome, caminho) das migrações da pasta, em ordem de versão."""
+    migracoes = []
+    for arquivo in os.listdir(pasta):
+        encontrado = _NOME_ARQUIVO.match(arquivo)
+        if encontrado:
+            migracoes.append((int(encontrado.group(1)), arquivo, os.path.join(pasta, arquivo)))
+    migracoes.sort()
+
+    versoes = [versao for versao, _, _ in migracoes]
+    if len(versoes) != len(set(versoes)):
+        raise ErroMigracao("existem duas migrações com a mesma versão")
+    return migracoes
+
+
+def dividir_comandos(sql):
+    """Divide um script em comandos, respeitando comentários `--` e a diretiva DELIMITER."""
+    comandos, atual, delimitador = [], [], ";"
+    for linha in sql.splitlines():
+        limpa = linha.strip()
+        if not atual and (not limpa or limpa.startswith("--")):
+            continue
+        if limpa.upper().startswith("DELIMITER "):
+            delimitador = limpa.split(None, 1)[1]
+            continue
+        if limpa.endswith(delimitador):
+            atual.append(linha.rstrip()[:-len(delimitador)])
+            comando = "\n".join(atual).strip()
+            if comando:
+                comandos.append(comando)
+            atual = []
+        else:
+            atual.append(linha)
+    if "\n".join(atual).strip():
+        comandos.append("\n".join(atual).strip())
+    return comandos
+
+
+def versoes_aplicadas(conn):
+    cursor = conn.cursor()
+    cursor.execute(SQL_TABELA_CONTROLE)
+    cursor.execute("SELECT versao from schema_migracoes")
+    return {linha[0] for linha in cursor.fetchall()}
+
+
+def pendentes(conn, pasta=PASTA_MIGRACOES):
+    aplicadas = versoes_aplicadas(conn)
+    return [migracao for migracao in listar_migracoes(pasta) if migracao[0] not in aplicadas]
+
+
+def aplicar(conn, pasta=PASTA_MIGRACOES, saida=print):
+    """Aplica as migrações pendentes em ordem e retorna quantas foram aplicadas.
+
+    DDL no MySQL faz commit implícito; por isso a migração só é registrada
+    depois que todos os seus comandos rodaram.
+    """
+    cursor = conn.cursor()
+    aplicadas = 0
+    for versao, nome, caminho in pendentes(conn, pasta):
+        with open(caminho, encoding="utf-8") as arquivo:
+            comandos = dividir_comandos(arquivo.read())
+        saida(f"Aplicando {nome} ({len(comandos)} comandos)")
+        for comando in comandos:
+            try:
+                cursor.execute(comando)
+            except Exception as err:
+                conn.rollback()
+                raise ErroMigracao(f"{nome}: {err}") from err
+        cursor.execute("INSERT INTO schema_migracoes (versao, nome) VALUES (%s, %s)", (versao, nome))
+        conn.commit()
+        aplicadas += 1
+    return aplicadas
+
+
+def explicar(conn, consultas=CONSULTAS_INDEXADAS):
+    """Roda EXPLAIN nas consultas das rotas e retorna (nome, índice usado ou None, tipo de acesso)."""
+    cursor = conn.cursor()
+    relatorio = []
+    for nome, sql, params in consultas:
+        cursor.execute("EXPLAIN " + sql, params)
+        colunas = [coluna[0] for coluna in cursor.description]
+        linhas = [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+        plano = next((linha for linha in linhas if linha.get("table") == "imoveis"), linhas[0] if linhas else {})
+        relatorio.append((nome, plano.get("key"), plano.get("type")))
+    return relatorio
+
+
+def checar_inicializacao():
+    """Avisa (sem impedir a subida) quando há migrações pendentes ou consultas sem índice."""
+    conn = connect_db()
+    if conn is None:
+        print("Aviso: não foi possível checar as migrações (sem conexão com o banco)")
+        return False
+    with conn:
+        faltando = pendentes(conn)
+        if faltando:
+            nomes = ", ".join(nome for _, nome, _ in faltando)
+            print(f"Aviso: migrações pendentes: {nomes}. Rode `python migrar.py aplicar`.")
+            return False
+        sem_indice = [nome for nome, indice, _ in explicar(conn) if indice is None]
+        if sem_indice:
+            print(f"Aviso: consultas sem índice: {', '.join(sem_indice)}")
+            return False
+    return True
+
+
+def main(argv):
+    comando = argv[1] if len(argv) > 1 else "status"
+    if comando not in ("status", "aplicar", "explain"):
+        print(__doc__)
+        return 2
+
+    conn = connect_db()
+    if conn is None:
+        return 1
+
+    with conn:
+        if comando == "aplicar":
+            total = aplicar(conn)
+            print(f"{total} migração(ões) aplicada(s)")
+        elif comando == "status":
+            aplicadas = versoes_aplicadas(conn)
+            for versao, nome, _ in listar_migracoes():
+                print(f"[{'x' if versao in aplicadas else ' '}] {nome}")
+        else:
+            falhou = False
+            for nome, indice, tipo in explicar(conn):
+                print(f"{nome}: índice={indice} acesso={tipo}")
+                falhou = falhou or indice is None
+            return 1 if falhou else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
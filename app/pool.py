@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo limite de espera."""
+
+
+class ConexaoPool:
+    """Conexão emprestada do pool; close() (ou sair do `with`) devolve ao pool."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, nome):
+        # Tudo que não é do pool é repassado para a conexão real
+        if self._conn is None:
+            raise AttributeError(f"conexão já devolvida ao pool ({nome})")
+        return getattr(self._conn, nome)
+
+    def close(self):
+        """Devolve a conexão ao pool em vez de fechar o socket."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.devolver(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """Pool de conexões com limite de tamanho, espera com timeout e validação de conexões ociosas."""
+
+    def __init__(self, criar_conexao, tamanho=5, timeout=5.0, validar_apos=30.0, max_ociosa=300.0):
+        self._criar_conexao = criar_conexao
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self.validar_apos = validar_apos
+        self.max_ociosa = max_ociosa
+
+        self._livres = deque()  # (conexao, instante em que foi devolvida)
+        self._cond = threading.Condition()
+        self._abertas = 0
+
+        # Estatísticas
+        self._em_uso = 0
+        self._aguardando = 0
+        self._emprestimos = 0
+        self._criadas = 0
+        self._descartadas = 0
+        self._timeouts = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    def adquirir(self, timeout=None):
+        """Retira uma conexão do pool, esperando até `timeout` segundos se estiver cheio."""
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        limite = inicio + timeout
+
+        with self._cond:
+            self._aguardando += 1
+            try:
+                while True:
+                    if self._livres:
+                        conn, devolvida_em = self._livres.pop()
+                        break
+                    if self._abertas < self.tamanho:
+                        # Reserva a vaga antes de sair do lock para abrir a conexão
+                        self._abertas += 1
+                        conn, devolvida_em = None, None
+                        break
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._timeouts += 1
+                        raise PoolEsgotado(f"nenhuma conexão livre após {timeout:.1f}s")
+                    self._cond.wait(restante)
+            finally:
+                self._aguardando -= 1
+
+        if conn is None:
+            conn = self._abrir()
+        elif not self._valida(conn, devolvida_em):
+            self._descartar(conn)
+            with self._cond:
+                self._abertas += 1
+            conn = self._abrir()
+
+        espera = time.monotonic() - inicio
+        with self._cond:
+            self._em_uso += 1
+            self._emprestimos += 1
+            self._espera_total += espera
+            self._espera_max = max(self._espera_max, espera)
+        return ConexaoPool(self, conn)
+
+    def devolver(self, conn):
+        """Recoloca a conexão na fila de livres, descartando transações pendentes."""
+        try:
+            if getattr(conn, "in_transaction", False):
+                conn.rollback()
+            reaproveitar = True
+        except Exception:
+            reaproveitar = False
+
+        with self._cond:
+            self._em_uso -= 1
+            if reaproveitar:
+                self._livres.append((conn, time.monotonic()))
+            else:
+                self._abertas -= 1
+                self._descartadas += 1
+            self._cond.notify()
+
+        if not reaproveitar:
+            self._fechar(conn)
+
+    def aquecer(self, quantidade=None):
+        """Abre conexões até ter `quantidade` (padrão: o tamanho do pool), para os primeiros pedidos não pagarem o handshake.
+
+        Retorna quantas foram abertas; uma falha ao conectar interrompe o aquecimento e é repassada.
+        """
+        quantidade = self.tamanho if quantidade is None else min(quantidade, self.tamanho)
+        novas = []
+        try:
+            while True:
+                with self._cond:
+                    if self._abertas >= quantidade:
+                        break
+                    self._abertas += 1
+                novas.append(self._abrir())
+        finally:
+            with self._cond:
+                self._livres.extend((conn, time.monotonic()) for conn in novas)
+                self._cond.notify_all()
+        return len(novas)
+
+    def fechar_todas(self):
+        """Fecha todas as conexões livres (as emprestadas são fechadas ao voltar)."""
+        with self._cond:
+            livres, self._livres = list(self._livres), deque()
+            self._abertas -= len(livres)
+        for conn, _ in livres:
+            self._fechar(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "tamanho": self.tamanho,
+                "abertas": self._abertas,
+                "livres": len(self._livres),
+                "em_uso": self._em_uso,
+                "aguardando": self._aguardando,
+                "emprestimos": self._emprestimos,
+                "criadas": self._criadas,
+                "descartadas": self._descartadas,
+                "timeouts": self._timeouts,
+                "espera_media_ms": (self._espera_total / self._emprestimos * 1000) if self._emprestimos else 0.0,
+                "espera_max_ms": self._espera_max * 1000,
+            }
+
+    def _abrir(self):
+        try:
+            conn = self._criar_conexao()
+        except Exception:
+            # Libera a vaga reservada para que outro pedido possa tentar
+            with self._cond:
+                self._abertas -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._criadas += 1
+        return conn
+
+    def _valida(self, conn, devolvida_em):
+        """Só testa (ping) conexões que ficaram ociosas por mais de `validar_apos` segundos."""
+        ociosa = time.monotonic() - devolvida_em
+        if ociosa > self.max_ociosa:
+            return False
+        if ociosa <= self.validar_apos:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _descartar(self, conn):
+        with self._cond:
+            self._abertas -= 1
+            self._descartadas += 1
+        self._fechar(conn)
+
+    @staticmethod
+    def _fechar(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,297 @@
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from consulta import COLUNAS
+
+
+SQL_COLUNAS = ", ".join(COLUNAS)
+
+# Log de alterações da tabela imoveis (migração 0012)
+SQL_INICIO_DO_LOG = "SELECT seq from imoveis_alteracoes WHERE registrada_em < NOW(6) - INTERVAL %s SECOND ORDER BY registrada_em DESC LIMIT 1"
+SQL_SEQS_DESDE = "SELECT seq from imoveis_alteracoes WHERE seq > %s ORDER BY seq"
+SQL_ALTERACOES_DESDE = "SELECT seq, imovel_id from imoveis_alteracoes WHERE seq > %s ORDER BY seq LIMIT %s"
+SQL_ALTERACOES_ENTRE = "SELECT seq, imovel_id from imoveis_alteracoes WHERE seq BETWEEN %s AND %s"
+
+# Colunas de texto com poucos valores distintos: uma única cópia de cada string na memória
+_COLUNAS_INTERNADAS = (COLUNAS.index("tipo_logradouro"), COLUNAS.index("bairro"), COLUNAS.index("cidade"), COLUNAS.index("tipo"))
+_I_CIDADE = COLUNAS.index("cidade")
+_I_TIPO = COLUNAS.index("tipo")
+
+
+class ReplicaCheia(Exception):
+    """A tabela passou do limite de linhas configurado para a réplica."""
+
+
+class ReplicaImoveis:
+    """Cópia em memória da tabela imoveis com índices para as rotas de leitura.
+
+    As linhas ficam como tuplas (na ordem de COLUNAS) num dicionário por id;
+    há índices hash por tipo e cidade (listas de ids ordenadas, para a
+    paginação por keyset).
+    """
+
+    def __init__(self, max_linhas=2_000_000):
+        self.max_linhas = max_linhas
+        self.pronta = False
+        self._lock = threading.RLock()
+        self._limpar()
+
+        self._seq = None  # último seq lido do log de alterações
+        self._lacunas = []  # (primeiro, último, desde): seqs de transações ainda abertas
+        self._ultima_sync = None
+        self._syncs = 0
+
+    def _limpar(self):
+        self._por_id = {}
+        self._ids = []
+        self._por_tipo = {}
+        self._por_cidade = {}
+        self._bytes = 0
+
+    # Carga e sincronização
+
+    def carregar(self, conn, lote=10000, max_transacao=600.0):
+        """Carrega a tabela inteira (em lotes de fetchmany) e marca a réplica como pronta.
+
+        A posição no log de alterações (migração 0012) é lida no mesmo snapshot
+        da carga: os seqs dos últimos `max_transacao` segundos que ainda não
+        estão visíveis são de transações abertas e ficam pendentes.
+        """
+        cursor = conn.cursor(buffered=True)
+        cursor.execute(SQL_INICIO_DO_LOG, (max_transacao,))
+        encontrado = cursor.fetchall()
+        inicio = encontrado[0][0] if encontrado else 0
+        cursor.execute(SQL_SEQS_DESDE, (inicio,))
+        ultimo, lacunas = _lacunas_entre(inicio, [linha[0] for linha in cursor.fetchall()], time.monotonic())
+
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(f"SELECT {SQL_COLUNAS} from imoveis ORDER BY id")
+        with self._lock:
+            self.pronta = False
+            self._limpar()
+            try:
+                while True:
+                    linhas = cursor.fetchmany(lote)
+                    if not linhas:
+                        break
+                    if len(self._por_id) + len(linhas) > self.max_linhas:
+                        raise ReplicaCheia(f"a tabela tem mais de {self.max_linhas} linhas")
+                    for linha in linhas:
+                        self._inserir(linha)
+            except Exception:
+                self._limpar()
+                raise
+            self._seq = ultimo
+            self._lacunas = lacunas
+            self._ultima_sync = time.time()
+            self.pronta = True
+
+    def sincronizar(self, conn, max_transacao=600.0, lote=10000):
+        """Aplica as linhas alteradas e removidas desde a última sincronização.
+
+        Lê do log de alterações (migração 0012) as entradas com seq maior que o
+        último lido. O AUTO_INCREMENT é atribuído na escrita e não no commit,
+        então um seq que falta entre dois lidos é de uma transação ainda
+        aberta: ele é procurado de novo a cada sincronização por até
+        `max_transacao` segundos, que deve cobrir a transação de escrita mais
+        longa (um /imoveis/batch grande, um bloco da transferencia.py).
+        Retorna o mesmo que `aplicar` (None na carga inicial).
+        """
+        if self._seq is None:
+            return self.carregar(conn, max_transacao=max_transacao)
+
+        agora = time.monotonic()
+        cursor = conn.cursor(buffered=True)
+        ids = set()
+
+        lacunas = []
+        for inicio, fim, desde in self._lacunas:
+            if agora - desde > max_transacao:
+                continue
+            cursor.execute(SQL_ALTERACOES_ENTRE, (inicio, fim))
+            achadas = sorted(cursor.fetchall())
+            ids.update(imovel_id for _, imovel_id in achadas)
+            anterior, faltando = _lacunas_entre(inicio - 1, [seq for seq, _ in achadas], desde)
+            if anterior < fim:
+                faltando.append((anterior + 1, fim, desde))
+            lacunas.extend(faltando)
+
+        ultimo = self._seq
+        while True:
+            cursor.execute(SQL_ALTERACOES_DESDE, (ultimo, lote))
+            novas = cursor.fetchall()
+            ids.update(imovel_id for _, imovel_id in novas)
+            ultimo, faltando = _lacunas_entre(ultimo, [seq for seq, _ in novas], agora)
+            lacunas.extend(faltando)
+            if len(novas) < lote:
+                break
+
+        # As linhas são lidas no mesmo snapshot do log: estão pelo menos na
+        # versão das alterações que foram lidas
+        alteradas, removidas = [], []
+        ids = sorted(ids)
+        for inicio in range(0, len(ids), lote):
+            pedaco = ids[inicio:inicio + lote]
+            marcadores = ", ".join(["%s"] * len(pedaco))
+            cursor.execute(f"SELECT {SQL_COLUNAS} from imoveis WHERE id IN ({marcadores})", tuple(pedaco))
+            encontradas = cursor.fetchall()
+            encontrados = {linha[0] for linha in encontradas}
+            alteradas.extend(encontradas)
+            removidas.extend(id for id in pedaco if id not in encontrados)
+        conn.commit()
+
+        mudancas = self.aplicar(alteradas, removidas)
+        with self._lock:
+            self._seq = ultimo
+            self._lacunas = lacunas
+            self._ultima_sync = time.time()
+            self._syncs += 1
+        return mudancas
+
+    def aplicar(self, linhas=(), removidos=()):
+        """Aplica na réplica escritas já confirmadas no banco (linhas completas e ids removidos).
+
+        Retorna (linhas que mudaram a réplica, ids que saíram dela): uma linha
+        igual à que já estava, como as que a sincronização relê depois de uma
+        escrita do próprio processo, não conta.
+        """
+        mudadas, saidos = [], []
+        with self._lock:
+            for id in removidos:
+                if self._remover(id) is not None:
+                    saidos.append(id)
+            for linha in linhas:
+                if self._por_id.get(linha[0]) == tuple(linha[:len(COLUNAS)]):
+                    continue
+                self._remover(linha[0])
+                if len(self._por_id) >= self.max_linhas:
+                    # Sem espaço: a réplica deixa de responder e as leituras voltam ao banco
+                    self.pronta = False
+                    break
+                self._inserir(linha)
+                mudadas.append(linha)
+        return mudadas, saidos
+
+    # Consultas
+
+    def por_id(self, id):
+        return self._por_id.get(id)
+
+    def pagina(self, chave, after, limit):
+        """Até `limit` + 1 linhas com id > `after` de um índice ("tipo"/"cidade", valor) ou da tabela toda (None)."""
+        with self._lock:
+            if chave is None:
+                ids = self._ids
+            elif chave[0] == "tipo":
+                ids = self._por_tipo.get(chave[1], [])
+            elif chave[0] == "cidade":
+                ids = self._por_cidade.get(chave[1], [])
+            else:
+                raise ValueError(f"índice desconhecido: {chave[0]}")
+            inicio = bisect_right(ids, after)
+            return [self._por_id[id] for id in ids[inicio:inicio + limit + 1]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pronta": self.pronta,
+                "linhas": len(self._por_id),
+                "max_linhas": self.max_linhas,
+                "bytes_estimados": self._bytes,
+                "tipos": len(self._por_tipo),
+                "cidades": len(self._por_cidade),
+                "sincronizacoes": self._syncs,
+                "seq": self._seq,
+                "transacoes_pendentes": sum(fim - inicio + 1 for inicio, fim, _ in self._lacunas),
+                "segundos_desde_sync": time.time() - self._ultima_sync if self._ultima_sync else None,
+            }
+
+    # Manutenção dos índices
+
+    def _inserir(self, linha):
+        linha = tuple(sys.intern(valor) if i in _COLUNAS_INTERNADAS and isinstance(valor, str) else valor
+                      for i, valor in enumerate(linha[:len(COLUNAS)]))
+        id = linha[0]
+        self._por_id[id] = linha
+        _inserir_ordenado(self._ids, id)
+        _inserir_ordenado(self._por_tipo.setdefault(linha[_I_TIPO], []), id)
+        _inserir_ordenado(self._por_cidade.setdefault(linha[_I_CIDADE], []), id)
+        self._bytes += _tamanho(linha)
+
+    def _remover(self, id):
+        linha = self._por_id.pop(id, None)
+        if linha is None:
+            return None
+        _remover_ordenado(self._ids, id)
+        _remover_do_indice(self._por_tipo, linha[_I_TIPO], id)
+        _remover_do_indice(self._por_cidade, linha[_I_CIDADE], id)
+        self._bytes -= _tamanho(linha)
+        return linha
+
+
+def iniciar_sincronizacao(replica, conectar, intervalo, ao_aplicar=None, max_transacao=600.0):
+    """Thread em segundo plano: carrega a réplica e depois aplica os deltas a cada `intervalo` segundos.
+
+    `ao_aplicar(linhas, removidos)` é chamada quando um delta muda a réplica;
+    `max_transacao` vai para `sincronizar`.
+    """
+    def laco():
+        while True:
+            conn = conectar()
+            if conn is not None:
+                try:
+                    with conn:
+                        mudancas = replica.sincronizar(conn, max_transacao)
+                    if ao_aplicar is not None and mudancas is not None and any(mudancas):
+                        ao_aplicar(*mudancas)
+                except ReplicaCheia as err:
+                    print(f"Réplica em memória desligada: {err}")
+                    return
+                except Exception as err:
+                    print(f"Erro ao sincronizar a réplica em memória: {err}")
+            time.sleep(intervalo)
+
+    thread = threading.Thread(target=laco, name="sincroniza-replica", daemon=True)
+    thread.start()
+    return thread
+
+
+def _lacunas_entre(anterior, seqs, desde):
+    """Percorre `seqs` (em ordem) a partir de `anterior` e retorna (último seq, faixas que faltaram)."""
+    lacunas = []
+    for seq in seqs:
+        if seq > anterior + 1:
+            lacunas.append((anterior + 1, seq - 1, desde))
+        anterior = max(anterior, seq)
+    return anterior, lacunas
+
+
+def _inserir_ordenado(lista, item):
+    # Na carga os ids chegam em ordem crescente: append em vez de busca binária
+    if not lista or lista[-1] < item:
+        lista.append(item)
+    else:
+        insort(lista, item)
+
+
+def _remover_ordenado(lista, item):
+    posicao = bisect_left(lista, item)
+    if posicao < len(lista) and lista[posicao] == item:
+        del lista[posicao]
+
+
+def _remover_do_indice(indice, chave, id):
+    ids = indice.get(chave)
+    if ids is not None:
+        _remover_ordenado(ids, id)
+        if not ids:
+            del indice[chave]
+
+
+def _tamanho(linha):
+    """Estimativa dos bytes da linha e das suas entradas nos índices (strings internadas não contam)."""
+    proprios = sum(sys.getsizeof(valor) for i, valor in enumerate(linha) if i not in _COLUNAS_INTERNADAS)
+    # tupla da linha + entrada no dict por id + 3 ponteiros nos índices
+    return sys.getsizeof(linha) + proprios + 100 + 3 * 8
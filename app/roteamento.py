@@ -0,0 +1,122 @@
+import itertools
+import threading
+import time
+
+from pool import PoolEsgotado
+
+
+POLITICAS = ("round_robin", "menos_ocupada")
+
+
+class _Replica:
+    __slots__ = ("nome", "pool", "ejetada_ate", "falhas")
+
+    def __init__(self, nome, pool):
+        self.nome = nome
+        self.pool = pool
+        self.ejetada_ate = 0.0
+        self.falhas = 0
+
+
+class RoteadorReplicas:
+    """Escolhe a réplica de leitura de cada pedido e tira do rodízio as que falham.
+
+    Uma réplica que falha ao conectar (ou no health check) fica ejetada por
+    `ejecao` segundos; o health check periódico a devolve ao rodízio quando
+    ela volta a responder.
+    """
+
+    def __init__(self, pools, politica="round_robin", ejecao=30.0):
+        if politica not in POLITICAS:
+            raise ValueError(f"política deve ser uma de: {', '.join(POLITICAS)}")
+        self.politica = politica
+        self.ejecao = ejecao
+        self._replicas = [_Replica(nome, pool) for nome, pool in pools]
+        self._rodizio = itertools.count()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Conexão de uma réplica saudável, ou None se nenhuma estiver disponível."""
+        for replica in self._candidatas():
+            try:
+                conn = replica.pool.adquirir()
+            except PoolEsgotado:
+                # Réplica ocupada não é réplica com defeito: tenta a próxima
+                continue
+            except Exception as err:
+                print(f"Erro na réplica {replica.nome}: {err}")
+                self.ejetar(replica)
+                continue
+            with self._lock:
+                replica.falhas = 0
+            return conn
+        return None
+
+    def ejetar(self, replica):
+        with self._lock:
+            replica.falhas += 1
+            replica.ejetada_ate = time.monotonic() + self.ejecao
+
+    def verificar(self):
+        """Health check: pinga cada réplica; as que respondem voltam (ou continuam) no rodízio.
+
+        Uma réplica com o pool esgotado fica como está, como em `adquirir`.
+        """
+        for replica in self._replicas:
+            try:
+                with replica.pool.adquirir(timeout=1.0) as conn:
+                    conn.ping(reconnect=False)
+            except PoolEsgotado:
+                # Todas as conexões ocupadas: a réplica está atendendo, só não sobrou uma para o ping
+                continue
+            except Exception:
+                self.ejetar(replica)
+            else:
+                with self._lock:
+                    replica.ejetada_ate = 0.0
+                    replica.falhas = 0
+
+    def aquecer(self, quantidade=None):
+        """Abre de antemão as conexões de cada réplica; a que não conecta sai do rodízio (e volta pelo health check)."""
+        abertas = 0
+        for replica in self._replicas:
+            try:
+                abertas += replica.pool.aquecer(quantidade)
+            except Exception as err:
+                print(f"Erro na réplica {replica.nome}: {err}")
+                self.ejetar(replica)
+        return abertas
+
+    def iniciar_health_check(self, intervalo):
+        def laco():
+            while True:
+                time.sleep(intervalo)
+                self.verificar()
+
+        thread = threading.Thread(target=laco, name="health-check-replicas", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        agora = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "nome": replica.nome,
+                    "saudavel": replica.ejetada_ate <= agora,
+                    "falhas": replica.falhas,
+                    **replica.pool.stats(),
+                }
+                for replica in self._replicas
+            ]
+
+    def _candidatas(self):
+        agora = time.monotonic()
+        with self._lock:
+            saudaveis = [replica for replica in self._replicas if replica.ejetada_ate <= agora]
+            if not saudaveis:
+                return []
+            if self.politica == "menos_ocupada":
+                return sorted(saudaveis, key=lambda replica: replica.pool.stats()["em_uso"])
+            inicio = next(self._rodizio) % len(saudaveis)
+            return saudaveis[inicio:] + saudaveis[:inicio]
@@ -0,0 +1,91 @@
+"""Serialização das linhas da tabela imoveis para JSON.
+
+As linhas vêm do cursor (ou da réplica em memória) como tuplas; aqui elas
+viram dicionários só com os campos pedidos ou, no formato colunar, listas.
+O valor (Decimal) sai como número e a data de aquisição em ISO (AAAA-MM-DD).
+"""
+from datetime import date
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from consulta import COLUNAS
+
+
+# Formato colunar opt-in das listagens: {"columns": [...], "rows": [[...], ...]}
+FORMATO_COLUNAS = "colunas"
+
+
+def _numero(valor):
+    return float(valor) if isinstance(valor, Decimal) else valor
+
+
+def _data_iso(valor):
+    return valor.isoformat() if isinstance(valor, date) else valor
+
+
+# Colunas cujo valor vindo do banco precisa de conversão para JSON
+_CONVERSOES = {"valor": _numero, "data_aquisicao": _data_iso}
+
+
+def _extrator(campos, colunas):
+    """Função linha -> lista com os valores de `campos`, já convertidos, para linhas com as `colunas` dadas."""
+    indices = [colunas.index(campo) for campo in campos]
+    conversoes = [(posicao, _CONVERSOES[campo]) for posicao, campo in enumerate(campos) if campo in _CONVERSOES]
+
+    if indices == list(range(len(indices))):
+        # Caso comum (todas as colunas, na ordem do SELECT): um fatiamento em vez de um acesso por campo
+        fim = len(indices)
+        extrair = lambda linha: list(linha[:fim])
+    else:
+        extrair = lambda linha: [linha[indice] for indice in indices]
+
+    def valores(linha):
+        lista = extrair(linha)
+        for posicao, converter in conversoes:
+            lista[posicao] = converter(lista[posicao])
+        return lista
+
+    return valores
+
+
+def conversor(campos=None, colunas=COLUNAS):
+    """Função linha -> dicionário com `campos` (todos, se None) para linhas com as `colunas` dadas."""
+    campos = campos or COLUNAS
+    valores = _extrator(campos, colunas)
+    return lambda linha: dict(zip(campos, valores(linha)))
+
+
+def conversor_colunar(campos=None, colunas=COLUNAS):
+    """Função linha -> lista de valores na ordem de `campos` (todos, se None), para o formato colunar."""
+    return _extrator(campos or COLUNAS, colunas)
+
+
+def corpo_imoveis(linhas, campos=None, colunas=COLUNAS, formato=None):
+    """Corpo de uma listagem: `{"imoveis": [...]}` ou, no formato colunar, `{"columns", "rows"}`."""
+    if formato == FORMATO_COLUNAS:
+        valores = conversor_colunar(campos, colunas)
+        return {"columns": list(campos or COLUNAS), "rows": [valores(linha) for linha in linhas]}
+    para_dict = conversor(campos, colunas)
+    return {"imoveis": [para_dict(linha) for linha in linhas]}
+
+
+def _padrao(valor):
+    """Tipos que o json não conhece e que ainda chegam fora das linhas (ex.: estatísticas)."""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"Objeto do tipo {type(valor).__name__} não é serializável em JSON")
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Provedor JSON do Flask sem ordenar chaves, sem escapar acentos e sem espaços (também em debug).
+
+    Decimal sai como número e date em ISO (o padrão do Flask seria string e data HTTP).
+    """
+
+    default = staticmethod(_padrao)
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
@@ -1,65 +1,714 @@
-from flask import Flask, request, jsonify
-from utils import connect_db
+import os
+import time
+from functools import wraps
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from utils import connect_db, pool_stats
+from config import paginacao_config, stream_config, cache_config, lote_config, replica_config, replicas_config, metricas_config, consultas_lentas_config, compressao_config, coalescencia_config, admissao_config, versao_config
+from streaming import FORMATOS_STREAM, ler_em_lotes, gerar_ndjson, gerar_array_json
+from cache import CacheLRU
+from versao import VersaoTabela, iniciar_observacao, ler_fatia_da_conexao
+from consulta import COLUNAS, NIVEIS_CEP, args_da_faixa, montar_busca, montar_busca_texto, montar_busca_cep, montar_contagem_cep, cursor_da_linha, cursor_da_relevancia, ler_campos, ler_ordenacao, projecao
+from estatisticas import ler_resumo
+from replica import ReplicaImoveis, SQL_COLUNAS, iniciar_sincronizacao
+from lote import MODOS, ErroLote, inserir_lote, ler_imoveis, ler_alvo, ler_alteracoes, atualizar_lote, remover_lote
+from metricas import Medicao, RegistroMetricas, JSONMedido, medir
+from consultas_lentas import RegistroConsultasLentas
+from serializacao import FORMATO_COLUNAS, conversor, corpo_imoveis
+from compressao import TIPOS_COMPRIMIVEIS, escolher, comprimir, comprimir_pedacos
+from coalescencia import Coalescedor
+from admissao import PRIORIDADE_ALTA, PRIORIDADE_NORMAL, PRIORIDADE_BAIXA, Sobrecarga, LimitadorPorCliente, FilaBanco
 
 
 app = Flask(__name__)
+# jsonify passa pelo provedor medido: o tempo de serialização entra nas métricas
+app.json = JSONMedido(app)
+
+# Histogramas por rota das fases de cada requisição, expostos em /metrics
+metricas = RegistroMetricas()
+
+# Ranking por tempo total de todas as consultas e log com EXPLAIN das lentas.
+# connect_db é resolvido a cada EXPLAIN (o benchmark troca a função)
+consultas_lentas = RegistroConsultasLentas(
+    lambda: connect_db(),
+    limiar=consultas_lentas_config['limiar'],
+    arquivo=consultas_lentas_config['arquivo'],
+    max_bytes=consultas_lentas_config['max_bytes'],
+    backups=consultas_lentas_config['backups'],
+    por_minuto=consultas_lentas_config['por_minuto'],
+    top=consultas_lentas_config['top'],
+)
+
+# Cache das rotas de leitura por id/tipo/cidade, invalidado pelas rotas de escrita
+cache = CacheLRU(**cache_config)
+
+# Clientes que escreveram há pouco e por isso leem do primário (só com réplicas de leitura)
+escritas_recentes = CacheLRU(max_itens=100000, ttl=replicas_config['sticky'])
+COOKIE_STICKY = "le_primario_ate"
+ultima_escrita = 0.0
+
+# Tag das contagens por prefixo de CEP no cache (invalidada em toda escrita)
+TAG_CONTAGEM_CEP = ("cep", "contagem")
+
+# Réplica em memória para as leituras (LEITURA_MEMORIA=1); None quando desligada
+replica = ReplicaImoveis(replica_config['max_linhas']) if replica_config['ativa'] else None
+
+# Versão da tabela imoveis; toda escrita incrementa e muda as ETags das leituras.
+# As escritas de fora do processo chegam pela versão compartilhada (ver iniciar_observacao_versao)
+versao_imoveis = VersaoTabela()
+# Ligada por iniciar_observacao_versao: só então as escritas leem a versão compartilhada que incrementaram
+observando_versao = False
+
+# Requisições de leitura iguais e simultâneas esperam uma só consulta ao banco (ver coalescer)
+coalescencia = Coalescedor(timeout=coalescencia_config['timeout'])
+
+# Limite de requisições por cliente (None sem ADMISSAO_TAXA) e fila do trabalho no banco (None com ADMISSAO_FILA_BANCO=0)
+limitador = LimitadorPorCliente(admissao_config['taxa'], admissao_config['rajada']) if admissao_config['taxa'] > 0 else None
+fila_banco = FilaBanco(admissao_config['vagas'], admissao_config['fila_maxima'], admissao_config['prazo']) if admissao_config['fila'] else None
+
+# Na fila do banco a leitura por id passa na frente e a listagem completa fica por último
+PRIORIDADES = {"get_imoveis_por_id": PRIORIDADE_ALTA, "get_imoveis": PRIORIDADE_BAIXA}
+
+# Rotas de observação: ficam fora do controle de admissão para continuar respondendo na sobrecarga
+ROTAS_SEM_ADMISSAO = {"get_vivo", "get_pronto", "get_metricas", "get_consultas", "get_pool_stats", "get_replica_stats", "get_cache_stats", "get_coalescencia_stats", "get_admissao_stats"}
+
+# Preenchido por servir.criar_app quando o worker termina o aquecimento (aparece em /saude/pronto)
+aquecimento = None
+# Marcado pelo worker do servir.py ao receber SIGTERM: /saude/pronto responde 503 enquanto ele drena
+encerrando = False
+
+# Rotas de leitura que respondem a If-None-Match sem consultar o banco
+ROTAS_COM_ETAG = {"get_imoveis", "get_imoveis_por_id", "get_imoveis_por_tipo", "get_imoveis_por_cidade", "buscar_imoveis", "get_faixa", "get_top", "buscar_texto", "get_imoveis_por_cep", "get_contagem_cep", "get_estatisticas"}
+
+
+@app.before_request
+def iniciar_medicao():
+    if metricas_config['ativas']:
+        g.medicao = Medicao()
+
+
+@app.after_request
+def fechar_medicao(resposta):
+    medicao = g.get("medicao")
+    if medicao is not None:
+        medicao.status = resposta.status_code
+        if not resposta.is_streamed:
+            medicao.bytes = resposta.content_length or 0
+        if metricas_config['server_timing']:
+            # Numa resposta em streaming, só o que aconteceu antes do primeiro byte
+            resposta.headers["Server-Timing"] = medicao.server_timing()
+    return resposta
+
+
+def codificacao_pedida():
+    """Codificação negociada pelo Accept-Encoding (None se a compressão está desligada ou o cliente não aceita)."""
+    if not compressao_config['ativa']:
+        return None
+    return escolher(request.accept_encodings)
+
+
+# Registrado depois de fechar_medicao para rodar antes dele: os bytes medidos são os enviados
+@app.after_request
+def comprimir_resposta(resposta):
+    """Comprime JSON/NDJSON/texto; respostas do cache reaproveitam os bytes já comprimidos."""
+    if not compressao_config['ativa'] or resposta.mimetype not in TIPOS_COMPRIMIVEIS:
+        return resposta
+    resposta.vary.add("Accept-Encoding")
+    codificacao = codificacao_pedida()
+    if codificacao is None or request.method == "HEAD" or resposta.status_code in (204, 304) or "Content-Encoding" in resposta.headers:
+        return resposta
+
+    nivel = compressao_config['nivel']
+    if resposta.is_streamed:
+        # Comprime lote a lote; o contexto fica aberto até o último byte, como no streaming sem compressão
+        resposta.response = stream_with_context(comprimir_pedacos(resposta.response, codificacao, nivel))
+    else:
+        corpo = resposta.get_data()
+        if len(corpo) < compressao_config['minimo']:
+            return resposta
+        comprimidos = getattr(resposta, "comprimidos", None)
+        comprimido = comprimidos.get(codificacao) if comprimidos is not None else None
+        if comprimido is None:
+            with medir("compressao"):
+                comprimido = comprimir(corpo, codificacao, nivel)
+            if comprimidos is not None:
+                comprimidos.guardar(codificacao, comprimido)
+        resposta.set_data(comprimido)
+    resposta.headers["Content-Encoding"] = codificacao
+    return resposta
+
+
+@app.teardown_request
+def registrar_medicao(erro=None):
+    """Roda depois do último byte (também no streaming), então conta o fetch de todos os lotes."""
+    medicao = g.pop("medicao", None)
+    if medicao is not None:
+        if medicao.status is None or erro is not None:
+            medicao.status = 500
+        rota = request.endpoint or "desconhecida"
+        metricas.registrar(rota, request.method, medicao)
+        if consultas_lentas_config['ativas']:
+            for sql, params, segundos, linhas in medicao.consultas:
+                consultas_lentas.observar(rota, sql, params, segundos, linhas)
+
+
+class Comprimidos(dict):
+    """Versões comprimidas de uma resposta, por codificação.
+
+    Com `chave`, são as de uma entrada do cache: cada versão nova soma os
+    seus bytes no tamanho da entrada, que entra no limite de CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, chave=None):
+        super().__init__()
+        self.chave = chave
+
+    def guardar(self, codificacao, comprimido):
+        # setdefault: se duas requisições comprimirem juntas, só a primeira soma
+        if self.setdefault(codificacao, comprimido) is comprimido and self.chave is not None:
+            cache.crescer(self.chave, len(comprimido), valido=lambda valor: valor[2] is self)
+
+
+def resposta_do_cache(chave):
+    """Monta a resposta guardada em `chave`, se houver.
+
+    Numa falta, anota a versão da tabela antes da consulta que a rota vai fazer (ver guardar_no_cache).
+    """
+    valor = cache.get(chave)
+    if valor is None:
+        g.versao_consultada = versao_imoveis.atual()
+        return None
+    corpo, status, comprimidos = valor
+    resposta = Response(corpo, status=status, mimetype="application/json")
+    resposta.comprimidos = comprimidos
+    return resposta
+
+
+def guardar_no_cache(chave, resposta, status, tags):
+    """Guarda o corpo já serializado de `resposta` marcado com `tags`.
+
+    As versões comprimidas entram na mesma entrada (por codificação) quando
+    comprimir_resposta as gera, e o tamanho da entrada cresce com elas.
+    Se uma escrita mudou a versão da tabela desde a falta em resposta_do_cache,
+    a consulta pode ter lido as linhas de antes dela e a invalidação já passou:
+    a resposta vai ao cliente, mas não é guardada.
+    """
+    versao = g.pop("versao_consultada", None)
+    if leitura_talvez_atrasada() or versao is None:
+        # Logo depois de uma escrita a leitura pode ter vindo de uma réplica atrasada
+        return resposta, status
+    corpo = resposta.get_data()
+    resposta.comprimidos = Comprimidos(chave)
+    cache.set(chave, (corpo, status, resposta.comprimidos), len(corpo), tags, valido=lambda: versao_imoveis.atual() == versao)
+    return resposta, status
+
+
+def invalidar_imoveis(ids, imoveis=()):
+    """Invalida o que uma escrita nos imóveis `ids` pode ter mudado.
+
+    As páginas que já continham um imóvel carregam a tag ("id", id); se a escrita
+    coloca o imóvel numa cidade/tipo, as listagens dessa cidade/tipo também caem.
+    Uma chamada conta como uma única escrita: a versão da tabela sobe uma vez só.
+    As contagens por prefixo de CEP mudam com qualquer escrita e sempre caem.
+    """
+    tags = {("id", id) for id in ids} | {TAG_CONTAGEM_CEP}
+    for imovel in imoveis:
+        for coluna in ("cidade", "tipo"):
+            if coluna in imovel:
+                tags.add((coluna, imovel[coluna]))
+    versao_imoveis.incrementar()
+    cache.invalidar(*tags)
+
+
+def ler_versao_da_escrita(cursor, escritas):
+    """Na transação de uma escrita, logo antes do commit: (fatia, versão, escritas) da versão compartilhada.
+
+    Só com a observação da versão ligada e se a escrita gravou alguma linha (a
+    fatia já está travada pela transação, então a leitura não espera). Passada
+    a invalidar_escrita, faz a observação descontar a escrita em vez de esvaziar o cache.
+    """
+    if not observando_versao or escritas <= 0:
+        return None
+    try:
+        fatia = ler_fatia_da_conexao(cursor)
+    except Exception as err:
+        # Sem o registro a escrita só parece de outro processo: o cache cai inteiro, mas nada fica velho
+        print(f"Erro ao ler a versão compartilhada da escrita: {err}")
+        return None
+    return None if fatia is None else (*fatia, escritas)
+
+
+def invalidar_escrita(ids, imoveis=(), versao_lida=None):
+    """Invalida o cache depois de uma escrita feita (e confirmada) por uma rota deste processo.
+
+    `versao_lida` vem de ler_versao_da_escrita: registrada aqui, a mudança que a
+    escrita causou na versão compartilhada não é tomada por escrita de outro processo.
+    """
+    global ultima_escrita
+    ultima_escrita = time.monotonic()
+    if versao_lida is not None:
+        versao_imoveis.registrar_propria(*versao_lida)
+    invalidar_imoveis(ids, imoveis)
+
+
+def versao_mudou_no_banco():
+    """Outro processo (ou um comando direto no banco) escreveu: nada do cache local é confiável.
+
+    `observar` já incrementou a versão, então as ETags antigas deixam de valer.
+    As escritas deste processo não chegam aqui (ver ler_versao_da_escrita).
+    """
+    global ultima_escrita
+    ultima_escrita = time.monotonic()
+    cache.limpar()
+
+
+def replica_sincronizada(linhas, removidos):
+    """A sincronização trouxe para a réplica em memória linhas escritas fora deste processo."""
+    invalidar_imoveis([linha[0] for linha in linhas] + list(removidos), [dict(zip(COLUNAS, linha)) for linha in linhas])
+
+
+def leitura_talvez_atrasada():
+    """Com réplicas de leitura, logo depois de uma escrita a leitura pode ter vindo de uma réplica atrasada."""
+    return bool(replicas_config['hosts']) and time.monotonic() - ultima_escrita < replicas_config['sticky']
+
+
+def leitura_no_primario():
+    """Read-your-writes: logo depois de escrever, o cliente lê do primário e não de uma réplica atrasada."""
+    if not replicas_config['hosts']:
+        return True
+    try:
+        if float(request.cookies.get(COOKIE_STICKY, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    return escritas_recentes.get(request.remote_addr) is not None
+
+
+@app.before_request
+def limitar_cliente():
+    """Recusa com 429 o cliente que passou da sua taxa de requisições (antes até do 304 da ETag)."""
+    if limitador is not None and request.endpoint not in ROTAS_SEM_ADMISSAO:
+        limitador.consumir(request.remote_addr)
+
+
+@app.errorhandler(Sobrecarga)
+def responder_sobrecarga(err):
+    resposta = jsonify({"erro": str(err)})
+    resposta.status_code = err.status
+    resposta.headers["Retry-After"] = str(err.retry_after)
+    return resposta
+
+
+def admitir_no_banco():
+    """Ocupa uma vaga da fila do banco para a requisição; a vaga fica com ela até o teardown.
+
+    Só entra na fila quem de fato vai ao banco: acertos do cache, da réplica em
+    memória e da coalescência não pegam conexão e não esperam.
+    """
+    if fila_banco is None or g.get("vaga_banco"):
+        return
+    prioridade = PRIORIDADES.get(request.endpoint, PRIORIDADE_NORMAL)
+    if formato_stream() in FORMATOS_STREAM:
+        prioridade = PRIORIDADE_BAIXA
+    fila_banco.entrar(prioridade)
+    g.vaga_banco = True
+
+
+@app.teardown_request
+def liberar_vaga_banco(erro=None):
+    # No streaming o teardown só roda depois do último lote: a vaga acompanha a conexão
+    if g.pop("vaga_banco", False):
+        fila_banco.sair()
+
+
+def conectar_leitura():
+    """Conexão para uma rota de leitura: de uma réplica, salvo logo depois de uma escrita do mesmo cliente."""
+    admitir_no_banco()
+    return connect_db(leitura=not leitura_no_primario())
+
+
+def conectar_escrita():
+    """Conexão do primário para uma rota de escrita, depois de passar pela fila do banco."""
+    admitir_no_banco()
+    return connect_db()
+
+
+@app.after_request
+def marcar_escrita(resposta):
+    """Depois de uma escrita bem-sucedida, prende as leituras do cliente ao primário por alguns segundos."""
+    if replicas_config['hosts'] and request.method in ("POST", "PUT", "DELETE") and resposta.status_code < 400:
+        escritas_recentes.set(request.remote_addr, True, 0)
+        ate = time.time() + replicas_config['sticky']
+        resposta.set_cookie(COOKIE_STICKY, f"{ate:.3f}", max_age=int(replicas_config['sticky']) + 1, httponly=True)
+    return resposta
+
+
+def usar_replica():
+    """As leituras só saem da réplica depois que a carga inicial terminou."""
+    return replica is not None and replica.pronta
+
+
+def atualizar_replica(linhas=(), removidos=()):
+    """Repassa à réplica (se ligada) uma escrita já confirmada no banco."""
+    if replica is not None:
+        replica.aplicar(linhas, removidos)
+
+
+def recarregar_na_replica(conn, ids):
+    """Relê do banco as linhas `ids` (em pedaços) e atualiza a réplica, se ligada.
+
+    Roda depois do commit, então nunca levanta: a escrita já valeu, e uma
+    linha que não pôde ser relida chega pela sincronização periódica.
+    """
+    if replica is None or not ids:
+        return
+    try:
+        cursor = conn.cursor()
+        for inicio in range(0, len(ids), lote_config['tamanho']):
+            pedaco = ids[inicio:inicio + lote_config['tamanho']]
+            marcadores = ", ".join(["%s"] * len(pedaco))
+            cursor.execute(f"SELECT {SQL_COLUNAS} from imoveis WHERE id IN ({marcadores})", tuple(pedaco))
+            encontradas = cursor.fetchall()
+            encontrados = {linha[0] for linha in encontradas}
+            replica.aplicar(encontradas, [id for id in pedaco if id not in encontrados])
+    except Exception as err:
+        print(f"Erro ao atualizar a réplica em memória: {err}")
+
+
+def iniciar_replica():
+    """Começa a carga da réplica e a sincronização periódica em segundo plano."""
+    if replica is not None:
+        iniciar_sincronizacao(replica, connect_db, replica_config['intervalo_sync'], replica_sincronizada,
+                              replica_config['max_transacao'])
+
+
+def iniciar_observacao_versao():
+    """Lê a versão compartilhada da tabela (migração 0008) em segundo plano.
+
+    Com vários workers (servir.py), ou com escritas feitas pela transferencia.py
+    ou direto no banco, é por ela que este processo fica sabendo que a tabela
+    mudou: o cache é esvaziado e as ETags mudam em até VERSAO_INTERVALO segundos.
+    """
+    global observando_versao
+    if versao_config['intervalo'] > 0:
+        observando_versao = True
+        # connect_db é resolvido a cada leitura (o servir.py com --sqlite troca a função)
+        iniciar_observacao(versao_imoveis, lambda: connect_db(), versao_config['intervalo'], versao_mudou_no_banco)
+
+
+@app.before_request
+def verificar_etag():
+    """Responde 304 quando o cliente já tem a versão atual do recurso."""
+    if request.method != "GET" or request.endpoint not in ROTAS_COM_ETAG:
+        return None
+
+    # A versão é lida antes da consulta: uma escrita concorrente gera outra ETag
+    # A codificação entra na ETag: a versão comprimida é outra representação do recurso
+    etag = versao_imoveis.etag(request.path, sorted(request.args.items(multi=True)), formato_stream(), codificacao_pedida())
+    g.etag = etag
+    if etag in request.if_none_match:
+        resposta = Response(status=304)
+        resposta.set_etag(etag)
+        return resposta
+    return None
+
+
+@app.after_request
+def definir_etag(resposta):
+    etag = g.pop("etag", None)
+    # Sem ETag para o que pode ter vindo de uma réplica atrasada: o cliente guardaria dados velhos com a versão nova
+    if etag is not None and resposta.status_code == 200 and not leitura_talvez_atrasada():
+        resposta.set_etag(etag)
+    return resposta
+
+
+def coalescer(view):
+    """Junta as chamadas simultâneas de `view` com a mesma rota, parâmetros e versão da tabela.
+
+    A primeira executa a view; as outras recebem uma cópia da resposta já
+    serializada (e das versões comprimidas que forem sendo geradas). Respostas
+    em streaming não entram: cada cliente lê o seu próprio cursor.
+    """
+    @wraps(view)
+    def coalescida(**kwargs):
+        if not coalescencia_config['ativa'] or formato_stream() in FORMATOS_STREAM:
+            return view(**kwargs)
+        # A versão e o destino da leitura entram na chave: depois de uma escrita ninguém recebe a resposta antiga
+        chave = (request.endpoint, request.path, tuple(sorted(request.args.items(multi=True))),
+                 versao_imoveis.atual(), leitura_no_primario())
+
+        def executar():
+            resposta = app.make_response(view(**kwargs))
+            comprimidos = getattr(resposta, "comprimidos", None)
+            return resposta.get_data(), resposta.status_code, resposta.content_type, Comprimidos() if comprimidos is None else comprimidos
+
+        corpo, status, tipo, comprimidos = coalescencia.executar(chave, executar)
+        resposta = Response(corpo, status=status, content_type=tipo)
+        resposta.comprimidos = comprimidos
+        return resposta
+
+    return coalescida
+
+
+def ler_projecao(*obrigatorias):
+    """Lê `fields` e devolve (campos pedidos ou None, colunas do SELECT, lista de colunas para o SQL)."""
+    campos = ler_campos(request.args.get("fields"))
+    colunas = projecao(campos, *obrigatorias)
+    return campos, colunas, "*" if campos is None else ", ".join(colunas)
+
+
+def ler_limit(nome="limit", padrao=None):
+    """Lê `limit` (ou `nome`) da query string, validando os limites de paginação."""
+    try:
+        limit = int(request.args.get(nome, padrao or paginacao_config['padrao']))
+    except ValueError:
+        raise ValueError(f"{nome} deve ser um número inteiro")
+    if not 1 <= limit <= paginacao_config['maximo']:
+        raise ValueError(f"{nome} deve estar entre 1 e {paginacao_config['maximo']}")
+    return limit
+
+
+def parametros_pagina():
+    """Lê `limit` e `after` da query string, validando os limites de paginação."""
+    limit = ler_limit()
+    try:
+        after = int(request.args.get("after", 0))
+    except ValueError:
+        raise ValueError("after deve ser um número inteiro")
+    if after < 0:
+        raise ValueError("after deve ser um id não negativo")
+    return limit, after
+
+
+def formato_stream():
+    """Formato pedido (`?formato=ndjson|stream|colunas` ou Accept: application/x-ndjson), se houver."""
+    formato = request.args.get("formato")
+    if formato is None and request.accept_mimetypes.best == FORMATOS_STREAM["ndjson"]:
+        formato = "ndjson"
+    return formato
+
+
+def transmitir_imoveis(filtro, params, formato, campos, colunas, sql_colunas):
+    """Envia todos os imóveis do filtro (a partir de `after`) sem materializar o resultado."""
+    try:
+        after = int(request.args.get("after", 0))
+    except ValueError:
+        return jsonify({"erro": "after deve ser um número inteiro"}), 400
+
+    conn = conectar_leitura()
+    if conn is None:
+        return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
+
+    where = f"WHERE {filtro} AND id > %s" if filtro else "WHERE id > %s"
+    sql = f"SELECT {sql_colunas} from imoveis {where} ORDER BY id"
+    lotes = ler_em_lotes(conn, sql, (*params, after), stream_config['lote'])
+
+    para_dict = conversor(campos, colunas)
+    if formato == "ndjson":
+        corpo = gerar_ndjson(lotes, para_dict, app.json.dumps)
+    else:
+        corpo = gerar_array_json(lotes, para_dict, app.json.dumps)
+    resposta = Response(stream_with_context(corpo), status=200, mimetype=FORMATOS_STREAM[formato])
+    # Um HEAD (ou um cliente que some antes do primeiro byte) nunca itera o corpo e o `with conn:` de
+    # ler_em_lotes não chega a rodar: o fechamento da resposta devolve a conexão (close é idempotente)
+    resposta.call_on_close(conn.close)
+    return resposta
+
+
+def listar_imoveis(filtro, params, erro_vazio, tag=None):
+    """Busca uma página de imóveis (keyset em `id`) e monta a resposta com o cursor `next`.
+
+    Com `tag` (ex.: ("cidade", "São Paulo")) a página fica no cache até uma escrita invalidá-la.
+    Com `fields` o SELECT só traz as colunas pedidas (e o id); com `formato=colunas`
+    a página sai como `{"columns": [...], "rows": [[...], ...]}`.
+    """
+    try:
+        campos, colunas, sql_colunas = ler_projecao()
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+
+    formato = formato_stream()
+    if formato is not None and formato != FORMATO_COLUNAS:
+        if formato not in FORMATOS_STREAM:
+            return jsonify({"erro": f"formato deve ser um de: {', '.join([*FORMATOS_STREAM, FORMATO_COLUNAS])}"}), 400
+        return transmitir_imoveis(filtro, params, formato, campos, colunas, sql_colunas)
+
+    try:
+        limit, after = parametros_pagina()
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+
+    chave = (*tag, limit, after, campos, formato) if tag else None
+    if chave:
+        resposta = resposta_do_cache(chave)
+        if resposta is not None:
+            return resposta
+
+    if usar_replica():
+        # A réplica guarda a linha inteira, na ordem de COLUNAS
+        results, colunas = replica.pagina(tag, after, limit), COLUNAS
+    else:
+        conn = conectar_leitura()
+        if conn is None:
+            return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
+
+        # se chegou até, tenho uma conexão válida; o `with` devolve a conexão ao pool
+        with conn:
+            cursor = conn.cursor()
+            # Pede uma linha a mais só para saber se existe próxima página
+            where = f"WHERE {filtro} AND id > %s" if filtro else "WHERE id > %s"
+            sql = f"SELECT {sql_colunas} from imoveis {where} ORDER BY id LIMIT %s"
+            cursor.execute(sql, (*params, after, limit + 1))
+            results = cursor.fetchall()
+
+    if not results and not request.args.get("after"):
+        resposta, status = jsonify({"erro": erro_vazio}), 404
+    else:
+        with medir("montagem"):
+            dados = corpo_imoveis(results[:limit], campos, colunas, formato)
+        if len(results) > limit:
+            dados["next"] = results[limit - 1][0]
+        resposta, status = jsonify(dados), 200
+
+    if not chave:
+        return resposta, status
+    # Inclui a linha extra: ela decide se a página tem `next`
+    tags = {tag} | {("id", imovel[0]) for imovel in results}
+    return guardar_no_cache(chave, resposta, status, tags)
+
 
 @app.route('/')
 @app.route('/imoveis', methods=['GET'])
+@coalescer
 def get_imoveis():
-    # conectar colm a base
-    conn = connect_db()
+    return listar_imoveis(None, (), "Nenhum imovel encontrado")
+
+
+
+
+
+
+
+
+@app.route('/imoveis', methods=['POST'])
+def add_imoveis():
+    novo_imovel = request.json
+    conn = conectar_escrita()
     if conn is None:
         return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
+    
+    with conn:
+        cursor = conn.cursor()
+        sql = "INSERT INTO imoveis (logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao) VALUES ( %s, %s, %s, %s, %s, %s, %s, %s)"
+
+        cursor.execute(sql, (novo_imovel['logradouro'], novo_imovel['tipo_logradouro'], novo_imovel['bairro'], novo_imovel['cidade'], novo_imovel['cep'], novo_imovel['tipo'], novo_imovel['valor'], novo_imovel['data_aquisicao']))
+        id = cursor.lastrowid
+        versao_lida = ler_versao_da_escrita(cursor, 1)
+        conn.commit()
+        # Relê a linha em vez de converter o corpo: o banco aceita formatos (ex.: data com hora) que o corpo não diria como ficaram
+        recarregar_na_replica(conn, [id])
+
+    invalidar_escrita([id], [novo_imovel], versao_lida)
+    return jsonify({"imovel": novo_imovel}), 201
 
-    # se chegou até, tenho uma conexão válida
-    cursor = conn.cursor()
-    sql = "SELECT * from imoveis"
-    cursor.execute(sql)
 
-    results = cursor.fetchall()
-    if not results:
-        return jsonify({"erro": "Nenhum imovel encontrado"}), 404
-    
-    imoveis = []
-    for imovel in results:
+def gravados_em_lote(conn, ids, imoveis, versao_lida):
+    """Chamado a cada commit da inserção em lote."""
+    invalidar_escrita(ids, imoveis, versao_lida)
+    recarregar_na_replica(conn, ids)
 
-        imovel_dict = {
-            "id": imovel[0],
-            "logradouro": imovel[1],
-            "tipo_logradouro": imovel[2],
-            "bairro": imovel[3],
-            "cidade": imovel[4],
-            "cep": imovel[5],
-            "tipo": imovel[6],
-            "valor": imovel[7],
-            "data_aquisicao": imovel[8]
-        }
 
-        imoveis.append(imovel_dict)
-    return jsonify({"imoveis": imoveis}), 200
+@app.route('/imoveis/batch', methods=['POST'])
+def add_imoveis_batch():
+    """Insere vários imóveis de uma vez (array JSON ou NDJSON), em pedaços com executemany."""
+    modo = request.args.get("modo", "tudo_ou_nada")
+    if modo not in MODOS:
+        return jsonify({"erro": f"modo deve ser um de: {', '.join(MODOS)}"}), 400
 
+    ndjson = request.mimetype == "application/x-ndjson"
+    imoveis = ler_imoveis(request.stream, ndjson)
+    if not ndjson:
+        # Para um array JSON o corpo é lido inteiro antes de abrir a conexão
+        try:
+            imoveis = list(imoveis)
+        except ValueError as err:
+            return jsonify({"erro": str(err)}), 400
 
+    conn = conectar_escrita()
+    if conn is None:
+        return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
 
+    # A versão lida antes de cada commit vai para a invalidação feita depois dele
+    versoes_lidas = []
+    with conn:
+        try:
+            resultados = inserir_lote(conn, imoveis, lote_config['tamanho'], modo,
+                                      ao_gravar=lambda ids, gravados: gravados_em_lote(conn, ids, gravados, versoes_lidas.pop() if versoes_lidas else None),
+                                      antes_do_commit=lambda cursor, escritas: versoes_lidas.append(ler_versao_da_escrita(cursor, escritas)))
+        except ErroLote as err:
+            return jsonify({"erro": err.mensagem, "indice": err.indice}), 400
 
+    inseridos = sum(1 for resultado in resultados if "id" in resultado)
+    resposta = {
+        "inseridos": inseridos,
+        "falhas": len(resultados) - inseridos,
+        "resultados": resultados,
+    }
+    if not inseridos and resultados:
+        return jsonify(resposta), 400
+    return jsonify(resposta), 201
 
 
 
 
-@app.route('/imoveis', methods=['POST'])
-def add_imoveis():
-    novo_imovel = request.json
-    conn = connect_db()
+
+
+
+@app.route('/imoveis/batch', methods=['PUT'])
+def update_imoveis_batch():
+    """Atualiza de uma vez os imóveis de uma lista de ids ou de um filtro (cidade/tipo/bairro)."""
+    corpo = request.get_json(silent=True)
+    try:
+        ids, filtro = ler_alvo(corpo)
+        set_sql, set_params = ler_alteracoes(corpo)
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+
+    conn = conectar_escrita()
     if conn is None:
         return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
-    
-    cursor = conn.cursor()
-    sql = "INSERT INTO imoveis (logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao) VALUES ( %s, %s, %s, %s, %s, %s, %s, %s)"
 
-    cursor.execute(sql, (novo_imovel['logradouro'], novo_imovel['tipo_logradouro'], novo_imovel['bairro'], novo_imovel['cidade'], novo_imovel['cep'], novo_imovel['tipo'], novo_imovel['valor'], novo_imovel['data_aquisicao']))
-    conn.commit()
-    conn.close()
-    return jsonify({"imovel": novo_imovel}), 201
+    versoes_lidas = []
+    with conn:
+        afetados, tocados = atualizar_lote(conn, ids, filtro, set_sql, set_params, lote_config['tamanho'],
+                                           antes_do_commit=lambda cursor, escritas: versoes_lidas.append(ler_versao_da_escrita(cursor, escritas)))
+        recarregar_na_replica(conn, tocados)
+
+    # Uma escrita só para cache e versão, não uma por pedaço
+    invalidar_escrita(tocados, [corpo.get("valores") or {}], versoes_lidas[0])
+    return jsonify({"afetados": afetados}), 200
+
+
+@app.route('/imoveis/batch', methods=['DELETE'])
+def delete_imoveis_batch():
+    """Remove de uma vez os imóveis de uma lista de ids ou de um filtro (cidade/tipo/bairro)."""
+    try:
+        ids, filtro = ler_alvo(request.get_json(silent=True))
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+
+    conn = conectar_escrita()
+    if conn is None:
+        return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
+
+    versoes_lidas = []
+    with conn:
+        afetados, tocados = remover_lote(conn, ids, filtro, lote_config['tamanho'],
+                                         antes_do_commit=lambda cursor, escritas: versoes_lidas.append(ler_versao_da_escrita(cursor, escritas)))
+
+    invalidar_escrita(tocados, versao_lida=versoes_lidas[0])
+    atualizar_replica(removidos=tocados)
+    return jsonify({"afetados": afetados}), 200
 
 
 
@@ -72,24 +721,29 @@ def update_imoveis(id):
     # Pegando os dados do imóvel que foram enviados na requisição
     imovel = request.json 
 
-    conn = connect_db()
+    conn = conectar_escrita()
 
     if conn is None:
         return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
 
-    cursor = conn.cursor()
-    sql = "UPDATE imoveis SET logradouro = %s, tipo_logradouro = %s, bairro = %s, cidade = %s, cep = %s, tipo = %s, valor = %s, data_aquisicao = %s WHERE id = %s"
-    
-    valores = (
-            imovel["logradouro"], imovel["tipo_logradouro"], imovel["bairro"],
-            imovel["cidade"], imovel["cep"], imovel["tipo"],
-            imovel["valor"], imovel["data_aquisicao"], id
-        )
-    
-    cursor.execute(sql, valores)
-    results = cursor.fetchone()
-    conn.commit()
-    conn.close()
+    with conn:
+        cursor = conn.cursor()
+        sql = "UPDATE imoveis SET logradouro = %s, tipo_logradouro = %s, bairro = %s, cidade = %s, cep = %s, tipo = %s, valor = %s, data_aquisicao = %s WHERE id = %s"
+
+        valores = (
+                imovel["logradouro"], imovel["tipo_logradouro"], imovel["bairro"],
+                imovel["cidade"], imovel["cep"], imovel["tipo"],
+                imovel["valor"], imovel["data_aquisicao"], id
+            )
+
+        cursor.execute(sql, valores)
+        results = cursor.fetchone()
+        versao_lida = ler_versao_da_escrita(cursor, cursor.rowcount)
+        conn.commit()
+        # Relê a linha em vez de confiar no corpo: o id pode nem existir
+        recarregar_na_replica(conn, [id])
+
+    invalidar_escrita([id], [imovel], versao_lida)
 
     if not results:
         return jsonify({"erro": f"Erro ao atualizar imóvel de id:{id}"}), 404
@@ -99,102 +753,190 @@ def update_imoveis(id):
 
 @app.route('/imoveis/<int:id>', methods=["DELETE"])
 def delete_imoveis(id):
-    conn = connect_db()
+    conn = conectar_escrita()
 
     if conn is None:
         return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
     
-    cursor = conn.cursor()
-    sql = "DELETE FROM imoveis WHERE id = %s"
-    cursor.execute(sql, (id,))
-    imovel_deletado = cursor.rowcount
-
+    with conn:
+        cursor = conn.cursor()
+        sql = "DELETE FROM imoveis WHERE id = %s"
+        cursor.execute(sql, (id,))
+        imovel_deletado = cursor.rowcount
 
-    if not imovel_deletado:
-        conn.close()
-        return jsonify({"erro": "Imóvel não encontrado"}), 404
+        if not imovel_deletado:
+            return jsonify({"erro": "Imóvel não encontrado"}), 404
 
-    conn.commit()
-    conn.close()
+        versao_lida = ler_versao_da_escrita(cursor, imovel_deletado)
+        conn.commit()
 
+    invalidar_escrita([id], versao_lida=versao_lida)
+    atualizar_replica(removidos=[id])
     return  jsonify({"mensagem": "Imóvel deletado com sucesso"}), 200
 
 
 
 @app.route('/imoveis/<int:id>', methods=['GET'])
+@coalescer
 def get_imoveis_por_id(id):
-    # conectar colm a base
-    conn = connect_db()
+    try:
+        campos, colunas, sql_colunas = ler_projecao()
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+
+    tag = ("id", id)
+    chave = (*tag, campos)
+    resposta = resposta_do_cache(chave)
+    if resposta is not None:
+        return resposta
+
+    if usar_replica():
+        imovel, colunas = replica.por_id(id), COLUNAS
+    else:
+        # conectar colm a base
+        conn = conectar_leitura()
+
+        if conn is None:
+            return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
+
+        # se chegou até, tenho uma conexão válida
+        with conn:
+            cursor = conn.cursor()
+            sql = f"SELECT {sql_colunas} from imoveis WHERE id = %s"
+            cursor.execute(sql, (id,))
+            imovel = cursor.fetchone()
+
+    if not imovel:
+        return guardar_no_cache(chave, jsonify({"erro": "Nenhum imovel com esse id encontrado"}), 404, [tag])
+
+    return guardar_no_cache(chave, jsonify({"imoveis": conversor(campos, colunas)(imovel)}), 200, [tag])
+
+
+
+
+
+
+
+@app.route('/imoveis/tipo/<string:tipo>', methods=['GET'])
+@coalescer
+def get_imoveis_por_tipo(tipo):
+    return listar_imoveis("tipo = %s", (tipo,), "Nenhum imovel com esse tipo encontrado", tag=("tipo", tipo))
+
+
+
+
+
+
+
+@app.route('/imoveis/cidade/<string:cidade>', methods=['GET'])
+@coalescer
+def get_imoveis_por_cidade(cidade):
+    return listar_imoveis("cidade = %s", (cidade,), "Nenhum imovel com essa cidade encontrado", tag=("cidade", cidade))
+
+
+
+
+
+
+
+@app.route('/imoveis/search', methods=['GET'])
+@coalescer
+def buscar_imoveis():
+    """Busca com filtros combinados (tipo, cidade, bairro, cep, valor, data), ordenação e keyset."""
+    try:
+        limit = ler_limit()
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+    return responder_busca(request.args, limit)
+
 
+@app.route('/imoveis/faixa/<string:coluna>', methods=['GET'])
+@coalescer
+def get_faixa(coluna):
+    """Imóveis com valor ou data_aquisicao entre `de` e `ate`, em ordem da coluna, com keyset."""
+    try:
+        limit = ler_limit()
+        args = args_da_faixa(coluna, request.args)
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+    return responder_busca(args, limit)
+
+
+@app.route('/imoveis/top/<string:coluna>', methods=['GET'])
+@coalescer
+def get_top(coluna):
+    """Os `n` imóveis de maior valor ou data_aquisicao (os menores com ordem=asc), por cidade/tipo se pedido."""
+    try:
+        n = ler_limit("n", padrao=100)
+        args = args_da_faixa(coluna, request.args, ordem_padrao="desc")
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+    return responder_busca(args, n)
+
+
+def responder_busca(args, limit):
+    """Roda montar_busca com `args` (filtros, sort e after) e monta a página com o cursor `next`."""
+    try:
+        # A coluna de ordenação entra no SELECT mesmo fora de `fields`: o cursor `next` precisa dela
+        campos, colunas, sql_colunas = ler_projecao(ler_ordenacao(args.get("sort", "id"))[0])
+        sql, params, coluna = montar_busca(args, limit, sql_colunas)
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+
+    formato = request.args.get("formato")
+    if formato not in (None, FORMATO_COLUNAS):
+        return jsonify({"erro": f"formato deve ser {FORMATO_COLUNAS}"}), 400
+
+    conn = conectar_leitura()
     if conn is None:
         return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
 
-    # se chegou até, tenho uma conexão válida
-    cursor = conn.cursor()
-    sql = "SELECT * from imoveis WHERE id = %s"
-    cursor.execute(sql, (id,))
-    imovel = cursor.fetchone()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        results = cursor.fetchall()
 
-    if not imovel:
-        return jsonify({"erro": "Nenhum imovel com esse id encontrado"}), 404
-   
-    imovel_dict = {
-            "id": imovel[0],
-            "logradouro": imovel[1],
-            "tipo_logradouro": imovel[2],
-            "bairro": imovel[3],
-            "cidade": imovel[4],
-            "cep": imovel[5],
-            "tipo": imovel[6],
-            "valor": imovel[7],
-            "data_aquisicao": imovel[8]
-        }
+    with medir("montagem"):
+        resposta = corpo_imoveis(results[:limit], campos, colunas, formato)
+    if len(results) > limit:
+        resposta["next"] = cursor_da_linha(results[limit - 1], coluna, colunas)
+    return jsonify(resposta), 200
 
-    return jsonify({"imoveis": imovel_dict}), 200
 
 
 
 
 
 
+@app.route('/imoveis/busca', methods=['GET'])
+@coalescer
+def buscar_texto():
+    """Busca por palavras (ou começos de palavra) do logradouro e do bairro, das mais relevantes para as menos."""
+    try:
+        limit = ler_limit()
+        campos, colunas, sql_colunas = ler_projecao()
+        sql, params = montar_busca_texto(request.args.get("q"), limit, request.args.get("after"), sql_colunas)
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
 
-@app.route('/imoveis/tipo/<string:tipo>', methods=['GET'])
-def get_imoveis_por_tipo(tipo):
-    # conectar colm a base
-    conn = connect_db()
+    formato = request.args.get("formato")
+    if formato not in (None, FORMATO_COLUNAS):
+        return jsonify({"erro": f"formato deve ser {FORMATO_COLUNAS}"}), 400
 
+    conn = conectar_leitura()
     if conn is None:
         return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
 
-    # se chegou até, tenho uma conexão válida
-    cursor = conn.cursor()
-    sql = "SELECT * from imoveis WHERE tipo =%s"
-    cursor.execute(sql, (tipo,))
-    results = cursor.fetchall()
-    conn.commit()
-    conn.close()    
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        results = cursor.fetchall()
 
-    if not results:
-        return jsonify({"erro": "Nenhum imovel com esse tipo encontrado"}), 404
-    
-    imoveis = []
-    for imovel in results:
-
-        imovel_dict = {
-            "id": imovel[0],
-            "logradouro": imovel[1],
-            "tipo_logradouro": imovel[2],
-            "bairro": imovel[3],
-            "cidade": imovel[4],
-            "cep": imovel[5],
-            "tipo": imovel[6],
-            "valor": imovel[7],
-            "data_aquisicao": imovel[8]
-        }
-
-        imoveis.append(imovel_dict)
-    return jsonify({"imoveis": imoveis}), 200
-    
+    with medir("montagem"):
+        resposta = corpo_imoveis(results[:limit], campos, colunas, formato)
+    if len(results) > limit:
+        resposta["next"] = cursor_da_relevancia(results[limit - 1])
+    return jsonify(resposta), 200
 
 
 
@@ -202,44 +944,187 @@ def get_imoveis_por_tipo(tipo):
 
 
 
-@app.route('/imoveis/cidade/<string:cidade>', methods=['GET'])
-def get_imoveis_por_cidade(cidade):
-    # conectar colm a base
-    conn = connect_db()
+@app.route('/imoveis/cep', methods=['GET'])
+@coalescer
+def get_imoveis_por_cep():
+    """Imóveis de um prefixo (`prefixo=0455`) ou faixa de CEP (`de=01000&ate=05999`), em ordem de CEP."""
+    try:
+        limit = ler_limit()
+        # O cep entra no SELECT mesmo fora de `fields`: o cursor `next` precisa dele
+        campos, colunas, sql_colunas = ler_projecao("cep")
+        sql, params = montar_busca_cep(request.args, limit, sql_colunas)
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
 
+    formato = request.args.get("formato")
+    if formato not in (None, FORMATO_COLUNAS):
+        return jsonify({"erro": f"formato deve ser {FORMATO_COLUNAS}"}), 400
+
+    conn = conectar_leitura()
     if conn is None:
         return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
 
-    # se chegou até, tenho uma conexão válida
-    cursor = conn.cursor()
-    sql = "SELECT * from imoveis WHERE cidade = %s"
-    cursor.execute(sql, (cidade,))
-    results = cursor.fetchall()
-    conn.commit()
-    conn.close()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        results = cursor.fetchall()
+
+    with medir("montagem"):
+        resposta = corpo_imoveis(results[:limit], campos, colunas, formato)
+    if len(results) > limit:
+        resposta["next"] = cursor_da_linha(results[limit - 1], "cep", colunas)
+    return jsonify(resposta), 200
+
+
+@app.route('/imoveis/cep/contagem', methods=['GET'])
+@coalescer
+def get_contagem_cep():
+    """Quantidade de imóveis por prefixo de CEP de `nivel` dígitos (1 a 5), para mapas por região."""
+    try:
+        sql, params, nivel = montar_contagem_cep(request.args)
+    except ValueError as err:
+        return jsonify({"erro": str(err)}), 400
+
+    chave = ("contagem_cep", *sorted(request.args.items()))
+    resposta = resposta_do_cache(chave)
+    if resposta is not None:
+        return resposta
+
+    conn = conectar_leitura()
+    if conn is None:
+        return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
+
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        # SUM de uma coluna INT volta como DECIMAL no MySQL
+        grupos = [{"prefixo": prefixo, "quantidade": int(quantidade)} for prefixo, quantidade in cursor.fetchall()]
+
+    dados = {"nivel": nivel, "divisao": NIVEIS_CEP[nivel], "grupos": grupos}
+    return guardar_no_cache(chave, jsonify(dados), 200, [TAG_CONTAGEM_CEP])
+
+
+
+
+
+
+
+@app.route('/imoveis/stats/<string:dimensao>', methods=['GET'])
+@coalescer
+def get_estatisticas(dimensao):
+    """Quantidade, soma, média, mínimo e máximo de valor por cidade, tipo ou bairro."""
+    conn = conectar_leitura()
+    if conn is None:
+        return jsonify({"error": "Erro ao conectar ao banco de dados"}), 500
+
+    with conn:
+        try:
+            grupos = ler_resumo(conn, dimensao, request.args.get("cidade"))
+        except ValueError as err:
+            return jsonify({"erro": str(err)}), 400
+
+    return jsonify({"dimensao": dimensao, "grupos": grupos}), 200
+
+
+
+
+
+
+
+@app.route('/saude/vivo', methods=['GET'])
+def get_vivo():
+    """Liveness: o processo está de pé e atendendo (não consulta o banco)."""
+    return jsonify({"status": "vivo", "pid": os.getpid()}), 200
+
+
+@app.route('/saude/pronto', methods=['GET'])
+def get_pronto():
+    """Readiness: o banco responde e o worker não está encerrando.
+
+    A réplica em memória não entra: enquanto ela carrega, as leituras vão ao banco.
+    """
+    if encerrando:
+        return jsonify({"status": "encerrando", "pid": os.getpid()}), 503
+
+    conn = connect_db()
+    if conn is None:
+        return jsonify({"status": "sem banco", "pid": os.getpid()}), 503
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+    return jsonify({"status": "pronto", "pid": os.getpid(), "aquecimento": aquecimento, "replica_em_memoria": usar_replica()}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metricas():
+    """Métricas no formato de texto do Prometheus."""
+    pool = pool_stats()
+    cache_stats = cache.stats()
+    coalescencia_stats = coalescencia.stats()
+    extras = [
+        ("imoveis_api_pool_em_uso", "gauge", "Conexões do pool emprestadas", pool["em_uso"]),
+        ("imoveis_api_pool_aguardando", "gauge", "Requisições esperando uma conexão do pool", pool["aguardando"]),
+        ("imoveis_api_pool_timeouts_total", "counter", "Pedidos de conexão que estouraram o timeout", pool["timeouts"]),
+        ("imoveis_api_cache_hits_total", "counter", "Acertos do cache de leitura", cache_stats["hits"]),
+        ("imoveis_api_cache_misses_total", "counter", "Faltas do cache de leitura", cache_stats["misses"]),
+        ("imoveis_api_cache_bytes", "gauge", "Bytes guardados no cache de leitura", cache_stats["bytes"]),
+        ("imoveis_api_coalescencia_economizadas_total", "counter", "Requisições atendidas com a consulta de outra em andamento", coalescencia_stats["economizadas"]),
+        ("imoveis_api_coalescencia_timeouts_total", "counter", "Requisições que cansaram de esperar e consultaram sozinhas", coalescencia_stats["timeouts"]),
+    ]
+    if limitador is not None:
+        extras.append(("imoveis_api_admissao_limitadas_total", "counter", "Requisições recusadas com 429 pelo limite por cliente", limitador.stats()["recusados"]))
+    if fila_banco is not None:
+        fila_stats = fila_banco.stats()
+        extras += [
+            ("imoveis_api_fila_banco_ocupadas", "gauge", "Requisições trabalhando no banco", fila_stats["ocupadas"]),
+            ("imoveis_api_fila_banco_aguardando", "gauge", "Requisições esperando vaga na fila do banco", fila_stats["aguardando"]),
+            ("imoveis_api_fila_banco_recusadas_total", "counter", "Requisições recusadas com 503 pela fila do banco (cheia ou prazo)",
+             fila_stats["recusadas_fila_cheia"] + fila_stats["recusadas_prazo"]),
+        ]
+    return Response(metricas.exportar(extras), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/interno/consultas', methods=['GET'])
+def get_consultas():
+    """Consultas que mais somaram tempo (top-N), com o EXPLAIN das que já passaram do limiar."""
+    return jsonify(consultas_lentas.ranking()), 200
+
+
+@app.route('/interno/pool', methods=['GET'])
+def get_pool_stats():
+    """Estatísticas do pool de conexões do processo."""
+    return jsonify(pool_stats()), 200
+
+
+@app.route('/interno/replica', methods=['GET'])
+def get_replica_stats():
+    """Linhas, memória estimada e sincronização da réplica em memória."""
+    if replica is None:
+        return jsonify({"ativa": False}), 200
+    return jsonify({"ativa": True, **replica.stats()}), 200
+
+
+@app.route('/interno/cache', methods=['GET'])
+def get_cache_stats():
+    """Acertos, faltas e remoções do cache de leitura."""
+    return jsonify(cache.stats()), 200
+
+
+@app.route('/interno/coalescencia', methods=['GET'])
+def get_coalescencia_stats():
+    """Consultas em andamento e quantas requisições foram atendidas por uma consulta de outra."""
+    return jsonify({"ativa": coalescencia_config['ativa'], **coalescencia.stats()}), 200
 
-    if not results:
-        return jsonify({"erro": "Nenhum imovel com essa cidade encontrado"}), 404
-
-
-    imoveis = []
-    for imovel in results:
-
-        imovel_dict = {
-            "id": imovel[0],
-            "logradouro": imovel[1],
-            "tipo_logradouro": imovel[2],
-            "bairro": imovel[3],
-            "cidade": imovel[4],
-            "cep": imovel[5],
-            "tipo": imovel[6],
-            "valor": imovel[7],
-            "data_aquisicao": imovel[8]
-        }
-    
-        imoveis.append(imovel_dict)
 
-    return jsonify({"imoveis": imoveis}), 200
+@app.route('/interno/admissao', methods=['GET'])
+def get_admissao_stats():
+    """Limite por cliente e fila do banco: vagas ocupadas, espera e recusas (429/503)."""
+    return jsonify({
+        "limite_por_cliente": {"ativo": False} if limitador is None else {"ativo": True, **limitador.stats()},
+        "fila_banco": {"ativa": False} if fila_banco is None else {"ativa": True, **fila_banco.stats()},
+    }), 200
 
 
 
@@ -248,5 +1133,11 @@ def get_imoveis_por_cidade(cidade):
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Servidor de desenvolvimento do Flask (um processo, em localhost); em produção use servir.py.
+    # O debugger (que executa código vindo do navegador) só liga com FLASK_DEBUG=1
+    from migrar import checar_inicializacao
+    checar_inicializacao()
+    iniciar_replica()
+    iniciar_observacao_versao()
+    app.run(debug=os.getenv("FLASK_DEBUG") == "1")
 
@@ -0,0 +1,239 @@
+"""Servidor de produção: um processo mestre e workers pré-criados (pre-fork).
+
+O mestre abre o socket, cria os workers com fork, recria os que morrem e, ao
+receber SIGTERM ou SIGINT, repassa SIGTERM a eles e espera o fim das
+requisições em andamento (até --graca segundos). Ele não importa o Flask nem
+o driver do MySQL: cada worker, depois do fork, importa o servidor, abre as
+suas próprias conexões (criar_app) e atende no socket compartilhado, com o
+kernel distribuindo as conexões entre os workers. Com --threads cada worker
+atende várias conexões ao mesmo tempo (uma thread por conexão); sem, uma por
+vez, e uma requisição lenta só prende o seu worker.
+
+Uso:
+    python servir.py [--host 0.0.0.0] [--porta 8000] [--processos 4] [--threads]
+                     [--aquecer 5] [--graca 30] [--drenar 0] [--sqlite arquivo.db] [--log-acesso]
+
+Com um servidor WSGI pre-fork externo, use a fábrica: gunicorn -w 4 'servir:criar_app()'.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from config import pool_config, servir_config
+
+
+def _avisar(texto):
+    # Uma escrita só por linha: as linhas do mestre e dos workers não se misturam no mesmo pipe
+    sys.stdout.write(texto + "\n")
+    sys.stdout.flush()
+
+
+def _pool_sqlite(caminho):
+    """Pool de conexões SQLite (banco_local) e um connect_db equivalente ao do utils."""
+    import banco_local
+    from pool import ConnectionPool, PoolEsgotado
+
+    pool = ConnectionPool(lambda: banco_local.conectar(caminho), **pool_config)
+
+    def connect_db(leitura=False):
+        try:
+            return pool.adquirir()
+        except PoolEsgotado as err:
+            _avisar(f"Erro: {err}")
+            return None
+
+    return pool, connect_db
+
+
+def criar_app(aquecer=None, sqlite=None, checar=False):
+    """Fábrica da aplicação de um worker: importa o servidor, abre as conexões e confere se está pronto.
+
+    `aquecer` é quantas conexões abrir antes do primeiro pedido (padrão:
+    SERVIDOR_AQUECER). Com `sqlite` as rotas usam um SQLite do banco_local em
+    vez do MySQL (desenvolvimento e benchmark). Com `checar`, avisa de
+    migrações pendentes ou consultas sem índice.
+    """
+    inicio = time.perf_counter()
+    # Importados só aqui, depois do fork: cada worker carrega os seus módulos e abre as suas conexões
+    import servidor
+    from metricas import medir_conexoes
+
+    aquecer = servir_config['aquecer'] if aquecer is None else aquecer
+    if sqlite is not None:
+        pool, connect_db = _pool_sqlite(sqlite)
+        servidor.connect_db, servidor.pool_stats = medir_conexoes(connect_db), pool.stats
+        conexoes = pool.aquecer(aquecer)
+    else:
+        from utils import aquecer_pools
+        try:
+            conexoes = aquecer_pools(aquecer)
+        except Exception as err:
+            # Sobe assim mesmo: /saude/pronto responde 503 até o banco voltar
+            _avisar(f"Erro ao aquecer o pool de conexões: {err}")
+            conexoes = 0
+        if checar:
+            from migrar import checar_inicializacao
+            checar_inicializacao()
+    servidor.iniciar_replica()
+    # Cada worker tem o seu cache e as suas ETags: as escritas dos outros chegam pela versão no banco
+    servidor.iniciar_observacao_versao()
+
+    # Uma passagem pelo /saude/pronto monta o mapa de rotas e confere o banco antes do primeiro cliente
+    resposta = servidor.app.test_client().get("/saude/pronto")
+    if resposta.status_code != 200:
+        _avisar(f"Aviso: worker {os.getpid()} subiu sem estar pronto ({resposta.get_json()['status']})")
+    servidor.aquecimento = {"conexoes": conexoes, "ms": round((time.perf_counter() - inicio) * 1000, 1)}
+    return servidor.app
+
+
+# Workers
+
+def _servidor_wsgi(app, sock, threads):
+    from werkzeug.serving import BaseWSGIServer, ThreadedWSGIServer
+
+    class ServidorComThreads(ThreadedWSGIServer):
+        # Threads não daemon: ao encerrar, server_close espera as requisições em andamento
+        daemon_threads = False
+
+    classe = ServidorComThreads if threads else BaseWSGIServer
+    host, porta = sock.getsockname()[:2]
+    return classe(host, porta, app, fd=sock.fileno())
+
+
+def rodar_worker(sock, args, indice=0):
+    """Corpo de um worker: cria a aplicação, atende até receber SIGTERM e fecha as conexões."""
+    inicio = time.perf_counter()
+    if not args.log_acesso:
+        import logging
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    app = criar_app(args.aquecer, args.sqlite, checar=indice == 0)
+    wsgi = _servidor_wsgi(app, sock, args.threads)
+
+    def encerrar(sinal, quadro):
+        import servidor
+        servidor.encerrando = True
+
+        def parar():
+            time.sleep(args.drenar)
+            # shutdown() espera o laço do serve_forever terminar: não pode rodar na thread dele
+            wsgi.shutdown()
+
+        threading.Thread(target=parar, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    _avisar(f"Worker {os.getpid()} pronto em {(time.perf_counter() - inicio) * 1000:.0f}ms")
+    wsgi.serve_forever()
+
+    if args.sqlite is None:
+        from utils import get_pool
+        get_pool().fechar_todas()
+
+
+class Mestre:
+    """Cria e vigia os workers; não atende requisições."""
+
+    def __init__(self, sock, args):
+        self.sock = sock
+        self.args = args
+        self.workers = {}  # pid -> (índice, instante em que foi criado)
+        self.parando = False
+
+    def criar_worker(self, indice):
+        pid = os.fork()
+        if pid == 0:
+            # Os tratadores do mestre não valem no worker. Ctrl+C chega ao grupo todo:
+            # quem decide o encerramento é o mestre, repassando SIGTERM
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGALRM, signal.SIG_DFL)
+            codigo = 0
+            try:
+                rodar_worker(self.sock, self.args, indice)
+            except BaseException:
+                traceback.print_exc()
+                codigo = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(codigo)
+        self.workers[pid] = (indice, time.monotonic())
+
+    def parar(self, sinal=None, quadro=None):
+        if not self.parando:
+            self.parando = True
+            _avisar(f"Encerrando {len(self.workers)} workers (até {self.args.graca:g}s)")
+            self._sinalizar(signal.SIGTERM)
+            signal.alarm(max(int(self.args.graca), 1))
+
+    def _matar(self, sinal=None, quadro=None):
+        _avisar("Tempo de graça esgotado: matando os workers restantes")
+        self._sinalizar(signal.SIGKILL)
+
+    def _sinalizar(self, sinal):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, sinal)
+            except ProcessLookupError:
+                pass
+
+    def rodar(self):
+        signal.signal(signal.SIGTERM, self.parar)
+        signal.signal(signal.SIGINT, self.parar)
+        signal.signal(signal.SIGALRM, self._matar)
+        for indice in range(self.args.processos):
+            self.criar_worker(indice)
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            indice, criado_em = self.workers.pop(pid, (None, None))
+            if indice is None or self.parando:
+                continue
+            _avisar(f"Worker {pid} terminou (status {os.waitstatus_to_exitcode(status)}); criando outro")
+            if time.monotonic() - criado_em < 1:
+                # Um worker que morre ao subir (ex.: erro de importação) não vira um laço de fork
+                time.sleep(1)
+            self.criar_worker(indice)
+        return 0
+
+
+# Linha de comando
+
+def _argumentos(argv):
+    parser = argparse.ArgumentParser(prog="servir.py", description="Servidor de produção da API de imóveis (pre-fork)")
+    parser.add_argument("--host", default=servir_config['host'])
+    parser.add_argument("--porta", type=int, default=servir_config['porta'], help="0 escolhe uma porta livre")
+    parser.add_argument("--processos", type=int, default=servir_config['processos'], help="workers (padrão: um por núcleo)")
+    parser.add_argument("--threads", action="store_true", default=servir_config['threads'], help="uma thread por conexão em cada worker")
+    parser.add_argument("--aquecer", type=int, default=servir_config['aquecer'], help="conexões abertas por worker antes de atender")
+    parser.add_argument("--graca", type=float, default=servir_config['graca'], help="segundos para terminar as requisições ao encerrar")
+    parser.add_argument("--drenar", type=float, default=servir_config['drenar'], help="segundos com /saude/pronto em 503 antes de parar de aceitar")
+    parser.add_argument("--sqlite", help="atende a partir de um SQLite do banco_local em vez do MySQL (ex.: bench_dados/imoveis_10000.db)")
+    parser.add_argument("--log-acesso", action="store_true", help="uma linha de log por requisição")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = _argumentos(argv[1:])
+    sock = socket.create_server((args.host, args.porta), backlog=2048)
+    host, porta = sock.getsockname()[:2]
+    modelo = "com threads" if args.threads else "uma conexão por vez"
+    _avisar(f"Ouvindo em http://{host}:{porta} com {args.processos} workers ({modelo})")
+
+    if not hasattr(os, "fork"):
+        # Windows: sem fork, um worker só no próprio processo
+        rodar_worker(sock, args)
+        return 0
+    return Mestre(sock, args).rodar()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
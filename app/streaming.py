@@ -0,0 +1,40 @@
+FORMATOS_STREAM = {
+    "ndjson": "application/x-ndjson",
+    "stream": "application/json",
+}
+
+
+def ler_em_lotes(conn, sql, params, lote):
+    """Executa `sql` num cursor sem buffer e produz as linhas em lotes de `fetchmany`.
+
+    A conexão é devolvida ao pool quando o gerador termina (ou é fechado
+    porque o cliente desconectou), então só existe um lote em memória por vez.
+    Um gerador que nunca é iterado não entra no `with`: quem monta a resposta
+    também precisa fechar a conexão ao fechá-la (Response.call_on_close).
+    """
+    with conn:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(sql, params)
+        while True:
+            linhas = cursor.fetchmany(lote)
+            if not linhas:
+                break
+            yield linhas
+
+
+def gerar_ndjson(lotes, para_dict, dumps):
+    """Um objeto JSON por linha; cada lote vira um único pedaço da resposta."""
+    for linhas in lotes:
+        yield "".join(dumps(para_dict(linha)) + "\n" for linha in linhas)
+
+
+def gerar_array_json(lotes, para_dict, dumps, chave="imoveis"):
+    """Documento `{"<chave>": [...]}` emitido aos pedaços (chunked)."""
+    yield '{"%s": [' % chave
+    primeiro = True
+    for linhas in lotes:
+        # Um dumps por lote (sem os colchetes) em vez de um por linha
+        pedaco = dumps([para_dict(linha) for linha in linhas])[1:-1]
+        yield pedaco if primeiro else "," + pedaco
+        primeiro = False
+    yield "]}"
@@ -0,0 +1,96 @@
+import threading
+import time
+import sys
+import os
+import pytest
+from unittest.mock import patch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from admissao import PRIORIDADE_ALTA, PRIORIDADE_BAIXA, FilaBanco, LimitadorPorCliente, Sobrecarga
+
+
+def test_limitador_rajada_e_reposicao():
+    """Depois da rajada o cliente recebe 429 até as fichas voltarem; outros clientes não são afetados."""
+    agora = [100.0]
+    with patch("admissao.time.monotonic", lambda: agora[0]):
+        limitador = LimitadorPorCliente(taxa=2, rajada=3)
+        for _ in range(3):
+            limitador.consumir("a")
+        with pytest.raises(Sobrecarga) as err:
+            limitador.consumir("a")
+        assert err.value.status == 429 and err.value.retry_after == 1
+        limitador.consumir("b")
+
+        agora[0] += 0.5
+        limitador.consumir("a")
+        with pytest.raises(Sobrecarga):
+            limitador.consumir("a")
+
+    assert limitador.stats()["recusados"] == 2
+
+
+def test_limitador_esquece_clientes_antigos():
+    limitador = LimitadorPorCliente(taxa=1, rajada=1, max_clientes=2)
+    for cliente in ("a", "b", "c"):
+        limitador.consumir(cliente)
+    assert limitador.stats()["clientes"] == 2
+    # "a" foi esquecido e volta com o balde cheio
+    limitador.consumir("a")
+
+
+def test_fila_cheia_e_prazo():
+    """Sem vaga, quem não cabe na fila recebe 503 na hora; quem cabe desiste depois do prazo."""
+    fila = FilaBanco(vagas=1, fila_maxima=1, prazo=0.05)
+    fila.entrar()
+    ocupante = threading.Thread(target=lambda: pytest.raises(Sobrecarga, fila.entrar))
+    ocupante.start()
+    while not fila.stats()["aguardando"]:
+        pass
+    with pytest.raises(Sobrecarga) as err:
+        fila.entrar()
+    assert err.value.status == 503 and err.value.retry_after == 1
+    ocupante.join(5)
+
+    stats = fila.stats()
+    assert stats["recusadas_fila_cheia"] == 1 and stats["recusadas_prazo"] == 1 and stats["aguardando"] == 0
+    fila.sair()
+    fila.entrar()
+    assert fila.stats()["admitidas"] == 2
+
+
+def test_fila_prioriza_leitura_por_id():
+    """Quando a vaga abre, a leitura por id passa na frente da varredura que chegou antes."""
+    fila = FilaBanco(vagas=1, fila_maxima=10, prazo=5)
+    fila.entrar()
+    ordem = []
+
+    def esperar(nome, prioridade):
+        fila.entrar(prioridade)
+        ordem.append(nome)
+        fila.sair()
+
+    varredura = threading.Thread(target=esperar, args=("varredura", PRIORIDADE_BAIXA))
+    varredura.start()
+    while fila.stats()["aguardando"] < 1:
+        pass
+    por_id = threading.Thread(target=esperar, args=("por_id", PRIORIDADE_ALTA))
+    por_id.start()
+    while fila.stats()["aguardando"] < 2:
+        pass
+    fila.sair()
+    varredura.join(5)
+    por_id.join(5)
+
+    assert ordem == ["por_id", "varredura"]
+
+
+def test_varreduras_so_ocupam_metade_da_fila():
+    fila = FilaBanco(vagas=0, fila_maxima=2, prazo=0.5)
+    esperando = threading.Thread(target=lambda: pytest.raises(Sobrecarga, fila.entrar, PRIORIDADE_BAIXA))
+    esperando.start()
+    while not fila.stats()["aguardando"]:
+        pass
+    inicio = time.monotonic()
+    with pytest.raises(Sobrecarga):
+        fila.entrar(PRIORIDADE_BAIXA)
+    assert time.monotonic() - inicio < 0.25
+    esperando.join(5)
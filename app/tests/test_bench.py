@@ -0,0 +1,107 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import banco_local
+import bench
+import servidor
+
+
+def test_todas_as_rotas_tem_cenario():
+    """Uma rota nova em servidor.py precisa de um cenário no benchmark."""
+    cobertas = {(cenario.metodo, cenario.regra) for cenario in bench.CENARIOS}
+    for regra in servidor.app.url_map.iter_rules():
+        if regra.endpoint == "static":
+            continue
+        for metodo in regra.methods - {"HEAD", "OPTIONS"}:
+            assert (metodo, regra.rule) in cobertas, f"sem cenário para {metodo} {regra.rule}"
+
+
+def test_traduzir_para_sqlite():
+    assert banco_local.traduzir("SELECT id from imoveis WHERE id > %s ORDER BY id LIMIT %s FOR UPDATE") == \
+        "SELECT id from imoveis WHERE id > ? ORDER BY id LIMIT ?"
+    assert banco_local.traduzir("LOCK TABLES imoveis READ") is None
+
+
+def test_versao_compartilhada_no_sqlite(tmp_path):
+    """Os triggers da versão (migração 0008) também existem no SQLite do benchmark."""
+    from versao import ler_versao_compartilhada
+
+    conn = banco_local.conectar(bench.preparar_sqlite(20, str(tmp_path), saida=lambda *_: None))
+    antes = sum(ler_versao_compartilhada(conn).values())
+    cursor = conn.cursor()
+    cursor.execute("UPDATE imoveis SET valor = valor + 1 WHERE id <= %s", (3,))
+    cursor.execute("DELETE FROM imoveis WHERE id = %s", (4,))
+    conn.commit()
+    assert sum(ler_versao_compartilhada(conn).values()) == antes + 4
+    conn.close()
+
+
+def test_contagem_cep_no_sqlite(tmp_path):
+    """imoveis_cep (migração 0011) acompanha as escritas e bate com a contagem feita na tabela."""
+    conn = banco_local.conectar(bench.preparar_sqlite(200, str(tmp_path), saida=lambda *_: None))
+    cursor = conn.cursor()
+
+    def contagens():
+        cursor.execute("SELECT prefixo, quantidade FROM imoveis_cep ORDER BY prefixo")
+        mantida = cursor.fetchall()
+        cursor.execute("SELECT substr(cep, 1, 5) AS p, COUNT(*) FROM imoveis GROUP BY p ORDER BY p")
+        return mantida, cursor.fetchall()
+
+    mantida, contada = contagens()
+    assert mantida == contada and sum(quantidade for _, quantidade in mantida) == 200
+    cursor.execute("UPDATE imoveis SET cep = %s WHERE id <= %s", ("99999000", 5))
+    cursor.execute("DELETE FROM imoveis WHERE id BETWEEN %s AND %s", (6, 20))
+    cursor.execute("INSERT INTO imoveis (logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao)"
+                   " SELECT logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao FROM imoveis WHERE id <= %s", (40,))
+    conn.commit()
+    mantida, contada = contagens()
+    assert mantida == contada
+    conn.close()
+
+
+def test_rodar_todas_as_rotas_no_sqlite(tmp_path):
+    """Roda todos os cenários num SQLite pequeno: nenhuma rota pode dar erro 5xx e as escritas são desfeitas."""
+    caminho = bench.preparar_sqlite(300, str(tmp_path), saida=lambda *_: None)
+    conectar = lambda: banco_local.conectar(caminho)
+    connect_db = servidor.connect_db
+
+    resultados = bench.rodar(servidor, conectar, 300, bench.CENARIOS, [2], requisicoes=10, aquecimento=2, saida=lambda *_: None)
+
+    assert len(resultados) == len(bench.CENARIOS)
+    for resultado in resultados:
+        assert resultado["erros"] == 0, resultado
+        assert resultado["requisicoes"] == 10
+        assert resultado["latencia_ms"]["p50"] <= resultado["latencia_ms"]["p99"]
+    assert servidor.connect_db is connect_db
+
+    conn = conectar()
+    assert tuple(bench.contar(conn)) == (300, 300)
+    conn.close()
+
+
+def test_comparar_aponta_regressao():
+    base = {"resultados": [{"cenario": "por_id", "linhas": 100, "concorrencia": 1, "vazao_rps": 1000.0, "latencia_ms": {"p95": 2.0, "p99": 3.0}}]}
+    novo = {"resultados": [{"cenario": "por_id", "linhas": 100, "concorrencia": 1, "vazao_rps": 980.0, "latencia_ms": {"p95": 3.0, "p99": 3.1}}]}
+
+    linhas = {metrica: regrediu for _, metrica, _, _, _, regrediu in bench.comparar(base, novo, tolerancia=10)}
+
+    assert linhas == {"vazao_rps": False, "latencia_ms.p95": True, "latencia_ms.p99": False}
+
+
+def test_medir_serializacao():
+    medidas = bench.medir_serializacao(linhas=200, repeticoes=1)
+
+    assert set(medidas) == {"dict_por_linha", "objetos", "colunas"}
+    assert all(medida["linhas_por_s"] > 0 for medida in medidas.values())
+    assert medidas["colunas"]["bytes"] < medidas["objetos"]["bytes"]
+
+
+def test_medir_servir(tmp_path):
+    """Sobe o servir.py de verdade (um worker) e mede o tempo até ficar pronto, a vazão e o encerramento."""
+    caminho = bench.preparar_sqlite(100, str(tmp_path), saida=lambda *_: None)
+    resultado = bench.medir_servir(caminho, 100, processos=1, concorrencia=2, duracao=0.3)
+
+    assert resultado["erros"] == 0, resultado
+    assert resultado["requisicoes"] > 0 and resultado["status"].keys() == {"200"}
+    assert 0 < resultado["pronto_ms"] and resultado["todos_prontos_ms"] is not None
+    assert resultado["vazao_por_nucleo_rps"] == resultado["vazao_rps"]
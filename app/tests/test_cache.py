@@ -0,0 +1,83 @@
+import time
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from cache import CacheLRU
+
+
+def test_cache_invalidacao_por_tag():
+    """Invalidar uma tag remove só as entradas marcadas com ela."""
+    cache = CacheLRU()
+    cache.set(("cidade", "Recife", 100, 0), "recife", 10, [("cidade", "Recife"), ("id", 1)])
+    cache.set(("cidade", "Natal", 100, 0), "natal", 10, [("cidade", "Natal"), ("id", 2)])
+
+    assert cache.invalidar(("id", 1)) == 1
+    assert cache.get(("cidade", "Recife", 100, 0)) is None
+    assert cache.get(("cidade", "Natal", 100, 0)) == "natal"
+    assert cache.stats()["invalidadas"] == 1
+
+
+def test_cache_set_condicional():
+    """Com `valido` falso nada é guardado."""
+    cache = CacheLRU()
+    assert cache.set("a", "velho", 10, valido=lambda: False) is False
+    assert cache.get("a") is None
+    assert cache.set("a", "novo", 10, valido=lambda: True) is True
+    assert cache.get("a") == "novo"
+
+
+def test_cache_lru_limite_de_itens():
+    """Passando do limite, sai a entrada usada há mais tempo."""
+    cache = CacheLRU(max_itens=2)
+    cache.set("a", 1, 1)
+    cache.set("b", 2, 1)
+    cache.get("a")
+    cache.set("c", 3, 1)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_limite_de_bytes():
+    """A soma dos tamanhos nunca passa de max_bytes."""
+    cache = CacheLRU(max_bytes=1000)
+    for i in range(10):
+        cache.set(i, i, 300)
+
+    assert cache.stats()["bytes"] <= 1000
+    assert cache.get(9) == 9
+    assert cache.get(0) is None
+
+
+def test_cache_crescer_entrada():
+    """Bytes guardados depois do set somam no tamanho da entrada e no limite de bytes."""
+    cache = CacheLRU(max_bytes=1000)
+    cache.set("a", "a", 100)
+    cache.set("b", "b", 100)
+    bytes_antes = cache.stats()["bytes"]
+
+    assert cache.crescer("b", 50)
+    assert cache.stats()["bytes"] == bytes_antes + 50
+    # Entrada trocada na mesma chave: os bytes eram da anterior
+    assert not cache.crescer("b", 50, valido=lambda valor: valor == "antigo")
+    assert not cache.crescer("c", 50)
+
+    # Passando do limite, a menos usada sai
+    assert cache.crescer("b", 500)
+    assert cache.get("a") is None
+    assert cache.get("b") == "b"
+    assert cache.stats()["bytes"] <= 1000
+
+
+def test_cache_ttl():
+    """Entradas expiradas contam como falta."""
+    cache = CacheLRU(ttl=0.01)
+    cache.set("a", 1, 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["expiradas"] == 1
+    assert stats["misses"] == 1
@@ -0,0 +1,93 @@
+import threading
+import sys
+import os
+import pytest
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from coalescencia import Coalescedor
+
+
+def _seguidores(coalescedor, chave, funcao, quantidade):
+    """Dispara `quantidade` threads com a mesma chave e espera todas entrarem na fila do líder."""
+    resultados, erros = [], []
+
+    def chamar():
+        try:
+            resultados.append(coalescedor.executar(chave, funcao))
+        except Exception as err:
+            erros.append(err)
+
+    threads = [threading.Thread(target=chamar) for _ in range(quantidade)]
+    for thread in threads:
+        thread.start()
+    return threads, resultados, erros
+
+
+def test_chamadas_simultaneas_compartilham_o_resultado():
+    """Enquanto o líder roda, as chamadas com a mesma chave esperam e recebem o mesmo resultado."""
+    coalescedor = Coalescedor(timeout=5)
+    liberar, chamadas = threading.Event(), []
+
+    def consulta():
+        chamadas.append(1)
+        liberar.wait(5)
+        return ("corpo", 200)
+
+    lider, resultados, _ = _seguidores(coalescedor, "sp", consulta, 1)
+    while not coalescedor.stats()["em_andamento"]:
+        pass
+    seguidores, resultados_seguidores, _ = _seguidores(coalescedor, "sp", consulta, 5)
+    liberar.set()
+    for thread in lider + seguidores:
+        thread.join(5)
+
+    assert len(chamadas) == 1
+    assert resultados + resultados_seguidores == [("corpo", 200)] * 6
+    stats = coalescedor.stats()
+    assert stats["lideres"] == 1 and stats["economizadas"] == 5 and stats["em_andamento"] == 0
+
+    # Terminada a execução, a próxima chamada consulta de novo
+    assert coalescedor.executar("sp", consulta) == ("corpo", 200)
+    assert len(chamadas) == 2
+
+
+def test_erro_do_lider_chega_aos_seguidores():
+    """Uma exceção do líder é repassada a quem esperava por ele."""
+    coalescedor = Coalescedor(timeout=5)
+    liberar = threading.Event()
+
+    def consulta():
+        liberar.wait(5)
+        raise RuntimeError("banco fora")
+
+    lider, _, erros_lider = _seguidores(coalescedor, "x", consulta, 1)
+    while not coalescedor.stats()["em_andamento"]:
+        pass
+    seguidores, _, erros = _seguidores(coalescedor, "x", consulta, 3)
+    liberar.set()
+    for thread in lider + seguidores:
+        thread.join(5)
+
+    assert [str(erro) for erro in erros_lider + erros] == ["banco fora"] * 4
+
+
+def test_seguidor_consulta_sozinho_depois_do_timeout():
+    """Um líder travado não prende os seguidores além do timeout."""
+    coalescedor = Coalescedor(timeout=0.05)
+    liberar = threading.Event()
+    lider, _, _ = _seguidores(coalescedor, "x", lambda: liberar.wait(5) and "lento", 1)
+    while not coalescedor.stats()["em_andamento"]:
+        pass
+
+    assert coalescedor.executar("x", lambda: "rapido") == "rapido"
+    assert coalescedor.stats()["timeouts"] == 1
+    liberar.set()
+    lider[0].join(5)
+
+
+def test_chaves_diferentes_nao_esperam():
+    coalescedor = Coalescedor()
+    assert coalescedor.executar("a", lambda: 1) == 1
+    assert coalescedor.executar("b", lambda: 2) == 2
+    with pytest.raises(ValueError):
+        coalescedor.executar("c", lambda: int("x"))
+    assert coalescedor.stats() == {"timeout": 5.0, "em_andamento": 0, "lideres": 3, "economizadas": 0, "timeouts": 0}
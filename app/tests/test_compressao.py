@@ -0,0 +1,48 @@
+import gzip
+import zlib
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from werkzeug.http import parse_accept_header
+from compressao import escolher, comprimir, comprimir_pedacos
+
+
+def aceitas(cabecalho):
+    return parse_accept_header(cabecalho)
+
+
+def test_escolher_pela_qualidade_e_preferencia():
+    disponiveis = ("zstd", "br", "gzip")
+
+    assert escolher(aceitas("gzip, br"), disponiveis) == "br"
+    assert escolher(aceitas("gzip;q=1, br;q=0.5"), disponiveis) == "gzip"
+    assert escolher(aceitas("*"), disponiveis) == "zstd"
+    assert escolher(aceitas("gzip;q=0, identity"), disponiveis) is None
+    assert escolher(aceitas(""), disponiveis) is None
+
+
+def test_comprimir_gzip():
+    dados = b'{"cidade":"Recife"}' * 100
+
+    assert gzip.decompress(comprimir(dados, "gzip")) == dados
+
+
+def test_comprimir_pedacos_descomprime_a_cada_pedaco():
+    """Cada pedaço comprimido já pode ser descomprimido pelo cliente (flush por pedaço)."""
+    fechado = []
+
+    def pedacos():
+        try:
+            yield '{"a": 1}\n'
+            yield b'{"a": 2}\n'
+        finally:
+            fechado.append(True)
+
+    descompressor = zlib.decompressobj(31)
+    partes = comprimir_pedacos(pedacos(), "gzip")
+
+    assert descompressor.decompress(next(partes)) == b'{"a": 1}\n'
+    assert descompressor.decompress(next(partes)) == b'{"a": 2}\n'
+    descompressor.decompress(b"".join(partes))
+    assert descompressor.eof
+    assert fechado == [True]
@@ -0,0 +1,126 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from consulta import args_da_faixa, montar_busca, montar_busca_texto, montar_busca_cep, montar_contagem_cep, ler_faixa_cep, termos_busca, cursor_da_linha, cursor_da_relevancia, faixa_cep, ler_campos, projecao
+
+
+def test_montar_busca_filtros():
+    """Os filtros viram um único SELECT parametrizado, na ordem fixa da lista de filtros."""
+    args = {"cidade": "São Paulo", "tipo": "apartamento", "valor_max": "500000", "data_de": "2020-01-01", "cep": "0455"}
+    sql, params, coluna = montar_busca(args, 50)
+
+    assert sql == (
+        "SELECT * from imoveis WHERE tipo = %s AND cidade = %s AND valor <= %s AND data_aquisicao >= %s"
+        " AND cep BETWEEN %s AND %s ORDER BY id ASC LIMIT %s"
+    )
+    assert params == ("apartamento", "São Paulo", Decimal("500000"), date(2020, 1, 1), "04550000", "04559999", 51)
+    assert coluna == "id"
+
+
+def test_montar_busca_keyset_ordenado():
+    """O cursor de uma página ordenada por valor decrescente continua do ponto certo."""
+    linha = (8, "Rua Quatá", "Rua", "Vila olimpia", "São Paulo", "12345678", "apartamento", Decimal("750000.00"), date(2020, 1, 1))
+    cursor = cursor_da_linha(linha, "valor")
+
+    sql, params, _ = montar_busca({"sort": "-valor", "after": cursor}, 10)
+    assert sql == "SELECT * from imoveis WHERE (valor < %s OR (valor = %s AND id < %s)) ORDER BY valor DESC, id DESC LIMIT %s"
+    assert params == (Decimal("750000.00"), Decimal("750000.00"), 8, 11)
+
+
+def test_montar_busca_parametros_invalidos():
+    """Colunas fora da lista e valores mal formados são recusados."""
+    with pytest.raises(ValueError, match="sort"):
+        montar_busca({"sort": "logradouro; DROP TABLE imoveis"}, 10)
+    with pytest.raises(ValueError, match="valor_min"):
+        montar_busca({"valor_min": "barato"}, 10)
+    with pytest.raises(ValueError, match="cep"):
+        montar_busca({"cep": "04a"}, 10)
+    with pytest.raises(ValueError, match="after"):
+        montar_busca({"sort": "valor", "after": "lixo"}, 10)
+
+
+def test_faixa_cep():
+    assert faixa_cep("0") == ("00000000", "09999999")
+    assert faixa_cep("21240004") == ("21240004", "21240004")
+
+
+def test_ler_campos_e_projecao():
+    """`fields` valida os nomes e a projeção sempre inclui o id (e a coluna de ordenação)."""
+    assert ler_campos(None) is None
+    campos = ler_campos("valor, cep,valor")
+    assert campos == ("valor", "cep")
+    assert projecao(campos) == ("id", "cep", "valor")
+    assert projecao(campos, "data_aquisicao") == ("id", "cep", "valor", "data_aquisicao")
+
+    with pytest.raises(ValueError, match="fields"):
+        ler_campos("id,senha")
+    with pytest.raises(ValueError, match="fields"):
+        ler_campos("")
+
+
+def test_termos_busca():
+    """Só palavras chegam ao modo booleano, todas obrigatórias e como prefixo."""
+    assert termos_busca("Rua Sete de Setembro, +Centro*") == "+Sete* +Setembro* +Centro*"
+    with pytest.raises(ValueError):
+        termos_busca("Av. de")
+    with pytest.raises(ValueError):
+        termos_busca(None)
+
+
+def test_montar_busca_texto_keyset():
+    """A segunda página continua depois de (relevância, id) da última linha da primeira."""
+    after = cursor_da_relevancia((42, "Brasil 41", 0.6931471805599453))
+
+    sql, params = montar_busca_texto("brasil", 20, after, "id, logradouro")
+
+    assert sql.startswith("SELECT id, logradouro, MATCH(logradouro, bairro) AGAINST (%s IN BOOLEAN MODE) AS relevancia from imoveis WHERE ")
+    assert sql.endswith(" AND (MATCH(logradouro, bairro) AGAINST (%s IN BOOLEAN MODE) < %s OR "
+                        "(MATCH(logradouro, bairro) AGAINST (%s IN BOOLEAN MODE) = %s AND id > %s)) ORDER BY relevancia DESC, id ASC LIMIT %s")
+    assert params == ("+brasil*", "+brasil*", "+brasil*", 0.6931471805599453, "+brasil*", 0.6931471805599453, 42, 21)
+
+
+def test_ler_faixa_cep():
+    assert ler_faixa_cep({"prefixo": "0455"}) == ("04550000", "04559999")
+    assert ler_faixa_cep({"de": "01", "ate": "0599"}) == ("01000000", "05999999")
+    assert ler_faixa_cep({}) is None
+    for args in ({"prefixo": "04a"}, {"prefixo": "1", "de": "0"}, {"de": "5", "ate": "1"}):
+        with pytest.raises(ValueError):
+            ler_faixa_cep(args)
+
+
+def test_montar_busca_cep_keyset():
+    """A segunda página continua depois de (cep, id) da última linha, no mesmo intervalo."""
+    linha = (8, "04551738")
+    after = cursor_da_linha(linha, "cep", ("id", "cep"))
+
+    sql, params = montar_busca_cep({"prefixo": "0455", "after": after}, 10, "id, cep")
+
+    assert sql == ("SELECT id, cep from imoveis WHERE cep BETWEEN %s AND %s AND (cep > %s OR (cep = %s AND id > %s))"
+                   " ORDER BY cep ASC, id ASC LIMIT %s")
+    assert params == ("04550000", "04559999", "04551738", "04551738", 8, 11)
+
+
+def test_montar_contagem_cep():
+    sql, params, nivel = montar_contagem_cep({"nivel": "3", "prefixo": "0"})
+
+    assert sql == "SELECT LEFT(prefixo, %s) AS grupo, SUM(quantidade) from imoveis_cep WHERE prefixo BETWEEN %s AND %s GROUP BY grupo ORDER BY grupo"
+    assert params == (3, "00000", "09999")
+    assert nivel == 3
+    assert montar_contagem_cep({"nivel": "2", "de": "0455", "ate": "05"})[1] == (2, "04550", "05999")
+    for args in ({"nivel": "6"}, {"prefixo": "045529"}, {"de": "04552999"}):
+        with pytest.raises(ValueError):
+            montar_contagem_cep(args)
+
+
+def test_args_da_faixa():
+    """de/ate viram os filtros da coluna e a ordem vira o sort da busca."""
+    args = args_da_faixa("data_aquisicao", {"de": "2022-07-01", "ate": "2022-09-30", "cidade": "Recife", "q": "x"})
+    assert args == {"cidade": "Recife", "data_de": "2022-07-01", "data_ate": "2022-09-30", "sort": "data_aquisicao"}
+
+    assert args_da_faixa("valor", {}, ordem_padrao="desc") == {"sort": "-valor"}
+    for coluna, entrada in (("cep", {}), ("valor", {"ordem": "cima"}), ("valor", {"de": "muito"})):
+        with pytest.raises(ValueError):
+            args_da_faixa(coluna, entrada)
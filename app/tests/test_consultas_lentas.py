@@ -0,0 +1,67 @@
+import json
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from consultas_lentas import RegistroConsultasLentas, normalizar
+
+
+def conexao_com_plano(plano):
+    """Conexão Mock cujo EXPLAIN devolve `plano` (lista de dicionários)."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    colunas = list(plano[0])
+    cursor.description = [(coluna,) for coluna in colunas]
+    cursor.fetchall.return_value = [tuple(linha[coluna] for coluna in colunas) for linha in plano]
+    return conn
+
+
+def test_normalizar():
+    assert normalizar("SELECT *  from imoveis\n WHERE id IN (%s, %s, %s) LIMIT 10") == "SELECT * from imoveis WHERE id IN (%s, ...) LIMIT ?"
+    assert normalizar("SELECT * from imoveis WHERE cidade = 'Recife'") == "SELECT * from imoveis WHERE cidade = ?"
+
+
+def test_consulta_rapida_so_entra_no_ranking(tmp_path):
+    conectar = MagicMock()
+    registro = RegistroConsultasLentas(conectar, limiar=1.0, arquivo=str(tmp_path / "lentas.log"))
+
+    registro.observar("get_imoveis", "SELECT * from imoveis WHERE id = %s", (1,), 0.002, 1)
+    registro.observar("get_imoveis", "SELECT * from imoveis WHERE id = %s", (2,), 0.004, 1)
+
+    ranking = registro.ranking()
+    assert ranking["consultas"][0]["execucoes"] == 2
+    assert ranking["consultas"][0]["total_ms"] == 6.0
+    conectar.assert_not_called()
+    assert not (tmp_path / "lentas.log").exists()
+
+
+def test_consulta_lenta_vai_para_o_log_com_explain(tmp_path):
+    conn = conexao_com_plano([{"table": "imoveis", "type": "ALL", "key": None}])
+    arquivo = tmp_path / "lentas.log"
+    registro = RegistroConsultasLentas(lambda: conn, limiar=0.1, arquivo=str(arquivo))
+
+    registro.observar("get_imoveis_por_cidade", "SELECT * from imoveis WHERE cidade = %s", ("Recife",), 0.5, 300)
+    registro.esperar()
+
+    entrada = json.loads(arquivo.read_text(encoding="utf-8"))
+    assert entrada["sql"] == "SELECT * from imoveis WHERE cidade = %s"
+    assert entrada["params"] == ["Recife"]
+    assert entrada["linhas"] == 300
+    assert entrada["explain"] == [{"table": "imoveis", "type": "ALL", "key": None}]
+    assert entrada["varredura_completa"] is True
+    conn.cursor.return_value.execute.assert_called_once_with("EXPLAIN SELECT * from imoveis WHERE cidade = %s", ("Recife",))
+    assert registro.ranking()["consultas"][0]["varredura_completa"] is True
+
+
+def test_log_limitado_por_minuto(tmp_path):
+    conn = conexao_com_plano([{"table": "imoveis", "type": "ref", "key": "idx_imoveis_cidade"}])
+    registro = RegistroConsultasLentas(lambda: conn, limiar=0.1, arquivo=str(tmp_path / "lentas.log"), por_minuto=1)
+
+    for _ in range(3):
+        registro.observar("r", "SELECT * from imoveis WHERE cidade = %s", ("Recife",), 0.5, 1)
+    registro.esperar()
+
+    ranking = registro.ranking()
+    assert ranking["registradas"] == 1
+    assert ranking["suprimidas"] == 2
+    assert ranking["consultas"][0]["lentas"] == 3
@@ -0,0 +1,44 @@
+import pytest
+from decimal import Decimal
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from estatisticas import ler_resumo, reconstruir, SQL_RECONSTRUIR
+
+
+def test_ler_resumo_por_bairro():
+    """O resumo vira uma entrada por grupo, com a média calculada a partir da soma."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchall.return_value = [("São Paulo", "Centro", 2, Decimal("1300000.00"), Decimal("300000.00"), Decimal("1000000.00"))]
+
+    grupos = ler_resumo(conn, "bairro", "São Paulo")
+
+    cursor.execute.assert_called_once_with(
+        "SELECT cidade, grupo, quantidade, soma_valor, valor_min, valor_max from imoveis_resumo WHERE dimensao = %s AND cidade = %s ORDER BY cidade, grupo",
+        ("bairro", "São Paulo"),
+    )
+    assert grupos == [{
+        "bairro": "Centro", "cidade": "São Paulo", "quantidade": 2, "soma_valor": Decimal("1300000.00"),
+        "media_valor": Decimal("650000.00"), "valor_min": Decimal("300000.00"), "valor_max": Decimal("1000000.00"),
+    }]
+
+
+def test_ler_resumo_dimensao_invalida():
+    with pytest.raises(ValueError):
+        ler_resumo(MagicMock(), "logradouro")
+    with pytest.raises(ValueError):
+        ler_resumo(MagicMock(), "tipo", "São Paulo")
+
+
+def test_reconstruir():
+    """A reconstrução roda com as tabelas travadas e sempre destrava no fim."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+
+    reconstruir(conn)
+
+    executados = [chamada[0][0] for chamada in cursor.execute.call_args_list]
+    assert executados == ["LOCK TABLES imoveis READ, imoveis_resumo WRITE, imoveis_cep WRITE", *SQL_RECONSTRUIR, "UNLOCK TABLES"]
+    conn.commit.assert_called_once()
@@ -0,0 +1,127 @@
+import pytest
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from lote import ErroLote, inserir_lote, validar_imovel, SQL_INSERT, ler_alvo, ler_alteracoes, atualizar_lote, remover_lote
+
+
+def novo_imovel(**campos):
+    imovel = {
+        "logradouro": "Rua Elvira Ferraz",
+        "tipo_logradouro": "Rua",
+        "bairro": "Vila olimpia",
+        "cidade": "São Paulo",
+        "cep": "12345678",
+        "tipo": "apartamento",
+        "valor": 1000000.00,
+        "data_aquisicao": "2020-01-01"
+    }
+    imovel.update(campos)
+    return imovel
+
+
+def test_validar_imovel():
+    """A validação devolve os valores na ordem do INSERT e recusa campos inválidos."""
+    assert validar_imovel(novo_imovel()) == ("Rua Elvira Ferraz", "Rua", "Vila olimpia", "São Paulo", "12345678", "apartamento", 1000000.00, "2020-01-01")
+
+    with pytest.raises(ValueError, match="bairro"):
+        validar_imovel(novo_imovel(bairro=None))
+    with pytest.raises(ValueError, match="cep"):
+        validar_imovel(novo_imovel(cep="1234"))
+    with pytest.raises(ValueError, match="valor"):
+        validar_imovel(novo_imovel(valor="caro"))
+    with pytest.raises(ValueError, match="data_aquisicao"):
+        validar_imovel(novo_imovel(data_aquisicao="31/01/2018"))
+
+
+def test_inserir_lote_em_pedacos():
+    """Cada pedaço vira um executemany; os ids saem de lastrowid."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.lastrowid = 10
+
+    imoveis = list(enumerate([novo_imovel(), novo_imovel(), novo_imovel()]))
+    resultados = inserir_lote(conn, imoveis, 2, "melhor_esforco")
+
+    assert cursor.executemany.call_count == 2
+    assert cursor.executemany.call_args_list[0][0][0] == SQL_INSERT
+    assert conn.commit.call_count == 2
+    assert resultados == [{"indice": 0, "id": 10}, {"indice": 1, "id": 11}, {"indice": 2, "id": 10}]
+
+
+def test_inserir_lote_tudo_ou_nada():
+    """No modo tudo_ou_nada uma linha inválida desfaz tudo e nada é confirmado."""
+    conn = MagicMock()
+    imoveis = list(enumerate([novo_imovel(), novo_imovel(cep="errado")]))
+
+    with pytest.raises(ErroLote) as err:
+        inserir_lote(conn, imoveis, 1, "tudo_ou_nada")
+
+    assert err.value.indice == 1
+    conn.rollback.assert_called_once()
+    conn.commit.assert_not_called()
+
+
+def test_inserir_lote_melhor_esforco_isola_falhas():
+    """Se o executemany falhar, as linhas do pedaço são repetidas uma a uma."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.executemany.side_effect = Exception("Duplicate entry")
+    cursor.execute.side_effect = [None, Exception("Duplicate entry")]
+    cursor.lastrowid = 7
+    gravados = []
+
+    imoveis = list(enumerate([novo_imovel(), novo_imovel(cidade="Recife"), novo_imovel(valor=-1)]))
+    resultados = inserir_lote(conn, imoveis, 10, "melhor_esforco", ao_gravar=lambda ids, imoveis: gravados.append(ids))
+
+    assert resultados[0] == {"indice": 0, "id": 7}
+    assert "Duplicate entry" in resultados[1]["erro"]
+    assert "valor" in resultados[2]["erro"]
+    assert gravados == [[7]]
+
+
+def test_atualizar_lote_por_filtro():
+    """Com filtro, os ids são lidos por keyset e cada pedaço vira um UPDATE ... WHERE id IN."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchall.side_effect = [[(1,), (2,)], [(5,)]]
+    cursor.rowcount = 2
+
+    set_sql, set_params = ler_alteracoes({"fator_valor": 1.1})
+    ids, filtro = ler_alvo({"filtro": {"cidade": "Recife"}})
+    afetados, tocados = atualizar_lote(conn, ids, filtro, set_sql, set_params, 2)
+
+    assert tocados == [1, 2, 5]
+    assert afetados == 4
+    cursor.execute.assert_any_call("SELECT id from imoveis WHERE cidade = %s AND id > %s ORDER BY id LIMIT %s FOR UPDATE", ("Recife", 2, 2))
+    cursor.execute.assert_called_with("UPDATE imoveis SET valor = ROUND(valor * %s, 2) WHERE id IN (%s)", (1.1, 5))
+    conn.commit.assert_called_once()
+
+
+def test_remover_lote_por_ids():
+    """Uma lista de ids é dividida em pedaços e tudo é confirmado num commit só."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.rowcount = 2
+
+    afetados, tocados = remover_lote(conn, [1, 2, 3, 4], None, 2)
+
+    assert afetados == 4
+    assert tocados == [1, 2, 3, 4]
+    cursor.execute.assert_called_with("DELETE FROM imoveis WHERE id IN (%s, %s)", (3, 4))
+    conn.commit.assert_called_once()
+
+
+def test_escrita_em_lote_validacao():
+    """Alvo e alterações inválidos são recusados antes de ir ao banco."""
+    with pytest.raises(ValueError):
+        ler_alvo({"ids": [1], "filtro": {"cidade": "Recife"}})
+    with pytest.raises(ValueError):
+        ler_alvo({"filtro": {"logradouro": "Rua Quatá"}})
+    with pytest.raises(ValueError):
+        ler_alvo({"ids": []})
+    with pytest.raises(ValueError):
+        ler_alteracoes({"valores": {"id": 3}})
+    with pytest.raises(ValueError):
+        ler_alteracoes({"fator_valor": -1})
@@ -0,0 +1,75 @@
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from flask import Flask, g
+from metricas import Histograma, Medicao, RegistroMetricas, medir_conexoes
+
+
+def test_histograma_exporta_contagens_cumulativas():
+    histograma = Histograma((1, 10))
+    for valor in (0.5, 1, 5, 50):
+        histograma.observar(valor)
+
+    linhas = list(histograma.linhas("x", 'rota="r"'))
+
+    assert linhas[:3] == ['x_bucket{rota="r",le="1"} 2', 'x_bucket{rota="r",le="10"} 3', 'x_bucket{rota="r",le="+Inf"} 4']
+    assert linhas[-1] == 'x_count{rota="r"} 4'
+
+
+def test_conexao_medida_soma_fases_e_linhas():
+    """Dentro de uma requisição, execute/fetch/commit e o empréstimo da conexão entram na medição."""
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = [(1,), (2,), (3,)]
+    conectar = medir_conexoes(lambda: conn)
+
+    with Flask(__name__).test_request_context():
+        g.medicao = Medicao()
+        medida = conectar()
+        cursor = medida.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        medida.commit()
+
+        assert set(g.medicao.fases) == {"conexao", "execute", "fetch", "commit"}
+        assert g.medicao.linhas == 3
+    conn.commit.assert_called_once()
+
+
+def test_fora_de_requisicao_a_conexao_nao_e_envolvida():
+    conn = MagicMock()
+    assert medir_conexoes(lambda: conn)() is conn
+
+
+def test_registro_exporta_por_rota():
+    registro = RegistroMetricas()
+    medicao = Medicao()
+    medicao.fases["execute"] = 0.002
+    medicao.linhas, medicao.status, medicao.bytes = 10, 200, 2048
+
+    registro.registrar("get_imoveis", "GET", medicao)
+    texto = registro.exportar([("extra", "gauge", "Um valor", 7)])
+
+    assert 'imoveis_api_requisicoes_total{rota="get_imoveis",metodo="GET",status="200"} 1' in texto
+    assert 'imoveis_api_fase_segundos_bucket{rota="get_imoveis",fase="execute",le="0.0025"} 1' in texto
+    assert 'imoveis_api_linhas_bucket{rota="get_imoveis",le="10"} 1' in texto
+    assert 'imoveis_api_resposta_bytes_bucket{rota="get_imoveis",le="4096"} 1' in texto
+    assert "extra 7" in texto
+
+
+def test_valores_grandes_nao_perdem_precisao():
+    """Contadores e somas acima de 1e6 saem com todos os dígitos (sem a notação de {:g})."""
+    histograma = Histograma((1048576,))
+    histograma.observar(1234567)
+    histograma.observar(0.1)
+    linhas = list(histograma.linhas("x", 'rota="r"'))
+    assert linhas[0] == 'x_bucket{rota="r",le="1048576"} 1'
+    assert linhas[-2] == 'x_sum{rota="r"} 1234567.1'
+
+    bytes_ = Histograma((1024,))
+    bytes_.observar(123456789)
+    assert list(bytes_.linhas("y", 'rota="r"'))[-2] == 'y_sum{rota="r"} 123456789'
+
+    texto = RegistroMetricas().exportar([("hits", "counter", "Acertos", 12345678), ("taxa", "gauge", "Taxa", 0.1)])
+    assert "hits 12345678\n" in texto
+    assert "taxa 0.1\n" in texto
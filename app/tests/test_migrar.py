@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from migrar import aplicar, dividir_comandos, explicar, listar_migracoes
+
+
+def test_migracoes_em_ordem():
+    """As migrações do repositório têm versões únicas e começam pela tabela imoveis."""
+    migracoes = listar_migracoes()
+    assert [versao for versao, _, _ in migracoes] == sorted({versao for versao, _, _ in migracoes})
+    assert migracoes[0][1] == "0001_cria_imoveis.sql"
+
+
+def test_dividir_comandos():
+    """Comentários são ignorados e DELIMITER permite corpos com ponto e vírgula."""
+    script = """-- comentário
+CREATE INDEX a ON imoveis (tipo);
+DELIMITER $$
+CREATE TRIGGER t AFTER INSERT ON imoveis FOR EACH ROW
+BEGIN
+    SET @x = 1;
+END$$
+DELIMITER ;
+CREATE INDEX b ON imoveis (cep);
+"""
+    comandos = dividir_comandos(script)
+    assert len(comandos) == 3
+    assert comandos[0] == "CREATE INDEX a ON imoveis (tipo)"
+    assert comandos[1].startswith("CREATE TRIGGER t") and "SET @x = 1;" in comandos[1]
+    assert comandos[2] == "CREATE INDEX b ON imoveis (cep)"
+
+
+def test_aplicar_somente_pendentes(tmp_path):
+    """Só as migrações ainda não registradas são executadas e registradas."""
+    (tmp_path / "0001_um.sql").write_text("CREATE TABLE um (id INT);")
+    (tmp_path / "0002_dois.sql").write_text("CREATE TABLE dois (id INT);\nCREATE INDEX i ON dois (id);")
+
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchall.return_value = [(1,)]
+
+    assert aplicar(conn, str(tmp_path), saida=lambda _: None) == 1
+    executados = [chamada[0][0] for chamada in cursor.execute.call_args_list]
+    assert "CREATE TABLE um (id INT)" not in executados
+    assert "CREATE TABLE dois (id INT)" in executados
+    assert "CREATE INDEX i ON dois (id)" in executados
+    cursor.execute.assert_called_with("INSERT INTO schema_migracoes (versao, nome) VALUES (%s, %s)", (2, "0002_dois.sql"))
+
+
+def test_explicar():
+    """O relatório do EXPLAIN aponta o índice escolhido para cada consulta."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.description = [("id",), ("table",), ("type",), ("key",)]
+    cursor.fetchall.side_effect = [[(1, "imoveis", "ref", "idx_imoveis_cidade")], [(1, "imoveis", "ALL", None)]]
+
+    relatorio = explicar(conn, [("cidade", "SELECT 1", ()), ("scan", "SELECT 2", ())])
+    assert relatorio == [("cidade", "idx_imoveis_cidade", "ref"), ("scan", None, "ALL")]
@@ -0,0 +1,103 @@
+import pytest
+import threading
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pool import ConnectionPool, PoolEsgotado
+
+
+def criar_pool(**kwargs):
+    """Cria um pool cujas conexões são Mocks (sem banco real)."""
+    fabrica = MagicMock(side_effect=lambda: MagicMock(in_transaction=False))
+    return ConnectionPool(fabrica, **kwargs), fabrica
+
+
+def test_pool_reutiliza_conexao():
+    """Uma conexão devolvida deve ser reaproveitada em vez de abrir outra."""
+    pool, fabrica = criar_pool(tamanho=2)
+
+    with pool.adquirir() as conn:
+        primeira = conn._conn
+    with pool.adquirir() as conn:
+        segunda = conn._conn
+
+    assert primeira is segunda
+    assert fabrica.call_count == 1
+    assert pool.stats()["emprestimos"] == 2
+    assert pool.stats()["em_uso"] == 0
+
+
+def test_pool_esgotado():
+    """Com o pool cheio, quem pede espera até o timeout e recebe PoolEsgotado."""
+    pool, _ = criar_pool(tamanho=1, timeout=0.05)
+
+    conn = pool.adquirir()
+    with pytest.raises(PoolEsgotado):
+        pool.adquirir()
+    assert pool.stats()["timeouts"] == 1
+
+    conn.close()
+    # close() é idempotente e a vaga volta a ficar disponível
+    conn.close()
+    pool.adquirir().close()
+    assert pool.stats()["em_uso"] == 0
+
+
+def test_pool_espera_devolucao():
+    """Um pedido em espera recebe a conexão assim que outra thread a devolve."""
+    pool, fabrica = criar_pool(tamanho=1, timeout=2)
+    conn = pool.adquirir()
+
+    threading.Timer(0.05, conn.close).start()
+    with pool.adquirir():
+        pass
+
+    assert fabrica.call_count == 1
+    assert pool.stats()["espera_max_ms"] > 0
+
+
+def test_pool_descarta_conexao_invalida():
+    """Conexões ociosas que falham no ping são descartadas e substituídas."""
+    pool, fabrica = criar_pool(tamanho=1, validar_apos=0)
+
+    with pool.adquirir() as conn:
+        conn._conn.ping.side_effect = Exception("MySQL server has gone away")
+
+    with pool.adquirir():
+        pass
+
+    assert fabrica.call_count == 2
+    assert pool.stats()["descartadas"] == 1
+
+
+def test_pool_desfaz_transacao_pendente():
+    """Transações abertas são desfeitas antes da conexão voltar ao pool."""
+    pool, _ = criar_pool(tamanho=1)
+
+    conn = pool.adquirir()
+    real = conn._conn
+    real.in_transaction = True
+    conn.close()
+
+    real.rollback.assert_called_once()
+
+
+def test_pool_aquecer():
+    """O aquecimento abre as conexões de antemão; os empréstimos seguintes não abrem outras."""
+    pool, fabrica = criar_pool(tamanho=3)
+
+    assert pool.aquecer(2) == 2
+    assert pool.aquecer(2) == 0
+    with pool.adquirir(), pool.adquirir():
+        pass
+    assert fabrica.call_count == 2
+    assert pool.aquecer() == 1
+    assert pool.stats()["livres"] == 3
+
+    # Uma falha ao conectar chega a quem aqueceu e não deixa vaga reservada
+    pool, fabrica = criar_pool(tamanho=2)
+    fabrica.side_effect = [MagicMock(in_transaction=False), OSError("recusada")]
+    with pytest.raises(OSError):
+        pool.aquecer()
+    assert pool.stats()["abertas"] == 1 and pool.stats()["livres"] == 1
@@ -0,0 +1,156 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from consulta import COLUNAS
+from replica import (ReplicaImoveis, ReplicaCheia, SQL_INICIO_DO_LOG, SQL_SEQS_DESDE, SQL_ALTERACOES_DESDE,
+                     SQL_ALTERACOES_ENTRE)
+import pytest
+
+
+def linha(id, cidade="São Paulo", tipo="casa", valor="100000.00"):
+    return (id, "Rua Quatá", "Rua", "Centro", cidade, "04552999", tipo, Decimal(valor), date(2020, 1, 1))
+
+
+def conexao_com(linhas):
+    """Conexão Mock que devolve `linhas` em um lote de fetchmany."""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchall.return_value = []
+    cursor.fetchmany.side_effect = [linhas, []]
+    return conn
+
+
+def test_replica_carga_e_indices():
+    """Depois da carga, as páginas por cidade/tipo saem dos índices em ordem de id."""
+    replica = ReplicaImoveis()
+    replica.carregar(conexao_com([linha(1), linha(2, cidade="Recife"), linha(3), linha(4, tipo="apartamento")]))
+
+    assert replica.pronta
+    assert replica.por_id(2)[4] == "Recife"
+    assert [l[0] for l in replica.pagina(("cidade", "São Paulo"), 0, 10)] == [1, 3, 4]
+    # limit + 1 linhas, a partir do cursor
+    assert [l[0] for l in replica.pagina(("cidade", "São Paulo"), 1, 1)] == [3, 4]
+    assert [l[0] for l in replica.pagina(("tipo", "casa"), 0, 10)] == [1, 2, 3]
+    assert [l[0] for l in replica.pagina(None, 2, 10)] == [3, 4]
+    assert replica.stats()["bytes_estimados"] > 0
+
+
+def test_replica_aplica_escritas():
+    """Escritas confirmadas movem a linha entre os índices."""
+    replica = ReplicaImoveis()
+    replica.carregar(conexao_com([linha(1), linha(2)]))
+
+    replica.aplicar([linha(2, cidade="Recife", valor="50000.00"), linha(5)], removidos=[1])
+
+    assert replica.por_id(1) is None
+    assert [l[0] for l in replica.pagina(("cidade", "São Paulo"), 0, 10)] == [5]
+    assert [l[0] for l in replica.pagina(("cidade", "Recife"), 0, 10)] == [2]
+    assert replica.por_id(2)[COLUNAS.index("valor")] == Decimal("50000.00")
+
+
+def test_replica_aplicar_retorna_so_o_que_mudou():
+    """Linhas iguais às que já estão (a sincronização as relê) não contam como mudança."""
+    replica = ReplicaImoveis()
+    replica.carregar(conexao_com([linha(1), linha(2)]))
+
+    mudadas, removidas = replica.aplicar([linha(1), linha(2, cidade="Recife")], removidos=[3])
+    assert [l[0] for l in mudadas] == [2]
+    assert removidas == []
+    assert replica.aplicar([linha(2, cidade="Recife")], removidos=[1]) == ([], [1])
+
+
+def test_replica_limite_de_linhas():
+    """Uma tabela maior que o limite não é carregada."""
+    replica = ReplicaImoveis(max_linhas=1)
+    with pytest.raises(ReplicaCheia):
+        replica.carregar(conexao_com([linha(1), linha(2)]))
+    assert not replica.pronta
+    assert replica.stats()["linhas"] == 0
+
+
+class BancoComLog:
+    """Banco falso com a tabela imoveis e o log de alterações (migração 0012) visível até agora."""
+
+    def __init__(self, linhas, log=(), inicio=0):
+        self.linhas = {l[0]: l for l in linhas}
+        self.log = dict(log)  # seq -> imovel_id, só as transações com commit
+        self.inicio = inicio
+
+    def cursor(self, buffered=True):
+        cursor = MagicMock()
+        cursor.execute.side_effect = lambda sql, params=(): setattr(cursor, "resultado", self.responder(sql, params))
+        cursor.fetchall.side_effect = lambda: cursor.resultado
+        cursor.fetchmany.side_effect = lambda n: [cursor.resultado.pop(0) for _ in range(min(n, len(cursor.resultado)))]
+        return cursor
+
+    def commit(self):
+        pass
+
+    def responder(self, sql, params):
+        seqs = sorted(self.log)
+        if sql == SQL_INICIO_DO_LOG:
+            return [(self.inicio,)] if self.inicio else []
+        if sql == SQL_SEQS_DESDE:
+            return [(seq,) for seq in seqs if seq > params[0]]
+        if sql == SQL_ALTERACOES_DESDE:
+            return [(seq, self.log[seq]) for seq in seqs if seq > params[0]][:params[1]]
+        if sql == SQL_ALTERACOES_ENTRE:
+            return [(seq, self.log[seq]) for seq in seqs if params[0] <= seq <= params[1]]
+        if "WHERE id IN" in sql:
+            return [self.linhas[id] for id in params if id in self.linhas]
+        return [self.linhas[id] for id in sorted(self.linhas)]
+
+
+def test_sincronizacao_espera_transacao_longa():
+    """Um seq que falta (transação ainda sem commit) é lido quando aparece, mesmo depois de seqs maiores."""
+    banco = BancoComLog([linha(1), linha(2)], log={1: 1, 2: 2})
+    replica = ReplicaImoveis()
+    replica.sincronizar(banco)
+
+    # A transação longa pegou o seq 3 e ainda não fez commit; a do seq 4 já fez
+    banco.linhas[5] = linha(5)
+    banco.log[4] = 5
+    mudadas, removidas = replica.sincronizar(banco)
+    assert [l[0] for l in mudadas] == [5]
+    assert replica.stats()["transacoes_pendentes"] == 1
+
+    # O commit chega depois: a linha do seq 3 entra na próxima sincronização
+    banco.linhas[1] = linha(1, cidade="Recife")
+    banco.log[3] = 1
+    del banco.linhas[2]
+    banco.log[5] = 2
+    mudadas, removidas = replica.sincronizar(banco)
+    assert [l[0] for l in mudadas] == [1]
+    assert removidas == [2]
+    assert replica.por_id(1)[4] == "Recife"
+    assert replica.stats()["transacoes_pendentes"] == 0
+    assert replica.stats()["seq"] == 5
+
+
+def test_carga_deixa_pendentes_as_transacoes_abertas():
+    """Na carga, os seqs recentes que não estão visíveis ficam pendentes até o commit."""
+    banco = BancoComLog([linha(1), linha(2)], log={10: 1, 12: 2}, inicio=10)
+    replica = ReplicaImoveis()
+    replica.sincronizar(banco)
+    assert replica.stats()["transacoes_pendentes"] == 1
+
+    banco.linhas[3] = linha(3)
+    banco.log[11] = 3
+    mudadas, _ = replica.sincronizar(banco)
+    assert [l[0] for l in mudadas] == [3]
+
+
+def test_pendencia_expira_depois_de_max_transacao():
+    """Um seq que nunca aparece (rollback) deixa de ser procurado depois de `max_transacao` segundos."""
+    banco = BancoComLog([linha(1)], log={1: 1})
+    replica = ReplicaImoveis()
+    replica.sincronizar(banco)
+    banco.log[3] = 1
+    replica.sincronizar(banco, max_transacao=600)
+    assert replica.stats()["transacoes_pendentes"] == 1
+
+    replica.sincronizar(banco, max_transacao=0)
+    assert replica.stats()["transacoes_pendentes"] == 0
@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from pool import PoolEsgotado
+from roteamento import RoteadorReplicas
+
+
+def criar_roteador(quantidade=2, **kwargs):
+    """Roteador com pools Mock; cada pool devolve uma conexão que carrega o nome da réplica."""
+    pools = []
+    for i in range(quantidade):
+        pool = MagicMock()
+        pool.adquirir.return_value = f"conn-r{i}"
+        pool.stats.return_value = {"em_uso": 0}
+        pools.append((f"r{i}", pool))
+    return RoteadorReplicas(pools, **kwargs), [pool for _, pool in pools]
+
+
+def test_round_robin_alterna_replicas():
+    roteador, _ = criar_roteador(2)
+
+    conexoes = [roteador.adquirir() for _ in range(4)]
+
+    assert conexoes == ["conn-r0", "conn-r1", "conn-r0", "conn-r1"]
+
+
+def test_replica_com_erro_e_ejetada():
+    """Uma réplica que falha ao conectar sai do rodízio e a leitura vai para a próxima."""
+    roteador, pools = criar_roteador(2)
+    pools[0].adquirir.side_effect = Exception("conexão recusada")
+
+    assert [roteador.adquirir() for _ in range(3)] == ["conn-r1"] * 3
+    assert pools[0].adquirir.call_count == 1
+    assert [r["saudavel"] for r in roteador.stats()] == [False, True]
+
+
+def test_replica_ocupada_nao_e_ejetada():
+    roteador, pools = criar_roteador(2)
+    pools[0].adquirir.side_effect = PoolEsgotado("cheio")
+
+    assert roteador.adquirir() == "conn-r1"
+    assert all(r["saudavel"] for r in roteador.stats())
+
+
+def test_sem_replicas_saudaveis_retorna_none():
+    roteador, pools = criar_roteador(1)
+    pools[0].adquirir.side_effect = Exception("fora do ar")
+
+    assert roteador.adquirir() is None
+    assert roteador.adquirir() is None
+    assert pools[0].adquirir.call_count == 1
+
+
+def test_health_check_devolve_replica_ao_rodizio():
+    roteador, pools = criar_roteador(1)
+    conn = MagicMock()
+    pools[0].adquirir.return_value = conn
+    roteador.ejetar(roteador._replicas[0])
+    assert roteador.adquirir() is None
+
+    roteador.verificar()
+
+    conn.__enter__.return_value.ping.assert_called_once_with(reconnect=False)
+    assert roteador.adquirir() is conn
+
+
+def test_health_check_nao_ejeta_replica_ocupada():
+    """Pool esgotado no health check é réplica ocupada, não com defeito: continua no rodízio."""
+    roteador, pools = criar_roteador(1)
+    pools[0].adquirir.side_effect = PoolEsgotado("cheio")
+
+    roteador.verificar()
+
+    assert roteador.stats()[0]["saudavel"]
+    pools[0].adquirir.side_effect = None
+    assert roteador.adquirir() == "conn-r0"
+
+
+def test_menos_ocupada():
+    roteador, pools = criar_roteador(2, politica="menos_ocupada")
+    pools[0].stats.return_value = {"em_uso": 5}
+    pools[1].stats.return_value = {"em_uso": 1}
+
+    assert roteador.adquirir() == "conn-r1"
+
+
+def test_politica_invalida():
+    with pytest.raises(ValueError):
+        criar_roteador(1, politica="aleatoria")
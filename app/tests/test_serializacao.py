@@ -0,0 +1,40 @@
+import json
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from datetime import date
+from decimal import Decimal
+from flask import Flask
+from serializacao import FORMATO_COLUNAS, ProvedorJSON, conversor, corpo_imoveis
+
+LINHA = (7, "Brasil 7", "Rua", "Centro", "Recife", "50000000", "casa", Decimal("350000.10"), date(2020, 2, 29))
+
+
+def test_conversor_todas_as_colunas():
+    assert conversor()(LINHA) == {
+        "id": 7, "logradouro": "Brasil 7", "tipo_logradouro": "Rua", "bairro": "Centro", "cidade": "Recife",
+        "cep": "50000000", "tipo": "casa", "valor": 350000.10, "data_aquisicao": "2020-02-29",
+    }
+
+
+def test_conversor_com_projecao():
+    """Com `fields`, as chaves seguem a ordem pedida e os índices vêm das colunas do SELECT."""
+    colunas = ("id", "valor", "data_aquisicao", "cep")
+    linha = (7, Decimal("10.50"), date(2020, 1, 1), "50000000")
+
+    assert list(conversor(("cep", "valor"), colunas)(linha).items()) == [("cep", "50000000"), ("valor", 10.5)]
+
+
+def test_corpo_colunar():
+    corpo = corpo_imoveis([LINHA], ("id", "valor"), formato=FORMATO_COLUNAS)
+
+    assert corpo == {"columns": ["id", "valor"], "rows": [[7, 350000.10]]}
+
+
+def test_provedor_json_numeros_datas_e_acentos():
+    provedor = ProvedorJSON(Flask(__name__))
+
+    texto = provedor.dumps({"valor": Decimal("1.25"), "data": date(2021, 12, 1), "cidade": "São Paulo"})
+
+    assert "São Paulo" in texto
+    assert list(json.loads(texto).items()) == [("valor", 1.25), ("data", "2021-12-01"), ("cidade", "São Paulo")]
@@ -1,3 +1,4 @@
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 import sys
@@ -5,13 +6,15 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils import connect_db
 from config import config
-from servidor import app
+from servidor import app, cache
 
 
 @pytest.fixture
 def client():
     """Cria um cliente de teste para a API."""
     app.config["TESTING"] = True
+    # Cada teste simula um banco diferente, então nada pode vir do cache de outro teste
+    cache.limpar()
     with app.test_client() as client:
         yield client
 
@@ -450,3 +453,860 @@ def test_delete_imoveis_not_found(mock_connect_db, client):
 
 
 
+
+
+
+@patch("servidor.connect_db")
+def test_get_imoveis_paginado(mock_connect_db, client):
+    """Testa a paginação por cursor: limit, after e o cursor next."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    # O banco devolve limit + 1 linhas, indicando que existe próxima página
+    mock_cursor.fetchall.return_value = [
+        (3, "José Eiras Pinheiro", "Rua", "Barra da Tijuca", "Rio de Janeiro", "21240004", "casa em condomínio", 150000.00, "2018-01-31"),
+        (4, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30"),
+        (5, "Rua Quatá", "Rua", "Vila olimpia", "São Paulo", "12345678", "apartamento", 500000.00, "2020-01-01"),
+    ]
+
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis?limit=2&after=2")
+    assert response.status_code == 200
+
+    mock_cursor.execute.assert_called_with("SELECT * from imoveis WHERE id > %s ORDER BY id LIMIT %s", (2, 3))
+
+    dados = response.get_json()
+    assert [imovel["id"] for imovel in dados["imoveis"]] == [3, 4]
+    assert dados["next"] == 4
+
+
+
+@patch("servidor.connect_db")
+def test_get_imoveis_por_cidade_paginado(mock_connect_db, client):
+    """Testa que o filtro por cidade também usa o cursor em id."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = []
+
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/cidade/São Paulo?after=10&limit=5")
+
+    # Página vazia depois de um cursor não é erro
+    assert response.status_code == 200
+    assert response.get_json() == {"imoveis": []}
+    mock_cursor.execute.assert_called_with("SELECT * from imoveis WHERE cidade = %s AND id > %s ORDER BY id LIMIT %s", ("São Paulo", 10, 6))
+
+
+
+def test_get_imoveis_limit_invalido(client):
+    """Testa que limit acima do máximo é recusado antes de ir ao banco."""
+
+    response = client.get("/imoveis?limit=1000000")
+    assert response.status_code == 400
+
+    response = client.get("/imoveis/tipo/casa?limit=abc")
+    assert response.status_code == 400
+
+
+
+@patch("servidor.connect_db")
+def test_get_imoveis_ndjson(mock_connect_db, client):
+    """Testa o modo streaming NDJSON: lê em lotes com fetchmany e emite um imóvel por linha."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+
+    # Dois lotes e depois o fim do resultado
+    mock_cursor.fetchmany.side_effect = [
+        [(1, "José Eiras Pinheiro", "Rua", "Barra da Tijuca", "Rio de Janeiro", "21240004", "casa em condomínio", 150000.00, "2018-01-31")],
+        [(2, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30")],
+        [],
+    ]
+
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis?formato=ndjson")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+
+    linhas = [json.loads(linha) for linha in response.get_data(as_text=True).splitlines()]
+    assert [imovel["id"] for imovel in linhas] == [1, 2]
+
+    mock_conn.cursor.assert_called_with(buffered=False)
+    mock_cursor.fetchall.assert_not_called()
+    # A conexão só volta ao pool depois que o corpo inteiro foi enviado
+    mock_conn.__exit__.assert_called_once()
+
+
+
+@patch("servidor.connect_db")
+def test_head_em_streaming_devolve_a_conexao(mock_connect_db, client):
+    """Um HEAD em streaming nunca lê o corpo: a conexão tem que voltar ao pool mesmo assim."""
+    from pool import ConnectionPool
+
+    pool = ConnectionPool(MagicMock, tamanho=2, timeout=0.1)
+    mock_connect_db.side_effect = lambda leitura=False: pool.adquirir()
+
+    for _ in range(3):
+        for url, cabecalhos in (("/imoveis?formato=ndjson", {}), ("/imoveis", {"Accept": "application/x-ndjson"})):
+            response = client.head(url, headers=cabecalhos)
+            assert response.status_code == 200
+            assert response.get_data() == b""
+            # Como o servidor WSGI faz ao terminar de enviar a resposta
+            response.close()
+    assert pool.stats()["em_uso"] == 0
+    assert pool.stats()["timeouts"] == 0
+
+
+@patch("servidor.connect_db")
+def test_get_imoveis_por_tipo_stream(mock_connect_db, client):
+    """Testa o modo streaming em array JSON numa rota filtrada."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchmany.side_effect = [
+        [(2, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30")],
+        [],
+    ]
+
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/tipo/mansao?formato=stream")
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "imoveis": [
+            {"id": 2, "logradouro": "Sem Saída", "tipo_logradouro": "Rua", "bairro": "Centro", "cidade": "São Paulo", "cep": "04552999", "tipo": "mansao", "valor": 1000000.00, "data_aquisicao": "2022-05-30"}
+        ]
+    }
+    mock_cursor.execute.assert_called_with("SELECT * from imoveis WHERE tipo = %s AND id > %s ORDER BY id", ("mansao", 0))
+
+
+
+@patch("servidor.connect_db")
+def test_cache_nao_guarda_leitura_de_antes_de_uma_escrita(mock_connect_db, client):
+    """Uma escrita confirmada durante a consulta já invalidou o cache: a resposta lida antes dela não é guardada."""
+    from servidor import invalidar_escrita
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    antiga = (2, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30")
+    nova = (2, "Sem Saída", "Rua", "Centro", "Recife", "04552999", "mansao", 1000000.00, "2022-05-30")
+
+    def ler_e_sofrer_escrita():
+        # A linha antiga já foi lida quando a escrita concorrente faz commit e invalida o cache
+        invalidar_escrita([2], [{"cidade": "Recife"}])
+        mock_cursor.fetchone.side_effect = None
+        return antiga
+
+    mock_cursor.fetchone.side_effect = ler_e_sofrer_escrita
+    mock_cursor.fetchone.return_value = nova
+    mock_connect_db.return_value = mock_conn
+
+    assert client.get("/imoveis/2").get_json()["imoveis"]["cidade"] == "São Paulo"
+    assert client.get("/imoveis/2").get_json()["imoveis"]["cidade"] == "Recife"
+    assert mock_cursor.execute.call_count == 2
+    # Sem escrita no meio, a resposta é guardada
+    client.get("/imoveis/2")
+    assert mock_cursor.execute.call_count == 2
+
+
+@patch("servidor.connect_db")
+def test_get_imoveis_por_cidade_cache(mock_connect_db, client):
+    """Testa que a segunda leitura vem do cache e que uma escrita na cidade a invalida."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [
+        (2, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30"),
+    ]
+
+    mock_connect_db.return_value = mock_conn
+
+    primeira = client.get("/imoveis/cidade/São Paulo")
+    segunda = client.get("/imoveis/cidade/São Paulo")
+    assert primeira.get_json() == segunda.get_json()
+    assert mock_cursor.execute.call_count == 1
+
+    # Escrita em outra cidade não afeta a listagem de São Paulo
+    imovel = {
+        "logradouro": "Rua Quatá", "tipo_logradouro": "Rua", "bairro": "Centro", "cidade": "Campinas",
+        "cep": "13010000", "tipo": "casa", "valor": 300000.00, "data_aquisicao": "2021-01-01"
+    }
+    mock_cursor.lastrowid = 3
+    client.post("/imoveis", json=imovel)
+    client.get("/imoveis/cidade/São Paulo")
+    assert mock_cursor.execute.call_count == 2
+
+    # Remover um imóvel que aparece na página invalida a página
+    mock_cursor.rowcount = 1
+    client.delete("/imoveis/2")
+    client.get("/imoveis/cidade/São Paulo")
+    assert mock_cursor.execute.call_count == 4
+
+
+
+@patch("servidor.connect_db")
+def test_get_imoveis_etag(mock_connect_db, client):
+    """Testa que If-None-Match com a ETag atual responde 304 sem ir ao banco, até uma escrita."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [
+        (2, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30"),
+    ]
+
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    # Mesma versão: 304 sem consultar o banco
+    mock_connect_db.reset_mock()
+    response = client.get("/imoveis", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.get_data() == b""
+    mock_connect_db.assert_not_called()
+
+    # Outros parâmetros são outro recurso, com outra ETag
+    response = client.get("/imoveis?limit=1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # Depois de uma escrita a ETag antiga deixa de valer
+    mock_cursor.rowcount = 1
+    client.delete("/imoveis/2")
+    response = client.get("/imoveis", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+
+@patch("servidor.connect_db")
+def test_escrita_de_outro_processo_muda_etag_e_cache(mock_connect_db, client):
+    """Uma escrita vista só pela versão compartilhada (outro worker, SQL direto) derruba o cache e a ETag."""
+    from servidor import versao_imoveis, versao_mudou_no_banco
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = (2, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30")
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/2")
+    etag = response.headers["ETag"]
+    client.get("/imoveis/2")
+    assert mock_cursor.execute.call_count == 1
+
+    # A mesma versão lida de novo não muda nada
+    versao_imoveis.observar({0: 10})
+    versao_mudou_no_banco()
+    etag = client.get("/imoveis/2").headers["ETag"]
+    assert versao_imoveis.observar({0: 10}) is False
+
+    # Outro processo escreveu: a versão no banco mudou
+    mock_cursor.fetchone.return_value = (2, "Sem Saída", "Rua", "Centro", "Recife", "04552999", "mansao", 1000000.00, "2022-05-30")
+    assert versao_imoveis.observar({0: 11}) is True
+    versao_mudou_no_banco()
+
+    response = client.get("/imoveis/2", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["imoveis"]["cidade"] == "Recife"
+    assert response.headers["ETag"] != etag
+
+
+
+@patch("servidor.connect_db")
+def test_escrita_propria_nao_esvazia_o_cache(mock_connect_db, client):
+    """A mudança que uma escrita deste processo causa na versão compartilhada não é tomada por escrita de outro processo."""
+    from servidor import versao_imoveis
+    from versao import SQL_FATIA_DA_CONEXAO
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    linha = (2, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30")
+    mock_cursor.fetchall.return_value = [linha]
+    mock_connect_db.return_value = mock_conn
+
+    versao_imoveis.observar({0: 10, 3: 40})
+    client.get("/imoveis/cidade/São Paulo")
+    consultas = mock_cursor.execute.call_count
+
+    # A escrita lê a fatia que incrementou antes do commit
+    mock_cursor.fetchall.return_value = [(3, 41)]
+    mock_cursor.lastrowid = 7
+    imovel = {"logradouro": "Brasil", "tipo_logradouro": "Rua", "bairro": "Boa Vista", "cidade": "Recife",
+              "cep": "50000000", "tipo": "casa", "valor": 100.0, "data_aquisicao": "2020-01-01"}
+    with patch("servidor.observando_versao", True):
+        assert client.post("/imoveis", json=imovel).status_code == 201
+    mock_cursor.execute.assert_any_call(SQL_FATIA_DA_CONEXAO)
+    consultas = mock_cursor.execute.call_count
+
+    # Só a própria escrita: a página de São Paulo continua no cache
+    assert versao_imoveis.observar({0: 10, 3: 41}) is False
+    mock_cursor.fetchall.return_value = [linha]
+    assert client.get("/imoveis/cidade/São Paulo").status_code == 200
+    assert mock_cursor.execute.call_count == consultas
+
+    # Um incremento além dos registrados é de outro processo
+    assert versao_imoveis.observar({0: 10, 3: 43}) is True
+    # Registrada depois de a leitura já tê-la visto, a escrita não esconde a próxima de outro processo
+    versao_imoveis.registrar_propria(3, 43, 1)
+    assert versao_imoveis.observar({0: 10, 3: 44}) is True
+
+
+def test_etag_igual_entre_processos():
+    """Processos que leram a mesma versão compartilhada dão a mesma ETag ao mesmo recurso."""
+    from versao import VersaoTabela
+
+    worker1, worker2 = VersaoTabela(), VersaoTabela()
+    assert worker1.etag("/imoveis") != worker2.etag("/imoveis")
+
+    for worker in (worker1, worker2):
+        worker.observar({0: 10, 1: 5})
+    assert worker1.etag("/imoveis") == worker2.etag("/imoveis")
+    assert worker1.etag("/imoveis") != worker1.etag("/imoveis/1")
+
+    # Até a versão compartilhada mostrar a escrita, a ETag de quem escreveu é só dele
+    worker1.registrar_propria(1, 6, 1)
+    worker1.incrementar()
+    assert worker1.etag("/imoveis") != worker2.etag("/imoveis")
+    worker1.observar({0: 10, 1: 6})
+    worker2.observar({0: 10, 1: 6})
+    assert worker1.etag("/imoveis") == worker2.etag("/imoveis")
+
+
+@patch("servidor.connect_db")
+def test_add_imoveis_batch_ndjson(mock_connect_db, client):
+    """Testa a inserção em lote por NDJSON no modo melhor_esforco."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.lastrowid = 100
+
+    mock_connect_db.return_value = mock_conn
+
+    imovel = {
+        "logradouro": "Rua Elvira Ferraz", "tipo_logradouro": "Rua", "bairro": "Vila olimpia", "cidade": "São Paulo",
+        "cep": "12345678", "tipo": "apartamento", "valor": 1000000.00, "data_aquisicao": "2020-01-01"
+    }
+    corpo = "\n".join([json.dumps(imovel), json.dumps(imovel), json.dumps({**imovel, "cep": "123"})])
+
+    response = client.post("/imoveis/batch?modo=melhor_esforco", data=corpo, content_type="application/x-ndjson")
+    assert response.status_code == 201
+
+    dados = response.get_json()
+    assert dados["inseridos"] == 2
+    assert dados["falhas"] == 1
+    assert dados["resultados"][:2] == [{"indice": 0, "id": 100}, {"indice": 1, "id": 101}]
+    mock_cursor.executemany.assert_called_once()
+    mock_conn.commit.assert_called_once()
+
+
+
+@patch("servidor.connect_db")
+def test_add_imoveis_batch_tudo_ou_nada(mock_connect_db, client):
+    """Testa que no modo padrão uma linha inválida recusa o lote inteiro."""
+
+    mock_conn = MagicMock()
+    mock_connect_db.return_value = mock_conn
+
+    response = client.post("/imoveis/batch", json=[{"logradouro": "Rua Quatá"}])
+    assert response.status_code == 400
+    assert response.get_json()["indice"] == 0
+    mock_conn.commit.assert_not_called()
+
+
+
+@patch("servidor.connect_db")
+def test_update_imoveis_batch(mock_connect_db, client):
+    """Testa a atualização em lote por lista de ids."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.rowcount = 3
+
+    mock_connect_db.return_value = mock_conn
+
+    response = client.put("/imoveis/batch", json={"ids": [3, 1, 2], "valores": {"valor": 500000.00}})
+    assert response.status_code == 200
+    assert response.get_json() == {"afetados": 3}
+
+    mock_cursor.execute.assert_called_once_with("UPDATE imoveis SET valor = %s WHERE id IN (%s, %s, %s)", (500000.00, 1, 2, 3))
+    mock_conn.commit.assert_called_once()
+
+
+
+@patch("servidor.connect_db")
+def test_delete_imoveis_batch(mock_connect_db, client):
+    """Testa a remoção em lote por filtro e a validação do corpo."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [(7,), (9,)]
+    mock_cursor.rowcount = 2
+
+    mock_connect_db.return_value = mock_conn
+
+    response = client.delete("/imoveis/batch", json={"filtro": {"cidade": "São Paulo", "tipo": "casa"}})
+    assert response.status_code == 200
+    assert response.get_json() == {"afetados": 2}
+    mock_cursor.execute.assert_called_with("DELETE FROM imoveis WHERE id IN (%s, %s)", (7, 9))
+
+    response = client.delete("/imoveis/batch", json={})
+    assert response.status_code == 400
+
+
+
+@patch("servidor.connect_db")
+def test_buscar_imoveis(mock_connect_db, client):
+    """Testa a busca combinada: filtros viram um único SELECT e o cursor next é devolvido."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [
+        (4, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "apartamento", 300000.00, "2022-05-30"),
+        (5, "Rua Quatá", "Rua", "Centro", "São Paulo", "04552000", "apartamento", 400000.00, "2021-05-30"),
+    ]
+
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/search?cidade=São Paulo&tipo=apartamento&valor_max=500000&sort=valor&limit=1")
+    assert response.status_code == 200
+
+    dados = response.get_json()
+    assert [imovel["id"] for imovel in dados["imoveis"]] == [4]
+    assert "next" in dados
+    sql = mock_cursor.execute.call_args[0][0]
+    assert sql == "SELECT * from imoveis WHERE tipo = %s AND cidade = %s AND valor <= %s ORDER BY valor ASC, id ASC LIMIT %s"
+
+    response = client.get("/imoveis/search?sort=logradouro")
+    assert response.status_code == 400
+
+
+
+@patch("servidor.connect_db")
+def test_get_estatisticas(mock_connect_db, client):
+    """Testa a rota de estatísticas por cidade, lida do resumo."""
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [("", "São Paulo", 2, 1300000.00, 300000.00, 1000000.00)]
+
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/stats/cidade")
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "dimensao": "cidade",
+        "grupos": [{"cidade": "São Paulo", "quantidade": 2, "soma_valor": 1300000.00, "media_valor": 650000.00, "valor_min": 300000.00, "valor_max": 1000000.00}]
+    }
+
+    response = client.get("/imoveis/stats/logradouro")
+    assert response.status_code == 400
+
+
+
+@patch("servidor.connect_db")
+def test_get_imoveis_por_cidade_replica(mock_connect_db, client):
+    """Testa que, com a réplica em memória pronta, a leitura não vai ao banco."""
+    from datetime import date
+    from decimal import Decimal
+    from replica import ReplicaImoveis
+
+    replica = ReplicaImoveis()
+    replica.aplicar([(2, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", Decimal("1000000.00"), date(2022, 5, 30))])
+    replica.pronta = True
+
+    with patch("servidor.replica", replica):
+        response = client.get("/imoveis/cidade/São Paulo")
+        assert response.status_code == 200
+        assert [imovel["id"] for imovel in response.get_json()["imoveis"]] == [2]
+
+        response = client.get("/imoveis/2")
+        assert response.status_code == 200
+
+        response = client.get("/imoveis/cidade/Recife")
+        assert response.status_code == 404
+
+    mock_connect_db.assert_not_called()
+
+
+@patch("servidor.connect_db")
+def test_add_imoveis_com_data_e_hora(mock_connect_db, client):
+    """Uma data que o MySQL aceita e o Python não (com hora) não derruba um INSERT já confirmado."""
+    from datetime import date
+    from decimal import Decimal
+    from replica import ReplicaImoveis
+
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.lastrowid = 7
+    mock_connect_db.return_value = mock_conn
+
+    imovel = {"logradouro": "Rua Quatá", "tipo_logradouro": "Rua", "bairro": "Vila Olímpia", "cidade": "São Paulo",
+              "cep": "04546042", "tipo": "casa", "valor": 100000, "data_aquisicao": "2020-01-05T00:00:00"}
+
+    # Réplica desligada (padrão): nenhuma conversão do corpo
+    assert client.post("/imoveis", json=imovel).status_code == 201
+
+    # Réplica ligada: a linha é relida do banco, já com os tipos do banco
+    replica = ReplicaImoveis()
+    replica.pronta = True
+    mock_cursor.fetchall.return_value = [(7, "Rua Quatá", "Rua", "Vila Olímpia", "São Paulo", "04546042", "casa", Decimal("100000.00"), date(2020, 1, 5))]
+    with patch("servidor.replica", replica):
+        assert client.post("/imoveis", json=imovel).status_code == 201
+        assert replica.por_id(7)[-1] == date(2020, 1, 5)
+
+        # Se a releitura falhar, a escrita já confirmada continua sendo 201
+        mock_cursor.execute.side_effect = [None, Exception("conexão perdida")]
+        assert client.post("/imoveis", json=imovel).status_code == 201
+
+
+@patch("servidor.connect_db")
+def test_leitura_vai_para_replica_exceto_apos_escrita(mock_connect_db, client):
+    """Testa que as leituras usam réplica e que, logo depois de escrever, o cliente lê do primário."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = (1, "Nicole Common", "Travessa", "Lake Danielle", "Judymouth", "85184319", "casa", 488423.52, "2017-07-29")
+    mock_connect_db.return_value = mock_conn
+
+    with patch.dict("servidor.replicas_config", {"hosts": ["replica1"]}):
+        client.get("/imoveis/1")
+        mock_connect_db.assert_called_with(leitura=True)
+
+        mock_cursor.rowcount = 1
+        response = client.delete("/imoveis/1")
+        assert "le_primario_ate" in response.headers["Set-Cookie"]
+
+        cache.limpar()
+        client.get("/imoveis/1")
+        mock_connect_db.assert_called_with(leitura=False)
+
+
+@patch("servidor.connect_db")
+def test_metricas_e_server_timing(mock_connect_db, client):
+    """Testa que as requisições aparecem em /metrics e que o Server-Timing é opcional."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [
+        (1, "Nicole Common", "Travessa", "Lake Danielle", "Judymouth", "85184319", "casa", 488423.52, "2017-07-29"),
+    ]
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/tipo/casa")
+    assert "Server-Timing" not in response.headers
+
+    with patch.dict("servidor.metricas_config", {"server_timing": True}):
+        response = client.get("/imoveis/tipo/apartamento")
+    assert "montagem;dur=" in response.headers["Server-Timing"]
+    assert "serializacao;dur=" in response.headers["Server-Timing"]
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    texto = response.get_data(as_text=True)
+    assert 'imoveis_api_requisicoes_total{rota="get_imoveis_por_tipo",metodo="GET",status="200"}' in texto
+    assert "imoveis_api_pool_em_uso" in texto
+
+
+def test_get_consultas(client):
+    """Testa o endpoint do ranking de consultas."""
+    response = client.get("/interno/consultas")
+    assert response.status_code == 200
+    assert {"limiar_ms", "registradas", "suprimidas", "consultas"} <= set(response.get_json())
+
+
+@patch("servidor.connect_db")
+def test_fields_projeta_colunas(mock_connect_db, client):
+    """Testa que `fields` vira um SELECT só com as colunas pedidas e uma resposta só com essas chaves."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [(1, "85184319", 488423.52), (2, "04552999", 1000000.00)]
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/cidade/Recife?fields=cep,valor&limit=1")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"imoveis": [{"cep": "85184319", "valor": 488423.52}], "next": 1}
+    mock_cursor.execute.assert_called_with(
+        "SELECT id, cep, valor from imoveis WHERE cidade = %s AND id > %s ORDER BY id LIMIT %s", ("Recife", 0, 2)
+    )
+
+    response = client.get("/imoveis/1?fields=senha")
+    assert response.status_code == 400
+
+
+@patch("servidor.connect_db")
+def test_formato_colunas(mock_connect_db, client):
+    """Testa o formato colunar e que Decimal e date vindos do banco saem como número e data ISO."""
+    from datetime import date
+    from decimal import Decimal
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [(1, Decimal("488423.52"), date(2018, 1, 31)), (2, Decimal("1000000.00"), date(2022, 5, 30))]
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/tipo/casa?fields=valor,data_aquisicao&formato=colunas&limit=1")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"columns": ["valor", "data_aquisicao"], "rows": [[488423.52, "2018-01-31"]], "next": 1}
+
+    response = client.get("/imoveis/tipo/casa?fields=valor,data_aquisicao&limit=1")
+    assert response.get_json()["imoveis"] == [{"valor": 488423.52, "data_aquisicao": "2018-01-31"}]
+
+    response = client.get("/imoveis?formato=xml")
+    assert response.status_code == 400
+
+
+@patch("servidor.connect_db")
+def test_compressao_gzip_com_cache(mock_connect_db, client):
+    """Testa o gzip negociado pelo Accept-Encoding e o reaproveitamento do corpo comprimido guardado no cache."""
+    import gzip
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [
+        (i, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30") for i in range(1, 51)
+    ]
+    mock_connect_db.return_value = mock_conn
+
+    simples = client.get("/imoveis/cidade/São Paulo")
+    assert "Content-Encoding" not in simples.headers
+    assert "Accept-Encoding" in simples.headers["Vary"]
+    bytes_sem_gzip = cache.stats()["bytes"]
+
+    with patch("servidor.comprimir", wraps=__import__("compressao").comprimir) as mock_comprimir:
+        for _ in range(2):
+            response = client.get("/imoveis/cidade/São Paulo", headers={"Accept-Encoding": "gzip, deflate"})
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert json.loads(gzip.decompress(response.get_data())) == simples.get_json()
+        # A segunda resposta usou os bytes comprimidos guardados no cache
+        assert mock_comprimir.call_count == 1
+    # Os bytes comprimidos contam no limite do cache, uma vez só
+    assert cache.stats()["bytes"] == bytes_sem_gzip + len(response.get_data())
+
+    assert response.headers["ETag"] != simples.headers["ETag"]
+    assert mock_cursor.execute.call_count == 1
+
+    # Corpos abaixo do mínimo saem sem compressão
+    response = client.get("/imoveis/cidade/São Paulo?limit=1&fields=id", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+@patch("servidor.connect_db")
+def test_compressao_streaming(mock_connect_db, client):
+    """Testa o streaming comprimido lote a lote e a devolução da conexão só no fim."""
+    import gzip
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchmany.side_effect = [
+        [(1, "José Eiras Pinheiro", "Rua", "Barra da Tijuca", "Rio de Janeiro", "21240004", "casa em condomínio", 150000.00, "2018-01-31")],
+        [(2, "Sem Saída", "Rua", "Centro", "São Paulo", "04552999", "mansao", 1000000.00, "2022-05-30")],
+        [],
+    ]
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis?formato=ndjson", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    linhas = gzip.decompress(response.get_data()).decode().splitlines()
+    assert [json.loads(linha)["id"] for linha in linhas] == [1, 2]
+    mock_conn.__exit__.assert_called_once()
+
+
+@patch("servidor.connect_db")
+def test_buscar_texto(mock_connect_db, client):
+    """Testa a busca textual: ordem do banco (relevância), cursor `next` e validação de `q`."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [(7, "Sete de Setembro 7", "Centro", 2.5), (3, "Sete de Abril 3", "Centro", 1.0)]
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/busca?q=sete centro&fields=logradouro,bairro&limit=1")
+
+    assert response.status_code == 200
+    dados = response.get_json()
+    assert dados["imoveis"] == [{"logradouro": "Sete de Setembro 7", "bairro": "Centro"}]
+    sql, params = mock_cursor.execute.call_args[0]
+    assert "ORDER BY relevancia DESC, id ASC" in sql
+    assert params == ("+sete* +centro*", "+sete* +centro*", 2)
+
+    client.get(f"/imoveis/busca?q=sete centro&fields=logradouro,bairro&limit=1&after={dados['next']}")
+    assert mock_cursor.execute.call_args[0][1][3:7] == (2.5, "+sete* +centro*", 2.5, 7)
+
+    response = client.get("/imoveis/busca?q=a")
+    assert response.status_code == 400
+
+
+@patch("servidor.connect_db")
+def test_get_contagem_cep(mock_connect_db, client):
+    """Testa a contagem por prefixo de CEP, guardada no cache até a próxima escrita."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [("01", 10), ("04", 3)]
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/cep/contagem?nivel=2&prefixo=0")
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "nivel": 2, "divisao": "sub-região", "grupos": [{"prefixo": "01", "quantidade": 10}, {"prefixo": "04", "quantidade": 3}]
+    }
+    client.get("/imoveis/cep/contagem?nivel=2&prefixo=0")
+    assert mock_cursor.execute.call_count == 1
+
+    client.delete("/imoveis/1")
+    chamadas = mock_cursor.execute.call_count
+    client.get("/imoveis/cep/contagem?nivel=2&prefixo=0")
+    assert mock_cursor.execute.call_count == chamadas + 1
+
+    assert client.get("/imoveis/cep/contagem?nivel=0").status_code == 400
+
+
+@patch("servidor.connect_db")
+def test_get_imoveis_por_cep(mock_connect_db, client):
+    """Testa a faixa de CEP em ordem de CEP, com o cep no SELECT mesmo fora de `fields`."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [(9, "04550001", 10.0), (3, "04550002", 20.0)]
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/cep?prefixo=0455&fields=valor&limit=1")
+
+    assert response.status_code == 200
+    assert response.get_json()["imoveis"] == [{"valor": 10.0}]
+    assert "next" in response.get_json()
+    mock_cursor.execute.assert_called_with(
+        "SELECT id, cep, valor from imoveis WHERE cep BETWEEN %s AND %s ORDER BY cep ASC, id ASC LIMIT %s", ("04550000", "04559999", 2)
+    )
+
+
+@patch("servidor.connect_db")
+def test_get_top_valor(mock_connect_db, client):
+    """Testa o top-N por cidade: ORDER BY valor DESC, id DESC LIMIT n (atendido pelo índice (cidade, valor))."""
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchall.return_value = [(5, 900000.00), (2, 800000.00)]
+    mock_connect_db.return_value = mock_conn
+
+    response = client.get("/imoveis/top/valor?cidade=Recife&n=2&fields=valor")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"imoveis": [{"valor": 900000.00}, {"valor": 800000.00}]}
+    mock_cursor.execute.assert_called_with(
+        "SELECT id, valor from imoveis WHERE cidade = %s ORDER BY valor DESC, id DESC LIMIT %s", ("Recife", 3)
+    )
+
+    assert client.get("/imoveis/faixa/valor?de=abc").status_code == 400
+
+
+@patch("servidor.connect_db")
+def test_coalescencia_de_leituras_iguais(mock_connect_db, client):
+    """Testa que buscas iguais simultâneas rodam um só SELECT e recebem a mesma resposta."""
+    import threading
+    import time
+    from servidor import coalescencia
+    liberar = threading.Event()
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.execute.side_effect = lambda *args: liberar.wait(5)
+    mock_cursor.fetchall.return_value = [(1, 500000.00)]
+    mock_connect_db.return_value = mock_conn
+
+    antes = coalescencia.stats()["economizadas"]
+    respostas = []
+    buscar = lambda: respostas.append(app.test_client().get("/imoveis/search?cidade=Recife&fields=valor"))
+    threads = [threading.Thread(target=buscar) for _ in range(4)]
+    threads[0].start()
+    while not coalescencia.stats()["em_andamento"]:
+        pass
+    for thread in threads[1:]:
+        thread.start()
+    # Dá tempo aos seguidores de entrarem na espera antes de liberar o líder
+    time.sleep(0.2)
+    liberar.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert [response.get_json() for response in respostas] == [{"imoveis": [{"valor": 500000.00}]}] * 4
+    assert mock_cursor.execute.call_count == 1
+    assert coalescencia.stats()["economizadas"] - antes == 3
+    assert client.get("/interno/coalescencia").get_json()["ativa"] is True
+
+
+@patch("servidor.connect_db")
+def test_admissao_429_e_503(mock_connect_db, client):
+    """Testa o 429 do limite por cliente e o 503 da fila do banco cheia, ambos com Retry-After."""
+    from admissao import FilaBanco, LimitadorPorCliente
+    mock_conn = MagicMock()
+    mock_cursor = MagicMock()
+    mock_conn.cursor.return_value = mock_cursor
+    mock_cursor.fetchone.return_value = (7, "Sem Saída", "Rua", "Centro", "Recife", "04552999", "casa", 1000.00, "2022-05-30")
+    mock_connect_db.return_value = mock_conn
+
+    with patch("servidor.limitador", LimitadorPorCliente(taxa=0.1, rajada=1)):
+        assert client.get("/imoveis/7").status_code == 200
+        response = client.get("/imoveis/7")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "10"
+        assert "erro" in response.get_json()
+        # As rotas de observação continuam respondendo
+        assert client.get("/interno/admissao").get_json()["limite_por_cliente"]["recusados"] == 1
+
+    with patch("servidor.fila_banco", FilaBanco(vagas=0, fila_maxima=0, prazo=2)):
+        # A resposta em cache não vai ao banco e não entra na fila
+        assert client.get("/imoveis/7").status_code == 200
+        response = client.get("/imoveis/cidade/Recife")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+    assert mock_connect_db.call_count == 1
+
+
+@patch("servidor.connect_db")
+def test_saude_vivo_e_pronto(mock_connect_db, client):
+    """Testa a liveness (sem banco) e a readiness (banco respondendo e worker não encerrando)."""
+    mock_conn = MagicMock()
+    mock_conn.cursor.return_value.fetchone.return_value = (1,)
+    mock_connect_db.return_value = mock_conn
+
+    assert client.get("/saude/vivo").get_json()["status"] == "vivo"
+    response = client.get("/saude/pronto")
+    assert response.status_code == 200
+    mock_conn.cursor.return_value.execute.assert_called_with("SELECT 1")
+
+    with patch("servidor.encerrando", True):
+        assert client.get("/saude/pronto").status_code == 503
+    mock_connect_db.return_value = None
+    response = client.get("/saude/pronto")
+    assert response.status_code == 503
+    assert response.get_json()["status"] == "sem banco"
+    assert client.get("/saude/vivo").status_code == 200
@@ -0,0 +1,49 @@
+import sys
+import os
+from unittest.mock import patch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import bench
+import servidor
+import servir
+
+
+# A thread que lê a versão no banco seguiria rodando depois do teste
+@patch("servidor.iniciar_observacao_versao")
+def test_criar_app_sqlite_aquece_e_fica_pronto(mock_observacao, tmp_path):
+    """A fábrica abre as conexões de antemão e devolve a aplicação já respondendo /saude/pronto."""
+    caminho = bench.preparar_sqlite(50, str(tmp_path), saida=lambda *_: None)
+    originais = servidor.connect_db, servidor.pool_stats, servidor.aquecimento
+    try:
+        app = servir.criar_app(aquecer=2, sqlite=caminho)
+        assert app is servidor.app
+        mock_observacao.assert_called_once()
+        assert servidor.pool_stats()["livres"] == 2
+
+        cliente = app.test_client()
+        response = cliente.get("/saude/pronto")
+        assert response.status_code == 200
+        assert response.get_json()["aquecimento"]["conexoes"] == 2
+        assert cliente.get("/imoveis/1").status_code == 200
+        # O aquecimento cobriu o primeiro pedido: nenhuma conexão nova
+        assert servidor.pool_stats()["criadas"] == 2
+    finally:
+        servidor.connect_db, servidor.pool_stats, servidor.aquecimento = originais
+
+
+def test_servidor_wsgi_usa_o_socket_do_mestre():
+    import socket
+    sock = socket.create_server(("127.0.0.1", 0))
+    try:
+        for threads in (False, True):
+            wsgi = servir._servidor_wsgi(servidor.app, sock, threads)
+            assert wsgi.server_address == sock.getsockname()
+            assert wsgi.multithread is threads
+            wsgi.socket.close()
+    finally:
+        sock.close()
+
+
+def test_argumentos_padrao_do_ambiente():
+    with patch.dict(servir.servir_config, {"processos": 3, "porta": 9000}):
+        args = servir._argumentos(["--threads"])
+    assert (args.processos, args.porta, args.threads, args.sqlite) == (3, 9000, True, None)
@@ -0,0 +1,101 @@
+import io
+import json
+import pytest
+import sys
+import os
+from unittest.mock import patch
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import banco_local
+import bench
+from transferencia import exportar, importar
+
+
+@pytest.fixture
+def origem(tmp_path):
+    conn = banco_local.conectar(bench.preparar_sqlite(250, str(tmp_path), saida=lambda *_: None))
+    yield conn
+    conn.close()
+
+
+def destino(tmp_path, nome="destino.db"):
+    conn = banco_local.conectar(str(tmp_path / nome))
+    banco_local.criar_tabelas(conn)
+    return conn
+
+
+def linhas(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT logradouro, tipo_logradouro, bairro, cidade, cep, tipo, valor, data_aquisicao from imoveis ORDER BY id")
+    return cursor.fetchall()
+
+
+@pytest.mark.parametrize("formato", ["csv", "ndjson"])
+def test_exportar_e_importar(origem, tmp_path, formato):
+    """O que é exportado volta igual (menos os ids), com a conversão feita em outros processos."""
+    arquivo = tmp_path / f"imoveis.{formato}"
+    with open(arquivo, "w", encoding="utf-8", newline="") as saida:
+        assert exportar(origem, saida, formato, lote=100) == 250
+
+    conn = destino(tmp_path)
+    estado = importar(conn, str(arquivo), formato, str(tmp_path / "ckpt"), processos=2, tamanho_bloco=60, lote=25)
+
+    assert (estado["inseridas"], estado["rejeitadas"], estado["concluida"]) == (250, 0, True)
+    assert linhas(conn) == linhas(origem)
+
+
+def test_importar_retoma_do_checkpoint(origem, tmp_path):
+    """Uma importação interrompida continua do último bloco gravado, sem duplicar linhas."""
+    arquivo = tmp_path / "imoveis.csv"
+    with open(arquivo, "w", encoding="utf-8", newline="") as saida:
+        exportar(origem, saida, "csv")
+    conn = destino(tmp_path)
+
+    def interromper(estado, _):
+        if estado["inseridas"] >= 100:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        importar(conn, str(arquivo), "csv", str(tmp_path / "ckpt"), processos=1, tamanho_bloco=50, progresso=interromper)
+    assert len(linhas(conn)) == 100
+
+    estado = importar(conn, str(arquivo), "csv", str(tmp_path / "ckpt"), processos=1, tamanho_bloco=50)
+    assert estado["inseridas"] == 250
+    assert linhas(conn) == linhas(origem)
+    # Concluída, uma nova chamada não importa de novo
+    importar(conn, str(arquivo), "csv", str(tmp_path / "ckpt"), processos=1)
+    assert len(linhas(conn)) == 250
+
+
+def test_importar_rejeita_linhas_invalidas(tmp_path):
+    """Linhas que add_imoveis recusaria vão para o arquivo de rejeitados com o número da linha."""
+    valido = {"logradouro": "Brasil", "tipo_logradouro": "Rua", "bairro": "Centro", "cidade": "Recife",
+              "cep": "50000000", "tipo": "casa", "valor": 100.5, "data_aquisicao": "2020-01-01"}
+    arquivo = tmp_path / "imoveis.ndjson"
+    arquivo.write_text("\n".join([json.dumps(valido), json.dumps({**valido, "cep": "123"}), "{", "", json.dumps(valido)]) + "\n")
+    rejeitados = io.StringIO()
+
+    estado = importar(destino(tmp_path), str(arquivo), "ndjson", str(tmp_path / "ckpt"), processos=1, rejeitados=rejeitados)
+
+    assert (estado["inseridas"], estado["rejeitadas"]) == (2, 2)
+    erros = [json.loads(linha) for linha in rejeitados.getvalue().splitlines()]
+    assert [erro["linha"] for erro in erros] == [2, 3]
+    assert erros[0]["erro"] == "cep deve ter oito dígitos"
+
+
+def test_importar_retoma_pelo_banco_se_o_checkpoint_nao_foi_gravado(origem, tmp_path):
+    """Uma queda entre o commit do bloco e o checkpoint em JSON não grava o bloco de novo."""
+    arquivo = tmp_path / "imoveis.csv"
+    with open(arquivo, "w", encoding="utf-8", newline="") as saida:
+        exportar(origem, saida, "csv")
+    conn = destino(tmp_path)
+
+    with patch("transferencia.gravar_checkpoint", side_effect=KeyboardInterrupt):
+        with pytest.raises(KeyboardInterrupt):
+            importar(conn, str(arquivo), "csv", str(tmp_path / "ckpt"), processos=1, tamanho_bloco=50)
+    assert len(linhas(conn)) == 50
+    assert not (tmp_path / "ckpt").exists()
+
+    estado = importar(conn, str(arquivo), "csv", str(tmp_path / "ckpt"), processos=1, tamanho_bloco=50)
+    assert estado["inseridas"] == 250
+    assert linhas(conn) == linhas(origem)
+    assert json.loads((tmp_path / "ckpt").read_text()) == estado
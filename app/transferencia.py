@@ -0,0 +1,319 @@
+"""Exportação e importação da tabela imoveis entre ambientes.
+
+A exportação lê a tabela num cursor sem buffer, em lotes de fetchmany, e grava
+CSV ou NDJSON sem nunca ter mais de um lote em memória. A importação divide o
+arquivo em blocos de linhas, que são convertidos e validados (com as regras de
+add_imoveis) num pool de processos, e grava cada bloco com executemany numa
+transação. A posição no arquivo e os contadores ficam na tabela importacoes
+(migração 0009), atualizada na mesma transação do bloco: uma importação
+interrompida continua exatamente do último bloco confirmado. O checkpoint em
+JSON ao lado do arquivo é só uma cópia dessa linha, para acompanhar o progresso.
+
+Uso:
+    python transferencia.py exportar imoveis.csv          # ou .ndjson; "-" escreve na saída padrão
+    python transferencia.py importar imoveis.csv [--processos 4] [--bloco 20000] [--lote 5000]
+                                                 [--checkpoint arquivo] [--rejeitados arquivo] [--do-zero]
+
+Os ids não são importados: cada linha ganha um id novo no destino. Os
+servidores enxergam a carga pela versão compartilhada da tabela (migração
+0008), que derruba o cache e muda as ETags em até VERSAO_INTERVALO segundos, e
+as réplicas em memória pela sincronização incremental; o resumo de
+estatísticas é mantido pelos triggers (ou por `estatisticas.py reconstruir`).
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+
+from utils import connect_db
+from consulta import COLUNAS
+from lote import COLUNAS_ESCRITA, SQL_INSERT, validar_imovel
+from serializacao import conversor
+
+
+FORMATOS = ("csv", "ndjson")
+
+SQL_LER_IMPORTACAO = """SELECT tamanho, posicao, linha, inseridas, rejeitadas, concluida, cabecalho
+    from importacoes WHERE arquivo = %s"""
+SQL_GRAVAR_IMPORTACAO = """REPLACE INTO importacoes (arquivo, tamanho, posicao, linha, inseridas, rejeitadas, concluida, cabecalho)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
+SQL_REMOVER_IMPORTACAO = "DELETE from importacoes WHERE arquivo = %s"
+
+
+class ErroTransferencia(Exception):
+    """Arquivo, checkpoint ou conexão que impedem a exportação/importação."""
+
+
+def formato_do_arquivo(caminho, formato=None):
+    """Formato pedido ou deduzido da extensão do arquivo."""
+    formato = formato or os.path.splitext(caminho)[1].lstrip(".").lower()
+    if formato not in FORMATOS:
+        raise ErroTransferencia(f"formato deve ser um de: {', '.join(FORMATOS)} (use --formato)")
+    return formato
+
+
+# Exportação
+
+def exportar(conn, saida, formato, lote=10000, progresso=None):
+    """Grava todas as linhas de imoveis em `saida` (texto) e retorna quantas foram."""
+    sql = f"SELECT {', '.join(COLUNAS)} from imoveis ORDER BY id"
+    total = 0
+    if formato == "csv":
+        escritor = csv.writer(saida, lineterminator="\n")
+        escritor.writerow(COLUNAS)
+    else:
+        para_dict = conversor()
+    cursor = conn.cursor(buffered=False)
+    cursor.execute(sql)
+    while True:
+        linhas = cursor.fetchmany(lote)
+        if not linhas:
+            break
+        if formato == "csv":
+            # Decimal e date já saem como texto no formato que a importação lê
+            escritor.writerows(linhas)
+        else:
+            saida.write("".join(json.dumps(para_dict(linha), ensure_ascii=False) + "\n" for linha in linhas))
+        total += len(linhas)
+        if progresso is not None:
+            progresso(total)
+    return total
+
+
+# Importação
+
+def _linhas_em_blocos(arquivo, posicao, tamanho_bloco):
+    """Lê o arquivo (binário) a partir de `posicao` e produz (linhas, posição depois do bloco)."""
+    arquivo.seek(posicao)
+    while True:
+        linhas = list(islice(arquivo, tamanho_bloco))
+        if not linhas:
+            return
+        posicao += sum(len(linha) for linha in linhas)
+        yield linhas, posicao
+
+
+def converter_bloco(formato, cabecalho, primeira, linhas):
+    """Converte e valida um bloco de linhas (roda nos processos do pool).
+
+    Retorna (tuplas prontas para o INSERT, [(número da linha no arquivo, erro)]).
+    """
+    validos, rejeitados = [], []
+    if formato == "csv":
+        registros = (dict(zip(cabecalho, valores)) for valores in csv.reader(linha.decode("utf-8") for linha in linhas))
+    else:
+        registros = (linha.decode("utf-8") for linha in linhas)
+    for numero, registro in enumerate(registros, primeira):
+        if not registro or (formato == "ndjson" and not registro.strip()):
+            continue
+        try:
+            if formato == "ndjson":
+                try:
+                    registro = json.loads(registro)
+                except ValueError as err:
+                    raise ValueError(f"linha NDJSON inválida: {err}")
+            validos.append(validar_imovel(registro))
+        except ValueError as err:
+            rejeitados.append((numero, str(err)))
+    return validos, rejeitados
+
+
+def ler_importacao(conn, arquivo):
+    """Estado gravado no banco de uma importação anterior do mesmo arquivo (None se não houver)."""
+    cursor = conn.cursor()
+    cursor.execute(SQL_LER_IMPORTACAO, (os.path.abspath(arquivo),))
+    linhas = cursor.fetchall()
+    conn.commit()
+    if not linhas:
+        return None
+    tamanho, posicao, linha, inseridas, rejeitadas, concluida, cabecalho = linhas[0]
+    if tamanho != os.path.getsize(arquivo):
+        raise ErroTransferencia(f"a importação anterior de {arquivo} foi de outra versão do arquivo; use --do-zero")
+    return {
+        "arquivo": os.path.abspath(arquivo), "tamanho": tamanho, "posicao": posicao, "linha": linha,
+        "inseridas": inseridas, "rejeitadas": rejeitadas, "concluida": bool(concluida),
+        "cabecalho": json.loads(cabecalho) if cabecalho is not None else None,
+    }
+
+
+def gravar_importacao(cursor, estado):
+    # Sem commit: vai junto com os INSERTs do bloco
+    cabecalho = json.dumps(estado["cabecalho"]) if estado["cabecalho"] is not None else None
+    cursor.execute(SQL_GRAVAR_IMPORTACAO, (estado["arquivo"], estado["tamanho"], estado["posicao"], estado["linha"],
+                                           estado["inseridas"], estado["rejeitadas"], estado["concluida"], cabecalho))
+
+
+def remover_importacao(conn, arquivo):
+    """Esquece a importação anterior do arquivo (--do-zero)."""
+    cursor = conn.cursor()
+    cursor.execute(SQL_REMOVER_IMPORTACAO, (os.path.abspath(arquivo),))
+    conn.commit()
+
+
+def gravar_checkpoint(caminho, estado):
+    # Grava ao lado e renomeia: uma interrupção nunca deixa o checkpoint pela metade
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as saida:
+        json.dump(estado, saida)
+    os.replace(temporario, caminho)
+
+
+class _PoolLocal:
+    """Mesmo uso do ProcessPoolExecutor, sem processos (com --processos 1)."""
+
+    def submit(self, funcao, *args):
+        futuro = Future()
+        futuro.set_result(funcao(*args))
+        return futuro
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def importar(conn, arquivo, formato, checkpoint, processos=os.cpu_count(), tamanho_bloco=20000, lote=5000,
+             rejeitados=None, progresso=None):
+    """Importa `arquivo` continuando da importação anterior, se houver; retorna o estado final.
+
+    Os blocos são convertidos em paralelo, mas gravados em ordem, cada um numa
+    transação com os INSERTs e a linha de importacoes: ou o bloco e a nova
+    posição entram juntos, ou nenhum dos dois. O `checkpoint` (JSON) é gravado
+    depois do commit e nunca é lido para retomar. As linhas rejeitadas vão para
+    `rejeitados` antes do commit: uma queda pode repeti-las, nunca perdê-las.
+    """
+    estado = ler_importacao(conn, arquivo) or {
+        "arquivo": os.path.abspath(arquivo), "tamanho": os.path.getsize(arquivo),
+        "posicao": 0, "linha": 0, "inseridas": 0, "rejeitadas": 0, "concluida": False, "cabecalho": None,
+    }
+    if estado["concluida"]:
+        return estado
+
+    cursor = conn.cursor()
+    inicio = time.perf_counter()
+    inseridas_antes = estado["inseridas"]
+    with open(arquivo, "rb") as entrada:
+        if formato == "csv" and estado["cabecalho"] is None:
+            primeira = entrada.readline()
+            estado["cabecalho"] = next(csv.reader([primeira.decode("utf-8-sig")]))
+            estado["posicao"], estado["linha"] = len(primeira), 1
+            faltando = [coluna for coluna in COLUNAS_ESCRITA if coluna not in estado["cabecalho"]]
+            if faltando:
+                raise ErroTransferencia(f"o cabeçalho do CSV não tem as colunas: {', '.join(faltando)}")
+
+        executor = ProcessPoolExecutor(processos) if processos > 1 else _PoolLocal()
+        with executor:
+            pendentes = []
+            blocos = _linhas_em_blocos(entrada, estado["posicao"], tamanho_bloco)
+            linha = estado["linha"]
+            while True:
+                # Até dois blocos por processo convertidos à frente do que está sendo gravado
+                for linhas, posicao in islice(blocos, max(processos * 2 - len(pendentes), 0)):
+                    pendentes.append((executor.submit(converter_bloco, formato, estado["cabecalho"], linha + 1, linhas), posicao, len(linhas)))
+                    linha += len(linhas)
+                if not pendentes:
+                    break
+                futuro, posicao, quantidade = pendentes.pop(0)
+                validos, erros = futuro.result()
+
+                if erros and rejeitados is not None:
+                    rejeitados.write("".join(json.dumps({"linha": numero, "erro": erro}, ensure_ascii=False) + "\n" for numero, erro in erros))
+                    rejeitados.flush()
+
+                for inicio_lote in range(0, len(validos), lote):
+                    cursor.executemany(SQL_INSERT, validos[inicio_lote:inicio_lote + lote])
+                gravar_importacao(cursor, {**estado, "posicao": posicao, "linha": estado["linha"] + quantidade,
+                                           "inseridas": estado["inseridas"] + len(validos),
+                                           "rejeitadas": estado["rejeitadas"] + len(erros)})
+                conn.commit()
+
+                estado["posicao"] = posicao
+                estado["linha"] += quantidade
+                estado["inseridas"] += len(validos)
+                estado["rejeitadas"] += len(erros)
+                gravar_checkpoint(checkpoint, estado)
+                if progresso is not None:
+                    progresso(estado, (estado["inseridas"] - inseridas_antes) / max(time.perf_counter() - inicio, 1e-9))
+
+    estado["concluida"] = True
+    gravar_importacao(cursor, estado)
+    conn.commit()
+    gravar_checkpoint(checkpoint, estado)
+    return estado
+
+
+# Linha de comando
+
+def _argumentos(argv):
+    parser = argparse.ArgumentParser(prog="transferencia.py", description="Exporta e importa a tabela imoveis")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    exportar_ = comandos.add_parser("exportar", help="grava a tabela em CSV ou NDJSON")
+    exportar_.add_argument("arquivo", help='arquivo de saída ("-" para a saída padrão)')
+    exportar_.add_argument("--formato", choices=FORMATOS, help="padrão: pela extensão do arquivo")
+    exportar_.add_argument("--lote", type=int, default=10000, help="linhas por fetchmany")
+
+    importar_ = comandos.add_parser("importar", help="carrega um CSV ou NDJSON exportado")
+    importar_.add_argument("arquivo")
+    importar_.add_argument("--formato", choices=FORMATOS, help="padrão: pela extensão do arquivo")
+    importar_.add_argument("--processos", type=int, default=os.cpu_count(), help="processos que convertem e validam as linhas")
+    importar_.add_argument("--bloco", type=int, default=20000, help="linhas por bloco (um commit por bloco)")
+    importar_.add_argument("--lote", type=int, default=5000, help="linhas por executemany")
+    importar_.add_argument("--checkpoint", help="cópia em JSON do progresso (padrão: <arquivo>.checkpoint)")
+    importar_.add_argument("--rejeitados", help="NDJSON com as linhas rejeitadas (padrão: <arquivo>.rejeitados)")
+    importar_.add_argument("--do-zero", action="store_true", help="esquece a importação anterior do arquivo")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = _argumentos(argv[1:])
+    try:
+        formato = formato_do_arquivo(args.arquivo if args.arquivo != "-" else "", args.formato)
+    except ErroTransferencia as err:
+        print(f"Erro: {err}")
+        return 2
+
+    conn = connect_db()
+    if conn is None:
+        return 1
+
+    inicio = time.perf_counter()
+    with conn:
+        if args.comando == "exportar":
+            progresso = lambda total: print(f"  {total} imóveis", file=sys.stderr)
+            if args.arquivo == "-":
+                total = exportar(conn, io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8"), formato, args.lote, progresso)
+            else:
+                with open(args.arquivo, "w", encoding="utf-8", newline="") as saida:
+                    total = exportar(conn, saida, formato, args.lote, progresso)
+            print(f"{total} imóveis exportados em {time.perf_counter() - inicio:.1f}s", file=sys.stderr)
+            return 0
+
+        checkpoint = args.checkpoint or args.arquivo + ".checkpoint"
+        if args.do_zero:
+            remover_importacao(conn, args.arquivo)
+            if os.path.exists(checkpoint):
+                os.remove(checkpoint)
+
+        def progresso(estado, por_segundo):
+            percentual = estado["posicao"] / estado["tamanho"] * 100 if estado["tamanho"] else 100
+            print(f"  {percentual:5.1f}%  {estado['inseridas']} inseridas  {estado['rejeitadas']} rejeitadas  {por_segundo:,.0f} linhas/s")
+
+        try:
+            with open(args.rejeitados or args.arquivo + ".rejeitados", "a", encoding="utf-8") as rejeitados:
+                estado = importar(conn, args.arquivo, formato, checkpoint, args.processos, args.bloco, args.lote, rejeitados, progresso)
+        except ErroTransferencia as err:
+            print(f"Erro: {err}")
+            return 2
+    print(f"{estado['inseridas']} imóveis importados, {estado['rejeitadas']} rejeitados, em {time.perf_counter() - inicio:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,17 +1,86 @@
+import threading
+
 import mysql.connector
 from mysql.connector import Error
-from config import config
+from config import config, pool_config, replicas_config, config_replica
+from pool import ConnectionPool, PoolEsgotado
+from metricas import medir_conexoes
+from roteamento import RoteadorReplicas
+
+
+_pool = None
+_roteador = None
+_pool_lock = threading.Lock()
+
+
+def _abrir_conexao(parametros=config):
+    """Abre uma conexão nova (TCP + autenticação + SSL) com o banco de dados."""
+    return mysql.connector.connect(**parametros)
+
+
+def get_pool():
+    """Retorna o pool de conexões do primário, criando-o no primeiro uso."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(_abrir_conexao, **pool_config)
+    return _pool
+
+
+def get_roteador():
+    """Roteador das réplicas de leitura (None se DB_REPLICAS estiver vazio)."""
+    global _roteador
+    if _roteador is None and replicas_config['hosts']:
+        with _pool_lock:
+            if _roteador is None:
+                pools = []
+                for endereco in replicas_config['hosts']:
+                    parametros = config_replica(endereco)
+                    pools.append((endereco, ConnectionPool(lambda parametros=parametros: _abrir_conexao(parametros), **pool_config)))
+                _roteador = RoteadorReplicas(pools, replicas_config['politica'], replicas_config['ejecao'])
+                _roteador.iniciar_health_check(replicas_config['intervalo_health'])
+    return _roteador
+
+
+def pool_stats():
+    """Estatísticas do pool (em uso, aguardando, tempo de espera...) do primário e das réplicas."""
+    stats = get_pool().stats()
+    roteador = get_roteador()
+    if roteador is not None:
+        stats["replicas"] = roteador.stats()
+    return stats
+
+
+def aquecer_pools(quantidade=None):
+    """Abre as conexões do primário e das réplicas antes do primeiro pedido; retorna quantas abriu.
+
+    Chamada em cada worker depois do fork (servir.criar_app): conexões abertas
+    antes do fork seriam compartilhadas entre os processos.
+    """
+    abertas = get_pool().aquecer(quantidade)
+    roteador = get_roteador()
+    if roteador is not None:
+        abertas += roteador.aquecer(quantidade)
+    return abertas
 
 
 # Função para conectar ao banco de dados
-def connect_db():
-    """Estabelece a conexão com o banco de dados usando as configurações fornecidas."""
+@medir_conexoes
+def connect_db(leitura=False):
+    """Empresta uma conexão do pool; use `with conn:` (ou conn.close()) para devolvê-la.
+
+    Com `leitura=True` a conexão vem de uma réplica de leitura, se houver alguma
+    saudável; caso contrário, do primário.
+    """
     try:
-        # Tenta estabelecer a conexão com o banco de dados usando mysql-connector-python
-        conn = mysql.connector.connect(**config)
-        if conn.is_connected():
-            return conn
-    except Error as err:
+        roteador = get_roteador() if leitura else None
+        if roteador is not None:
+            conn = roteador.adquirir()
+            if conn is not None:
+                return conn
+        return get_pool().adquirir()
+    except (Error, PoolEsgotado) as err:
         # Em caso de erro, imprime a mensagem de erro
         print(f"Erro: {err}")
         return None
@@ -0,0 +1,140 @@
+import itertools
+import threading
+import time
+import uuid
+
+
+# Versão compartilhada da tabela imoveis, mantida pelos triggers da migração 0008
+SQL_VERSAO_COMPARTILHADA = "SELECT fatia, versao from imoveis_versao"
+# Fatia que os triggers incrementam nas escritas desta conexão
+SQL_FATIA_DA_CONEXAO = "SELECT fatia, versao from imoveis_versao WHERE fatia = CONNECTION_ID() % 16 FOR UPDATE"
+
+
+class VersaoTabela:
+    """Contador monotônico de versão de uma tabela, incrementado a cada escrita.
+
+    O contador vive na memória do processo; `token` muda a cada inicialização
+    para que uma versão de antes de um restart nunca seja confundida com uma nova.
+    As escritas feitas por outros processos chegam por `observar`, que recebe a
+    versão compartilhada lida do banco e incrementa o contador quando ela muda
+    por algo além das escritas do próprio processo (`registrar_propria`).
+
+    As ETags saem da versão compartilhada, iguais em todos os processos, sempre
+    que o processo não tem nada além do que ela conta: sem leitura do banco ou
+    com uma escrita própria que ela ainda não mostrou, saem do contador local.
+    """
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex[:8]
+        self._contador = itertools.count(1)
+        self._atual = 0
+        self._fatias = None
+        self._observada = None  # valor do contador quando a versão compartilhada cobria tudo o que o processo sabe
+        self._proprias = []  # (fatia, início, fim): os incrementos (início, fim] da fatia são escritas deste processo
+        self._lock = threading.Lock()
+
+    def atual(self):
+        return self._atual
+
+    def incrementar(self):
+        with self._lock:
+            self._atual = next(self._contador)
+            return self._atual
+
+    def registrar_propria(self, fatia, versao, escritas):
+        """Registra uma escrita confirmada deste processo: os últimos `escritas` incrementos até `versao` na fatia.
+
+        `versao` é lida na própria transação, antes do commit: a linha da fatia
+        fica travada desde o primeiro trigger, então nenhum outro processo
+        incrementou a fatia nesse intervalo. `escritas` vem do rowcount, que
+        nunca passa do número de triggers disparados: na dúvida sobra
+        incremento para os outros processos e o cache cai à toa, nunca o contrário.
+        """
+        if escritas > 0:
+            with self._lock:
+                self._proprias.append((fatia, versao - escritas, versao))
+
+    def observar(self, fatias):
+        """Registra a versão de cada fatia lida do banco; retorna True (e incrementa) se outro processo escreveu.
+
+        Os incrementos cobertos pelas escritas registradas por este processo não
+        contam: estas já invalidaram o que mudou. A primeira leitura conta como
+        mudança: o que foi guardado antes dela pode ser de antes de uma escrita
+        que ainda não tinha sido vista.
+        """
+        with self._lock:
+            anteriores, self._fatias = self._fatias, dict(fatias)
+            mudou = anteriores is None or any(self._alheias(fatia, anteriores.get(fatia, 0), versao)
+                                              for fatia, versao in self._fatias.items())
+            # Escrita já vista (ou registrada depois da leitura que a viu) não precisa mais ser lembrada
+            self._proprias = [propria for propria in self._proprias if propria[2] > self._fatias.get(propria[0], 0)]
+            if mudou:
+                self._atual = next(self._contador)
+            if not self._proprias:
+                self._observada = self._atual
+            return mudou
+
+    def _alheias(self, fatia, anterior, versao):
+        """Os incrementos (anterior, versao] da fatia vão além das escritas deste processo?"""
+        if versao == anterior:
+            return False
+        proprias = sum(fim - inicio for fatia_propria, inicio, fim in self._proprias
+                       if fatia_propria == fatia and anterior <= inicio and fim <= versao)
+        return versao - anterior != proprias
+
+    def etag(self, *partes):
+        """ETag forte para um recurso (`partes`) na versão atual.
+
+        Com o contador ainda no valor da última leitura completa da versão
+        compartilhada, a ETag é a soma das fatias: outro worker no mesmo ponto
+        devolve a mesma e aceita o If-None-Match. Depois de uma escrita própria
+        (ou de uma linha trazida pela réplica em memória), e até a próxima
+        leitura que a mostre, a ETag é do processo.
+        """
+        chave = uuid.uuid5(uuid.NAMESPACE_URL, "|".join(str(parte) for parte in partes)).hex[:16]
+        with self._lock:
+            if self._observada is not None and self._atual == self._observada:
+                return f"{sum(self._fatias.values())}-{chave}"
+            return f"{self.token}-{self._atual}-{chave}"
+
+
+def ler_versao_compartilhada(conn):
+    """Versão de cada fatia ({fatia: versao})."""
+    cursor = conn.cursor()
+    cursor.execute(SQL_VERSAO_COMPARTILHADA)
+    fatias = dict(cursor.fetchall())
+    # Encerra a transação: na próxima leitura o snapshot (REPEATABLE READ) é outro
+    conn.commit()
+    return fatias
+
+
+def ler_fatia_da_conexao(cursor):
+    """(fatia, versao) da fatia desta conexão, lida na transação da escrita (None sem a migração 0008 populada)."""
+    cursor.execute(SQL_FATIA_DA_CONEXAO)
+    linhas = cursor.fetchall()
+    return tuple(linhas[0]) if linhas else None
+
+
+def iniciar_observacao(versao, conectar, intervalo, ao_mudar):
+    """Thread em segundo plano: lê a versão compartilhada a cada `intervalo` segundos e chama `ao_mudar` quando ela muda."""
+    def laco():
+        ultimo_erro = None
+        while True:
+            conn = conectar()
+            if conn is not None:
+                try:
+                    with conn:
+                        compartilhada = ler_versao_compartilhada(conn)
+                    ultimo_erro = None
+                    if versao.observar(compartilhada):
+                        ao_mudar()
+                except Exception as err:
+                    # Um erro que se repete (ex.: migração 0008 não aplicada) aparece uma vez só
+                    if str(err) != ultimo_erro:
+                        print(f"Erro ao ler a versão compartilhada da tabela: {err}")
+                        ultimo_erro = str(err)
+            time.sleep(intervalo)
+
+    thread = threading.Thread(target=laco, name="observa-versao", daemon=True)
+    thread.start()
+    return thread